@@ -0,0 +1,42 @@
+"""unique candle key and confirm flag
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CANDLE_TABLES = ('crypto_history', 'crypto_daily')
+
+
+def upgrade() -> None:
+    for table in CANDLE_TABLES:
+        # Xóa nến trùng (symbol, timestamp), giữ bản ghi mới nhất
+        op.execute(f"""
+            DELETE FROM {table} a
+            USING {table} b
+            WHERE a.symbol = b.symbol
+              AND a.timestamp = b.timestamp
+              AND a.id < b.id
+        """)
+        # Dữ liệu cũ coi như đã đóng nến
+        op.add_column(table, sa.Column('is_confirmed', sa.Boolean(), server_default=sa.true(), nullable=False))
+        op.create_unique_constraint(f'uq_{table}_symbol_timestamp', table, ['symbol', 'timestamp'])
+
+
+def downgrade() -> None:
+    for table in CANDLE_TABLES:
+        op.drop_constraint(f'uq_{table}_symbol_timestamp', table, type_='unique')
+        op.drop_column(table, 'is_confirmed')
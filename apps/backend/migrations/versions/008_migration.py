@@ -0,0 +1,109 @@
+"""partition crypto_history by day
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Số ngày tương lai tạo sẵn partition (task maintain_candle_partitions duy trì tiếp)
+PREMAKE_DAYS = 7
+COLUMNS = 'id, symbol, open, high, low, close, volume, timestamp, is_confirmed'
+
+
+def _create_daily_partitions(start: date, end: date) -> None:
+    day = start
+    while day <= end:
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS crypto_history_p{day:%Y%m%d} PARTITION OF crypto_history "
+            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+        )
+        day += timedelta(days=1)
+
+
+def upgrade() -> None:
+    # 1. Đổi tên bảng cũ (kèm constraint/index) để tạo bảng partitioned cùng tên
+    op.execute("ALTER TABLE crypto_history RENAME TO crypto_history_old")
+    op.execute("ALTER TABLE crypto_history_old RENAME CONSTRAINT crypto_history_pkey TO crypto_history_old_pkey")
+    op.execute("ALTER TABLE crypto_history_old RENAME CONSTRAINT uq_crypto_history_symbol_timestamp "
+               "TO uq_crypto_history_old_symbol_timestamp")
+    op.execute("ALTER INDEX ix_crypto_history_id RENAME TO ix_crypto_history_old_id")
+    op.execute("ALTER INDEX ix_crypto_history_symbol RENAME TO ix_crypto_history_old_symbol")
+    # Giữ sequence của id khi xóa bảng cũ
+    op.execute("ALTER SEQUENCE crypto_history_id_seq OWNED BY NONE")
+
+    # 2. Bảng partitioned theo ngày; khóa chính/unique phải chứa cột partition (timestamp)
+    op.execute("""
+        CREATE TABLE crypto_history (
+            id INTEGER NOT NULL DEFAULT nextval('crypto_history_id_seq'),
+            symbol VARCHAR(50) NOT NULL,
+            open DOUBLE PRECISION,
+            high DOUBLE PRECISION,
+            low DOUBLE PRECISION,
+            close DOUBLE PRECISION NOT NULL,
+            volume DOUBLE PRECISION,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            is_confirmed BOOLEAN NOT NULL DEFAULT true,
+            CONSTRAINT crypto_history_pkey PRIMARY KEY (id, timestamp),
+            CONSTRAINT uq_crypto_history_symbol_timestamp UNIQUE (symbol, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE crypto_history_id_seq OWNED BY crypto_history.id")
+    op.create_index('ix_crypto_history_id', 'crypto_history', ['id'], unique=False)
+    op.create_index('ix_crypto_history_symbol', 'crypto_history', ['symbol'], unique=False)
+
+    # 3. Partition cho khoảng dữ liệu hiện có tới PREMAKE_DAYS ngày sau hôm nay
+    oldest = op.get_bind().execute(sa.text("SELECT min(timestamp) FROM crypto_history_old")).scalar()
+    today = date.today()
+    start = min(oldest.date(), today) if oldest else today
+    _create_daily_partitions(start, max(today, start) + timedelta(days=PREMAKE_DAYS))
+
+    # 4. Chuyển dữ liệu rồi xóa bảng cũ
+    op.execute(f"INSERT INTO crypto_history ({COLUMNS}) SELECT {COLUMNS} FROM crypto_history_old")
+    op.execute("DROP TABLE crypto_history_old")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE crypto_history RENAME TO crypto_history_partitioned")
+    op.execute("ALTER TABLE crypto_history_partitioned RENAME CONSTRAINT crypto_history_pkey "
+               "TO crypto_history_partitioned_pkey")
+    op.execute("ALTER TABLE crypto_history_partitioned RENAME CONSTRAINT uq_crypto_history_symbol_timestamp "
+               "TO uq_crypto_history_partitioned_symbol_timestamp")
+    op.execute("ALTER INDEX ix_crypto_history_id RENAME TO ix_crypto_history_partitioned_id")
+    op.execute("ALTER INDEX ix_crypto_history_symbol RENAME TO ix_crypto_history_partitioned_symbol")
+    op.execute("ALTER SEQUENCE crypto_history_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE crypto_history (
+            id INTEGER NOT NULL DEFAULT nextval('crypto_history_id_seq'),
+            symbol VARCHAR(50) NOT NULL,
+            open DOUBLE PRECISION,
+            high DOUBLE PRECISION,
+            low DOUBLE PRECISION,
+            close DOUBLE PRECISION NOT NULL,
+            volume DOUBLE PRECISION,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            is_confirmed BOOLEAN NOT NULL DEFAULT true,
+            CONSTRAINT crypto_history_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_crypto_history_symbol_timestamp UNIQUE (symbol, timestamp)
+        )
+    """)
+    op.execute("ALTER SEQUENCE crypto_history_id_seq OWNED BY crypto_history.id")
+    op.create_index('ix_crypto_history_id', 'crypto_history', ['id'], unique=False)
+    op.create_index('ix_crypto_history_symbol', 'crypto_history', ['symbol'], unique=False)
+
+    op.execute(f"INSERT INTO crypto_history ({COLUMNS}) SELECT {COLUMNS} FROM crypto_history_partitioned")
+    op.execute("DROP TABLE crypto_history_partitioned")
@@ -0,0 +1,46 @@
+"""covering indexes for candle and signal queries
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CANDLE_TABLES = ('crypto_history', 'crypto_daily')
+CANDLE_INCLUDE = ['open', 'high', 'low', 'close', 'volume']
+
+
+def upgrade() -> None:
+    for table in CANDLE_TABLES:
+        # (symbol, timestamp DESC) INCLUDE OHLCV: nến mới nhất / N nến gần nhất đọc thẳng từ index.
+        # Trên bảng partitioned, index ở bảng cha tự được tạo cho từng partition.
+        op.create_index(
+            f'ix_{table}_symbol_timestamp_desc',
+            table,
+            ['symbol', sa.text('timestamp DESC')],
+            unique=False,
+            postgresql_include=CANDLE_INCLUDE,
+        )
+        # Index đơn cột symbol đã bị index trên bao phủ, bỏ để giảm chi phí ghi
+        op.drop_index(f'ix_{table}_symbol', table_name=table)
+
+    op.create_index('ix_trading_signals_status_timestamp', 'trading_signals', ['status', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trading_signals_status_timestamp', table_name='trading_signals')
+    for table in CANDLE_TABLES:
+        op.create_index(f'ix_{table}_symbol', table, ['symbol'], unique=False)
+        op.drop_index(f'ix_{table}_symbol_timestamp_desc', table_name=table)
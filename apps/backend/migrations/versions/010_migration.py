@@ -0,0 +1,39 @@
+"""signal outcomes per horizon
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('signal_outcomes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('signal_id', sa.Integer(), nullable=False),
+    sa.Column('horizon_minutes', sa.Integer(), nullable=False),
+    sa.Column('exit_price', sa.Float(), nullable=True),
+    sa.Column('result', sa.String(length=20), nullable=False),
+    sa.Column('candle_timestamp', sa.DateTime(), nullable=True),
+    sa.Column('evaluated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['signal_id'], ['trading_signals.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('signal_id', 'horizon_minutes', name='uq_signal_outcomes_signal_horizon')
+    )
+    op.create_index(op.f('ix_signal_outcomes_id'), 'signal_outcomes', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_signal_outcomes_id'), table_name='signal_outcomes')
+    op.drop_table('signal_outcomes')
@@ -0,0 +1,54 @@
+"""incremental signal accuracy stats
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('signal_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('symbol', sa.String(length=50), nullable=False),
+    sa.Column('signal_type', sa.String(length=20), nullable=False),
+    sa.Column('wins', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('losses', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('draws', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('return_sum', sa.Float(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day', 'symbol', 'signal_type')
+    )
+    # Dựng thống kê từ các tín hiệu đã đóng trước đó; từ giờ bước đối soát tự cộng dồn
+    op.execute("""
+        INSERT INTO signal_stats (day, symbol, signal_type, wins, losses, draws, return_sum)
+        SELECT
+            CAST(timestamp AS DATE),
+            symbol,
+            signal_type,
+            COUNT(*) FILTER (WHERE result = 'WIN'),
+            COUNT(*) FILTER (WHERE result = 'LOSS'),
+            COUNT(*) FILTER (WHERE result = 'DRAW'),
+            SUM(CASE WHEN signal_type = 'BUY'
+                     THEN (exit_price - entry_price) / entry_price
+                     ELSE (entry_price - exit_price) / entry_price END)
+        FROM trading_signals
+        WHERE status = 'COMPLETED'
+          AND result IN ('WIN', 'LOSS', 'DRAW')
+          AND exit_price IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('signal_stats')
@@ -0,0 +1,44 @@
+"""price alerts
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('price_alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chat_id', sa.String(length=50), nullable=False),
+    sa.Column('symbol', sa.String(length=50), nullable=False),
+    sa.Column('direction', sa.String(length=10), nullable=False),
+    sa.Column('target_price', sa.Float(), nullable=False),
+    sa.Column('change_pct', sa.Float(), nullable=True),
+    sa.Column('reference_price', sa.Float(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), server_default=sa.true(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('triggered_at', sa.DateTime(), nullable=True),
+    sa.Column('triggered_price', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_price_alerts_chat_id'), 'price_alerts', ['chat_id'], unique=False)
+    op.create_index('ix_price_alerts_updated_at', 'price_alerts', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_price_alerts_updated_at', table_name='price_alerts')
+    op.drop_index(op.f('ix_price_alerts_chat_id'), table_name='price_alerts')
+    op.drop_table('price_alerts')
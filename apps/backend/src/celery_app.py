@@ -34,6 +34,10 @@ celery_app.conf.beat_schedule = {
             minute=CryptoConfig.CLEANUP_MINUTE
         ),
     },
+    "flush-alert-digests": {
+        "task": "src.crypto.tasks.flush_alert_digests",
+        "schedule": CryptoConfig.ALERT_DIGEST_FLUSH_INTERVAL_SECONDS,
+    },
     "send-periodic-report-every-10-minutes": {
         "task": "src.crypto.tasks.send_periodic_report",
         "schedule": CryptoConfig.REPORT_INTERVAL_SECONDS,
@@ -49,5 +53,13 @@ celery_app.conf.beat_schedule = {
     "record-predictions-every-5-minutes": {
         "task": "src.crypto.tasks.record_predictions_task",
         "schedule": CryptoConfig.PREDICTION_INTERVAL_SECONDS,
+    },
+    "refresh-instrument-catalog-every-hour": {
+        "task": "src.crypto.tasks.refresh_instrument_catalog",
+        "schedule": CryptoConfig.INSTRUMENT_CATALOG_REFRESH_SECONDS,
+    },
+    "maintain-candle-partitions-daily": {
+        "task": "src.crypto.tasks.maintain_candle_partitions",
+        "schedule": crontab(hour=CryptoConfig.CLEANUP_HOUR, minute=30),
     }
 }
@@ -84,6 +84,13 @@ class Settings(BaseSettings):
     TELEGRAM_BOT_TOKEN: Optional[str] = os.getenv("TELEGRAM_BOT_TOKEN", None)
     TELEGRAM_CHAT_ID: Optional[str] = os.getenv("TELEGRAM_CHAT_ID") or os.getenv("TELEGRAM_ADMIN_CHAT_ID")
 
+    # Backend tính chỉ báo kỹ thuật: "numpy" (mặc định) hoặc "pandas" (cần pandas-ta)
+    TA_BACKEND: str = os.getenv("TA_BACKEND", "numpy")
+
+    # OKX WebSocket (candle nằm ở kênh business, ticker ở kênh public)
+    OKX_WS_PUBLIC_URL: str = os.getenv("OKX_WS_PUBLIC_URL", "wss://ws.okx.com:8443/ws/v5/public")
+    OKX_WS_BUSINESS_URL: str = os.getenv("OKX_WS_BUSINESS_URL", "wss://ws.okx.com:8443/ws/v5/business")
+
     class Config:
         env_file = env_path
         case_sensitive = True
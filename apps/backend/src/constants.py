@@ -136,6 +136,91 @@ class CryptoConfig:
     
     # Khoảng thời gian để kiểm tra xem tín hiệu có khớp không (phút)
     SIGNAL_VALIDATE_THRESHOLD_MINUTES = 5
+    SIGNAL_VALIDATE_BATCH_SIZE = 1000  # Số tín hiệu mỗi lô khi đối soát
+    # Các mốc đối soát tín hiệu (phút); tín hiệu đóng khi đã có kết quả ở mọi mốc
+    SIGNAL_HORIZONS_MINUTES = (5, 15, 60, 240)
+    SIGNAL_PRIMARY_HORIZON_MINUTES = 60  # Mốc dùng cho result/exit_price của trading_signals
+    SIGNAL_OUTCOME_TOLERANCE_MINUTES = 5  # Nến dùng đối soát được phép sớm hơn mốc tối đa bao lâu
+    SIGNAL_OUTCOME_GRACE_MINUTES = 30  # Quá mốc bao lâu mà vẫn không có nến thì ghi NO_DATA
+    ACCURACY_REPORT_TOP_SYMBOLS = 10  # Số mã hiển thị trong phần thống kê theo mã
+    
+    # Backtest
+    BACKTEST_CHUNK_SIZE = 20000  # Số cửa sổ nến tính chỉ báo mỗi lô (giới hạn bộ nhớ)
+    SWEEP_MIN_SIGNALS = 30  # Bộ tham số ít kèo hơn không được xếp hạng cao (thiếu ý nghĩa thống kê)
     
     # Ngưỡng biến động giá để cảnh báo (%)
-    VOLATILITY_THRESHOLD_PCT = 1.0
\ No newline at end of file
+    VOLATILITY_THRESHOLD_PCT = 1.0
+    # Gom cảnh báo theo chat: 0 = một digest mỗi chu kỳ crawl; > 0 = đệm trong Redis theo cửa sổ (giây)
+    ALERT_DIGEST_WINDOW_SECONDS = 0
+    ALERT_DIGEST_FLUSH_INTERVAL_SECONDS = 30.0
+    ALERT_DIGEST_MAX_LINES = 30  # Số mã tối đa trong một digest (giới hạn 4096 ký tự của Telegram)
+    
+    # Hạn mức request của OKX theo endpoint: (số request, chu kỳ giây) - tính theo IP
+    OKX_RATE_LIMITS = {
+        "/market/history-candles": (20, 2.0),
+        "/market/candles": (40, 2.0),
+        "/market/tickers": (20, 2.0),
+        "/public/instruments": (20, 2.0),
+    }
+    
+    # Số request nến gửi song song tối đa trong một lượt batch
+    OKX_BATCH_CONCURRENCY = 10
+    OKX_CANDLES_MAX_LIMIT = 100  # Số nến tối đa mỗi lần gọi /market/history-candles
+    
+    # Hạn mức gửi tin của Telegram Bot API: (số tin, chu kỳ giây)
+    TELEGRAM_RATE_LIMIT_GLOBAL = (30, 1.0)  # Toàn bot
+    TELEGRAM_RATE_LIMIT_CHAT = (1, 1.0)  # Mỗi chat
+    TELEGRAM_SEND_CONCURRENCY = 20  # Số request sendMessage song song tối đa
+    TELEGRAM_MAX_RETRIES = 3  # Số lần gửi lại khi bị 429 / lỗi mạng / 5xx
+    TELEGRAM_CHAT_BUCKETS_MAX = 10000  # Số bucket theo chat giữ trong mỗi process
+    
+    # Notification outbox
+    OUTBOX_BATCH_SIZE = 100  # Số tin mỗi sender claim một lượt
+    OUTBOX_POLL_INTERVAL_SECONDS = 1.0  # Chờ bao lâu khi outbox trống
+    OUTBOX_LEASE_SECONDS = 120  # Sender chết giữa chừng thì tin được claim lại sau khoảng này
+    OUTBOX_MAX_ATTEMPTS = 8
+    OUTBOX_BACKOFF_BASE_SECONDS = 5  # 5s, 10s, 20s... giữa các lần gửi lại
+    OUTBOX_BACKOFF_MAX_SECONDS = 1800
+    OUTBOX_RETENTION_HOURS = 72  # Giữ tin đã gửi/bỏ để tra cứu độ trễ
+    
+    # Streaming ingestion qua WebSocket
+    STREAM_SUBSCRIPTION_REFRESH_SECONDS = 30.0  # Chu kỳ đồng bộ danh sách mã đăng ký
+    STREAM_PING_INTERVAL_SECONDS = 25.0  # OKX ngắt kết nối nếu im lặng quá 30s
+    STREAM_MAX_BACKOFF_SECONDS = 60.0  # Thời gian chờ tối đa giữa các lần reconnect
+    STREAM_BACKFILL_LIMIT = 300  # Số nến tối đa lấy bù khi reconnect (lấy lùi từng trang OKX_CANDLES_MAX_LIMIT)
+    
+    # Snapshot ticker dùng chung (giây)
+    TICKER_SNAPSHOT_TTL_SECONDS = 5.0  # Độ cũ mặc định chấp nhận được
+    TICKER_SNAPSHOT_RETENTION_SECONDS = 300.0  # Thời gian giữ snapshot trong Redis làm dự phòng
+    
+    # Danh mục instrument (giây)
+    INSTRUMENT_CATALOG_REFRESH_SECONDS = 3600.0  # Celery tải lại từ OKX
+    INSTRUMENT_CATALOG_LOCAL_TTL_SECONDS = 60.0  # Process đọc lại từ Redis ở chế độ nền
+    INSTRUMENT_CATALOG_RETRY_SECONDS = 30.0  # Chờ trước khi thử lại khi cả Redis và OKX đều lỗi
+    
+    # Index đăng ký (mã -> chat_id): process kiểm tra version trong Redis tối đa mỗi khoảng này
+    SUBSCRIPTION_INDEX_LOCAL_TTL_SECONDS = 1.0
+    SUBSCRIPTION_INDEX_REBUILD_ATTEMPTS = 5  # Số lần dựng lại khi bị thay đổi đồng thời (WATCH)
+    
+    # Cảnh báo giá theo người dùng
+    PRICE_ALERT_MAX_PER_CHAT = 50
+    PRICE_ALERT_SYNC_SECONDS = 1.0  # Process kiểm tra version cảnh báo trong Redis tối đa mỗi khoảng này
+    PRICE_ALERT_SYNC_OVERLAP_SECONDS = 60.0  # Đồng bộ tăng dần đọc lùi thêm khoảng này (commit muộn, lệch đồng hồ)
+    
+    # Lô nến từ số dòng này trở lên sẽ ghi bằng COPY thay vì INSERT nhiều dòng
+    BULK_COPY_MIN_ROWS = 500
+    
+    # Partition theo ngày của crypto_history
+    PARTITION_PREMAKE_DAYS = 7  # Số ngày tương lai luôn có sẵn partition
+    HISTORY_1M_RETENTION_HOURS = 48  # Giữ nến 1m trong 2 ngày
+    
+    # Trạng thái chỉ báo tăng dần lưu trong Redis
+    INDICATOR_STATE_TTL_SECONDS = 2 * 24 * 3600
+    
+    # Cache kết quả chỉ báo theo (symbol, timeframe, nến mới nhất)
+    INDICATOR_CACHE_LOCAL_SIZE = 4096  # Số kết quả tối đa trong LRU của mỗi process
+    INDICATOR_CACHE_TTL_SECONDS = 600
+    
+    # Snapshot tín hiệu cho /prices, tính lại sau mỗi lần đóng nến
+    SIGNAL_SNAPSHOT_TTL_SECONDS = 900  # Quá hạn thì API tự tính từ DB (không ghi tín hiệu)
+    SIGNAL_SNAPSHOT_DELAY_SECONDS = 5  # Chờ nến của các mã khác đóng xong rồi mới tính
@@ -0,0 +1,52 @@
+"""
+Chạy backtest mô hình chấm điểm trên nến đã lưu.
+
+Chạy: `python -m src.crypto.backtest --days 30 --symbols BTC-USDT,ETH-USDT --set rsi_oversold=25`
+"""
+import argparse
+import json
+import logging
+from datetime import datetime, timedelta
+
+from src.constants import CryptoAssets, CryptoConfig
+from src.services.backtester import Backtester, CsvCandleSource
+from src.services.signal_scoring import ScoringParams
+
+
+def parse_params(pairs) -> ScoringParams:
+    """`name=value` -> ScoringParams (chỉ nhận các tham số có sẵn)."""
+    defaults = ScoringParams().to_dict()
+    overrides = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        if name not in defaults:
+            raise SystemExit(f"Tham số không hợp lệ: {name} (có: {', '.join(defaults)})")
+        overrides[name] = type(defaults[name])(float(value))
+    return ScoringParams(**overrides)
+
+
+def main() -> None:
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Backtest Signal Scoring System trên nến đã lưu.")
+    parser.add_argument("--symbols", help="Danh sách mã, cách nhau bởi dấu phẩy (mặc định DEFAULT_IDS)")
+    parser.add_argument("--days", type=int, default=30, help="Số ngày gần nhất cần backtest")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None, help="Thời điểm kết thúc (UTC)")
+    parser.add_argument("--csv", help="Thư mục CSV <timeframe>/<symbol>.csv thay cho DB")
+    parser.add_argument("--workers", type=int, default=None, help="Số process (mặc định số CPU)")
+    parser.add_argument("--horizon", type=int, default=CryptoConfig.SIGNAL_PRIMARY_HORIZON_MINUTES)
+    parser.add_argument("--cooldown", type=int, default=0, help="Khoảng cách tối thiểu giữa 2 kèo (phút)")
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE", help="Ghi đè ngưỡng chấm điểm")
+    args = parser.parse_args()
+
+    end = args.end or datetime.utcnow()
+    symbols = args.symbols.split(",") if args.symbols else CryptoAssets.DEFAULT_IDS
+    report = Backtester.run(
+        symbols, end - timedelta(days=args.days), end, params=parse_params(args.set),
+        source=CsvCandleSource(args.csv) if args.csv else None, workers=args.workers,
+        horizon_minutes=args.horizon, cooldown_minutes=args.cooldown,
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Server WebSocket giả lập OKX V5 (public/business) để chạy và test stream ingestion offline.
+
+Chạy độc lập: `python -m src.crypto.fake_okx_ws --port 8765` rồi đặt
+OKX_WS_PUBLIC_URL/OKX_WS_BUSINESS_URL=ws://localhost:8765.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from websockets.asyncio.server import serve, ServerConnection
+
+logger = logging.getLogger(__name__)
+
+
+class FakeOKXServer:
+    """Mô phỏng giao thức subscribe/unsubscribe, ping/pong và push dữ liệu của OKX."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.subscriptions: Dict[ServerConnection, Set[Tuple[str, str]]] = {}
+        self.subscribe_log = []
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> "FakeOKXServer":
+        self._server = await serve(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self) -> "FakeOKXServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def _handler(self, ws: ServerConnection) -> None:
+        self.subscriptions[ws] = set()
+        try:
+            async for raw in ws:
+                if raw == "ping":
+                    await ws.send("pong")
+                    continue
+                message = json.loads(raw)
+                op = message.get("op")
+                for arg in message.get("args", []):
+                    key = (arg["channel"], arg["instId"])
+                    if op == "subscribe":
+                        self.subscriptions[ws].add(key)
+                        self.subscribe_log.append(key)
+                    elif op == "unsubscribe":
+                        self.subscriptions[ws].discard(key)
+                    await ws.send(json.dumps({"event": op, "arg": arg, "connId": "fake"}))
+        finally:
+            self.subscriptions.pop(ws, None)
+
+    def is_subscribed(self, channel: str, symbol: str) -> bool:
+        return any((channel, symbol) in subs for subs in self.subscriptions.values())
+
+    async def push(self, channel: str, symbol: str, data: list) -> int:
+        """Gửi dữ liệu cho mọi kết nối đang đăng ký (channel, symbol); trả về số kết nối nhận."""
+        payload = json.dumps({"arg": {"channel": channel, "instId": symbol}, "data": data})
+        targets = [ws for ws, subs in self.subscriptions.items() if (channel, symbol) in subs]
+        for ws in targets:
+            await ws.send(payload)
+        return len(targets)
+
+    async def push_candle(self, symbol: str, ts_ms: int, close: float, confirm: bool, channel: str = "candle1m") -> int:
+        row = [str(ts_ms), str(close), str(close), str(close), str(close), "1", "1", "1", "1" if confirm else "0"]
+        return await self.push(channel, symbol, [row])
+
+    async def push_ticker(self, symbol: str, last: float) -> int:
+        ticker = {
+            "instType": "SPOT", "instId": symbol, "last": str(last),
+            "open24h": str(last), "high24h": str(last), "low24h": str(last),
+            "ts": str(int(time.time() * 1000)),
+        }
+        return await self.push("tickers", symbol, [ticker])
+
+    async def drop_connections(self) -> None:
+        """Đóng mọi kết nối để giả lập mất mạng."""
+        for ws in list(self.subscriptions):
+            await ws.close()
+
+
+async def _serve_forever(port: int, interval: float) -> None:
+    """Chế độ demo: phát nến/ticker ngẫu nhiên cho mọi mã được đăng ký."""
+    prices: Dict[str, float] = {}
+    async with FakeOKXServer(host="0.0.0.0", port=port) as server:
+        logger.info(f"Fake OKX WebSocket đang chạy tại {server.url}")
+        while True:
+            await asyncio.sleep(interval)
+            minute_ms = int(time.time() // 60 * 60 * 1000)
+            keys = {key for subs in server.subscriptions.values() for key in subs}
+            for channel, symbol in keys:
+                price = prices.setdefault(symbol, 100.0) * (1 + random.uniform(-0.002, 0.002))
+                prices[symbol] = price
+                if channel == "tickers":
+                    await server.push_ticker(symbol, price)
+                else:
+                    await server.push_candle(symbol, minute_ms - 60_000, price, confirm=True, channel=channel)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake OKX WebSocket server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--interval", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve_forever(args.port, args.interval))
+
+
+if __name__ == "__main__":
+    main()
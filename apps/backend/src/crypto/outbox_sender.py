@@ -0,0 +1,55 @@
+"""
+Sender worker của notification outbox: claim các tin đến hạn và gửi qua Telegram.
+
+Chạy: `python -m src.crypto.outbox_sender` (chạy thêm process để tăng throughput;
+các sender dùng SKIP LOCKED nên không lấy trùng tin của nhau).
+"""
+import asyncio
+import logging
+
+from src.constants import CryptoConfig
+from src.database import dispose_async_engine, get_async_session_local
+from src.services.notification_outbox import NotificationOutboxService
+from src.services.telegram_dispatcher import TelegramDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxSender:
+    """Vòng lặp gửi: lô đầy thì claim tiếp ngay, outbox trống thì chờ `OUTBOX_POLL_INTERVAL_SECONDS`."""
+
+    def __init__(self, batch_size: int = CryptoConfig.OUTBOX_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        """Chạy đến khi `stop()` được gọi."""
+        logger.info("🚀 Outbox sender khởi động.")
+        try:
+            while not self._stopping.is_set():
+                try:
+                    async with get_async_session_local()() as db:
+                        claimed = await NotificationOutboxService.adeliver_batch(db, self.batch_size)
+                except Exception as e:
+                    logger.error(f"❌ Lỗi khi gửi lô outbox: {e}", exc_info=True)
+                    claimed = 0
+                if claimed < self.batch_size:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), CryptoConfig.OUTBOX_POLL_INTERVAL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            await TelegramDispatcher.aclose()
+            await dispose_async_engine()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+
+def main() -> None:
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    asyncio.run(OutboxSender().run())
+
+
+if __name__ == "__main__":
+    main()
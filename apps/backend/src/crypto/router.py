@@ -1,38 +1,39 @@
 """Router cho các tính năng liên quan đến Crypto."""
+from typing import Optional
+
 from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..services.crypto_scraper import CryptoScraperService
+from ..services.instrument_catalog import InstrumentCatalog
 from ..services.telegram_bot import TelegramService
 from ..services.crypto_repository import CryptoRepository
+from ..services.indicator_cache import IndicatorCache
+from ..services.signal_snapshot import SignalSnapshot
 from ..services.subscription_service import SubscriptionService
-from ..database import get_db
+from ..services.price_alerts import PriceAlertService
+from ..database import get_async_db
 from ..config import settings
 from ..constants import CryptoConfig
 
 router = APIRouter()
 
 @router.get("/prices")
-async def get_prices(db: Session = Depends(get_db)):
-    """Lấy giá crypto hiện tại kèm gợi ý đầu tư."""
-    data = CryptoScraperService.get_prices()
+async def get_prices(db: AsyncSession = Depends(get_async_db)):
+    """
+    Lấy giá crypto hiện tại kèm gợi ý đầu tư.
+
+    Đọc snapshot tín hiệu do Celery tính sẵn sau mỗi lần đóng nến; nếu chưa có
+    thì tính tại chỗ từ DB. Endpoint không ghi gì vào DB.
+    """
+    snapshot = await SignalSnapshot.aread()
+    if snapshot:
+        return snapshot["coins"]
+
+    data = await CryptoScraperService.aget_prices()
     if not data:
         raise HTTPException(status_code=503, detail="Không thể lấy dữ liệu từ OKX")
-    
-    enhanced_data = []
-    for coin in data:
-        symbol = coin.get("instId")
-        price = float(coin.get("last", 0))
-        
-        # Lấy gợi ý đầu tư và chỉ số thống kê từ DB (dữ liệu đã được Celery cập nhật)
-        suggestion = CryptoRepository.get_investment_suggestion(db, symbol, price)
-        stats = CryptoRepository.get_price_stats(db, symbol, hours=24)
-        
-        coin["suggestion"] = suggestion
-        coin["db_high_24h"] = stats["max"]
-        coin["db_low_24h"] = stats["min"]
-        enhanced_data.append(coin)
-    
-    return enhanced_data
+    snapshot = await SignalSnapshot.acompute(db, data)
+    return snapshot["coins"]
 
 @router.post("/crawl-and-notify", status_code=202)
 async def crawl_and_notify(background_tasks: BackgroundTasks):
@@ -47,34 +48,34 @@ async def crawl_and_notify(background_tasks: BackgroundTasks):
 
 
 @router.get("/accuracy")
-async def get_accuracy(db: Session = Depends(get_db)):
+async def get_accuracy(db: AsyncSession = Depends(get_async_db)):
     """Lấy báo cáo độ chính xác của các dự đoán."""
-    report = CryptoRepository.get_accuracy_report(db)
+    report = await CryptoRepository.aget_accuracy_report(db)
     return {"report": report}
 
 
+@router.get("/indicator-cache/stats")
+async def get_indicator_cache_stats():
+    """Số lần hit/miss của cache chỉ báo (process hiện tại và tổng của mọi process)."""
+    return {"process": IndicatorCache.get_stats(), "total": await IndicatorCache.aget_total_stats()}
+
+
 @router.get("/search")
 async def search_coins(q: str):
     """Tìm kiếm mã coin trên OKX."""
-    results = CryptoScraperService.search_instruments(q)
-    return results[:10]  # Giới hạn 10 kết quả
+    return await InstrumentCatalog.asearch(q, limit=10)  # Giới hạn 10 kết quả
 
 
 @router.post("/subscribe")
-async def subscribe(chat_id: str, symbol: str, db: Session = Depends(get_db)):
+async def subscribe(chat_id: str, symbol: str, db: AsyncSession = Depends(get_async_db)):
     """Đăng ký nhận thông báo cho 1 mã coin."""
-    # Kiểm tra mã có tồn tại trên OKX không
-    instruments = CryptoScraperService.get_all_instruments()
-    valid_symbols = [inst["instId"] for inst in instruments]
-    
-    # Chuẩn hóa
-    if not symbol.endswith("-USDT") and "-" not in symbol:
-        symbol = f"{symbol.upper()}-USDT"
-        
-    if symbol not in valid_symbols:
+    symbol = SubscriptionService.normalize_symbol(symbol)
+
+    # Kiểm tra mã có tồn tại trên OKX không (tra hash set trong bộ nhớ)
+    if not await InstrumentCatalog.ais_valid(symbol):
         raise HTTPException(status_code=400, detail=f"Mã {symbol} không hợp lệ trên OKX SPOT.")
         
-    sub = SubscriptionService.subscribe(db, chat_id, symbol)
+    sub = await SubscriptionService.asubscribe(db, chat_id, symbol)
     
     # Trigger backfill dữ liệu lịch sử ngay lập tức để có thể phân tích
     from .tasks import backfill_historical_data
@@ -84,16 +85,73 @@ async def subscribe(chat_id: str, symbol: str, db: Session = Depends(get_db)):
 
 
 @router.post("/unsubscribe")
-async def unsubscribe(chat_id: str, symbol: str, db: Session = Depends(get_db)):
+async def unsubscribe(chat_id: str, symbol: str, db: AsyncSession = Depends(get_async_db)):
     """Hủy đăng ký nhận thông báo."""
-    success = SubscriptionService.unsubscribe(db, chat_id, symbol)
+    success = await SubscriptionService.aunsubscribe(db, chat_id, symbol)
     if not success:
         raise HTTPException(status_code=404, detail="Không tìm thấy thông tin đăng ký.")
     return {"message": f"Đã hủy đăng ký theo dõi {symbol}"}
 
 
 @router.get("/subscriptions")
-async def list_subscriptions(chat_id: str, db: Session = Depends(get_db)):
+async def list_subscriptions(chat_id: str, db: AsyncSession = Depends(get_async_db)):
     """Lấy danh sách đăng ký của một chat_id."""
-    subs = SubscriptionService.get_user_subscriptions(db, chat_id)
+    subs = await SubscriptionService.aget_user_subscriptions(db, chat_id)
     return [s.symbol for s in subs]
+
+
+@router.post("/alerts")
+async def create_price_alert(chat_id: str, symbol: str, price: Optional[float] = None, change_pct: Optional[float] = None,
+                             db: AsyncSession = Depends(get_async_db)):
+    """Đặt cảnh báo khi giá chạm một mức (`price`) hoặc thay đổi `change_pct`% so với giá hiện tại."""
+    if (price is None) == (change_pct is None):
+        raise HTTPException(status_code=400, detail="Cần đúng một trong hai tham số price hoặc change_pct.")
+    if (price is not None and price <= 0) or change_pct == 0 or (change_pct is not None and change_pct <= -100):
+        raise HTTPException(status_code=400, detail="Mức giá hoặc % thay đổi không hợp lệ.")
+
+    symbol = SubscriptionService.normalize_symbol(symbol)
+    if not await InstrumentCatalog.ais_valid(symbol):
+        raise HTTPException(status_code=400, detail=f"Mã {symbol} không hợp lệ trên OKX SPOT.")
+
+    # Giá hiện tại: snapshot ticker, nếu không có hoặc chỉ còn bản cũ thì nến 1m mới nhất trong DB
+    tickers = await CryptoScraperService.aget_prices([symbol])
+    current_price = float(tickers[0].get("last", 0)) if tickers and not tickers[0]["stale"] else 0.0
+    if not current_price:
+        current_price = await CryptoRepository.aget_last_price(db, symbol)
+    if not current_price and tickers:
+        current_price = float(tickers[0].get("last", 0))
+    if not current_price:
+        raise HTTPException(status_code=503, detail=f"Chưa có giá hiện tại của {symbol}, thử lại sau.")
+
+    try:
+        alert = await PriceAlertService.acreate(db, chat_id, symbol, current_price, price=price, change_pct=change_pct)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Mã chưa có dữ liệu thì backfill để crawl/stream có giá so sánh ngay
+    from .tasks import backfill_historical_data
+    backfill_historical_data.delay(symbol)
+
+    return {
+        "id": alert.id, "symbol": alert.symbol, "direction": alert.direction,
+        "target_price": alert.target_price, "current_price": current_price,
+    }
+
+
+@router.get("/alerts")
+async def list_price_alerts(chat_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Các cảnh báo giá đang bật của một chat_id."""
+    alerts = await PriceAlertService.alist(db, chat_id)
+    return [
+        {"id": a.id, "symbol": a.symbol, "direction": a.direction, "target_price": a.target_price,
+         "change_pct": a.change_pct, "reference_price": a.reference_price}
+        for a in alerts
+    ]
+
+
+@router.delete("/alerts/{alert_id}")
+async def delete_price_alert(alert_id: int, chat_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Xóa một cảnh báo giá của chat_id."""
+    if not await PriceAlertService.adelete(db, chat_id, alert_id):
+        raise HTTPException(status_code=404, detail="Không tìm thấy cảnh báo giá.")
+    return {"message": f"Đã xóa cảnh báo #{alert_id}"}
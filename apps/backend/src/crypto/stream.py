@@ -0,0 +1,279 @@
+"""
+Service ingestion dài hạn: nhận nến 1m và ticker từ OKX WebSocket thay cho polling REST.
+
+Chạy: `python -m src.crypto.stream`
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from src.config import settings
+from src.constants import CryptoAssets, CryptoConfig
+from src.database import get_session_local
+from src.services.crypto_repository import CryptoRepository
+from src.services.crypto_scraper import CryptoScraperService
+from src.services.price_alerts import PriceAlertIndex, PriceAlertService
+from src.services.signal_snapshot import SignalSnapshot
+from src.services.subscription_index import SubscriptionIndex
+
+logger = logging.getLogger(__name__)
+
+CANDLE_CHANNEL = "candle1m"
+TICKER_CHANNEL = "tickers"
+
+
+def load_stream_symbols() -> List[str]:
+    """Hợp của danh sách mặc định, các mã người dùng đang đăng ký và các mã đang có cảnh báo giá."""
+    db = get_session_local()()
+    try:
+        return sorted(
+            set(CryptoAssets.DEFAULT_IDS) | set(SubscriptionIndex.symbols(db)) | set(PriceAlertIndex.symbols(db))
+        )
+    finally:
+        db.close()
+
+
+def load_last_timestamps(symbols: List[str]) -> Dict[str, datetime]:
+    """Thời điểm nến 1m mới nhất đã lưu của từng mã."""
+    db = get_session_local()()
+    try:
+        return CryptoRepository.get_last_timestamps(db, symbols, timeframe="1m")
+    finally:
+        db.close()
+
+
+def persist_candles(candles: List[Dict[str, Any]]) -> None:
+    """Lưu các nến 1m đã đóng vào DB, đánh giá cảnh báo giá rồi hẹn tính lại tín hiệu cho nến vừa đóng."""
+    # Giá đóng của nến mới nhất theo từng mã
+    prices = {c["symbol"]: c["close"] for c in sorted(candles, key=lambda c: c["timestamp"])}
+    db = get_session_local()()
+    try:
+        CryptoRepository.bulk_save_candles(db, candles, timeframe="1m", commit=False)
+        PriceAlertService.evaluate(db, prices)
+    finally:
+        db.close()
+
+    # Một task mỗi phút cho mọi mã (nến của từng mã đến trong các message riêng)
+    if not candles or not SignalSnapshot.schedule_once(max(c["timestamp"] for c in candles)):
+        return
+    from src.crypto.tasks import record_predictions_task
+    try:
+        record_predictions_task.apply_async(countdown=CryptoConfig.SIGNAL_SNAPSHOT_DELAY_SECONDS)
+    except Exception as e:
+        logger.warning(f"⚠️ Không hẹn được task tính tín hiệu: {e}")
+
+
+class OKXStreamIngestor:
+    """
+    Đăng ký kênh `candle1m` (endpoint business) và `tickers` (endpoint public) cho tập mã theo dõi.
+
+    - Chỉ lưu nến đã `confirm`.
+    - Đồng bộ lại danh sách mã định kỳ và gửi subscribe/unsubscribe phần chênh lệch.
+    - Tự reconnect với exponential backoff; sau mỗi lần (re)connect kênh nến sẽ lấy bù
+      các nến bị lỡ qua REST kể từ nến cuối cùng đã lưu.
+
+    Các hàm truy cập DB/REST được truyền vào qua constructor để có thể test offline
+    với `src.crypto.fake_okx_ws.FakeOKXServer`.
+    """
+
+    def __init__(
+        self,
+        public_url: Optional[str] = None,
+        business_url: Optional[str] = None,
+        symbols_loader: Callable[[], List[str]] = load_stream_symbols,
+        candle_sink: Callable[[List[Dict[str, Any]]], None] = persist_candles,
+        last_timestamps_loader: Callable[[List[str]], Dict[str, datetime]] = load_last_timestamps,
+        candles_fetcher: Callable[..., Awaitable[Dict[str, List[Dict[str, Any]]]]] = (
+            CryptoScraperService.aget_historical_candles_batch
+        ),
+        on_ticker: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.urls = {
+            CANDLE_CHANNEL: business_url or settings.OKX_WS_BUSINESS_URL,
+            TICKER_CHANNEL: public_url or settings.OKX_WS_PUBLIC_URL,
+        }
+        self.symbols_loader = symbols_loader
+        self.candle_sink = candle_sink
+        self.last_timestamps_loader = last_timestamps_loader
+        self.candles_fetcher = candles_fetcher
+        self.on_ticker = on_ticker
+
+        self.symbols: Set[str] = set()
+        self.tickers: Dict[str, Dict[str, Any]] = {}
+        self.last_confirmed: Dict[str, datetime] = {}
+        self.connect_count: Dict[str, int] = {CANDLE_CHANNEL: 0, TICKER_CHANNEL: 0}
+        self._sockets: Dict[str, Any] = {}
+        self._stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        """Chạy đến khi `stop()` được gọi."""
+        self.symbols = set(await asyncio.to_thread(self.symbols_loader))
+        logger.info(f"🚀 Stream ingestion khởi động với {len(self.symbols)} mã.")
+        tasks = [
+            asyncio.create_task(self._run_channel(CANDLE_CHANNEL)),
+            asyncio.create_task(self._run_channel(TICKER_CHANNEL)),
+            asyncio.create_task(self._watch_subscriptions()),
+        ]
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def _run_channel(self, channel: str) -> None:
+        """Giữ kết nối cho một kênh, reconnect với exponential backoff."""
+        backoff = 1.0
+        while not self._stopping.is_set():
+            try:
+                async with connect(self.urls[channel], ping_interval=None) as ws:
+                    self._sockets[channel] = ws
+                    self.connect_count[channel] += 1
+                    logger.info(f"🔌 Đã kết nối kênh {channel} ({self.urls[channel]})")
+                    await self._send_op(ws, "subscribe", channel, self.symbols)
+                    if channel == CANDLE_CHANNEL:
+                        await self._backfill_gaps(sorted(self.symbols))
+                    backoff = 1.0
+                    await self._consume(ws, channel)
+            except (OSError, ConnectionClosed, InvalidHandshake, asyncio.TimeoutError) as e:
+                logger.warning(f"⚠️ Mất kết nối kênh {channel}: {e}")
+            except Exception as e:
+                # Message hỏng hoặc lỗi khi lưu (DB, cảnh báo giá...): không để task kênh chết, kết nối lại
+                logger.error(f"❌ Lỗi xử lý kênh {channel}, kết nối lại: {e}", exc_info=True)
+            finally:
+                self._sockets.pop(channel, None)
+            if self._stopping.is_set():
+                break
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, CryptoConfig.STREAM_MAX_BACKOFF_SECONDS)
+
+    async def _consume(self, ws, channel: str) -> None:
+        """Đọc message; gửi "ping" khi im lặng để OKX không đóng kết nối."""
+        while True:
+            try:
+                raw = await asyncio.wait_for(ws.recv(), timeout=CryptoConfig.STREAM_PING_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                await ws.send("ping")
+                continue
+            if raw == "pong":
+                continue
+            message = json.loads(raw)
+            if "event" in message:
+                if message["event"] == "error":
+                    logger.error(f"❌ OKX WebSocket lỗi ({channel}): {message.get('msg')}")
+                continue
+            if channel == CANDLE_CHANNEL:
+                await self._handle_candles(message)
+            else:
+                self._handle_tickers(message)
+
+    async def _handle_candles(self, message: Dict[str, Any]) -> None:
+        symbol = message.get("arg", {}).get("instId")
+        confirmed = []
+        for candle in CryptoScraperService.parse_candles(message.get("data", [])):
+            last = self.last_confirmed.get(symbol)
+            if candle["confirm"] and (last is None or candle["timestamp"] > last):
+                confirmed.append({"symbol": symbol, **candle})
+        if confirmed:
+            await asyncio.to_thread(self.candle_sink, confirmed)
+            self.last_confirmed[symbol] = confirmed[-1]["timestamp"]
+
+    def _handle_tickers(self, message: Dict[str, Any]) -> None:
+        for ticker in message.get("data", []):
+            self.tickers[ticker["instId"]] = ticker
+            if self.on_ticker:
+                self.on_ticker(ticker)
+
+    async def _backfill_gaps(self, symbols: List[str]) -> None:
+        """
+        Lấy bù qua REST các nến đã đóng bị lỡ trong lúc mất kết nối.
+
+        OKX trả tối đa `OKX_CANDLES_MAX_LIMIT` nến mỗi lần gọi nên lấy lùi từng trang bằng `after`
+        cho đến khi chạm nến cuối đã lưu của từng mã (tổng cộng tối đa `STREAM_BACKFILL_LIMIT` nến).
+        """
+        if not symbols:
+            return
+        known = dict(await asyncio.to_thread(self.last_timestamps_loader, symbols))
+        known.update(self.last_confirmed)
+        since = {s: known[s] for s in symbols if s in known}
+        if not since:
+            return
+
+        gap_minutes = int((datetime.utcnow() - min(since.values())).total_seconds() // 60) + 1
+        remaining = max(1, min(gap_minutes, CryptoConfig.STREAM_BACKFILL_LIMIT))
+        fetched: Dict[str, Dict[datetime, Dict[str, Any]]] = {s: {} for s in since}
+        pending, after = list(since), None
+        while pending and remaining > 0:
+            limit = min(remaining, CryptoConfig.OKX_CANDLES_MAX_LIMIT)
+            batch = await self.candles_fetcher(pending, bar="1m", limit=limit, after=after)
+            remaining -= limit
+            # Mã còn nến cũ hơn cần lấy: trang đầy và chưa chạm nến cuối đã lưu
+            oldest = {}
+            for symbol in pending:
+                candles = batch.get(symbol, [])
+                fetched[symbol].update((c["timestamp"], c) for c in candles)
+                if len(candles) >= limit and candles[0]["timestamp"] > since[symbol]:
+                    oldest[symbol] = candles[0]["timestamp"]
+            # Con trỏ chung cho cả batch: lấy mốc muộn nhất để không bỏ sót nến của mã nào (trùng thì đã khử)
+            pending, after = list(oldest), max(oldest.values(), default=None)
+
+        missed = []
+        for symbol, by_ts in fetched.items():
+            candles = [by_ts[ts] for ts in sorted(by_ts)]
+            new = [c for c in candles if c["confirm"] and c["timestamp"] > since[symbol]]
+            if new:
+                missed.extend({"symbol": symbol, **c} for c in new)
+                self.last_confirmed[symbol] = new[-1]["timestamp"]
+        if missed:
+            logger.info(f"⏪ Lấy bù {len(missed)} nến 1m sau khi reconnect.")
+            await asyncio.to_thread(self.candle_sink, missed)
+
+    async def _watch_subscriptions(self) -> None:
+        """Định kỳ đồng bộ danh sách mã và subscribe/unsubscribe phần thay đổi."""
+        while not self._stopping.is_set():
+            await asyncio.sleep(CryptoConfig.STREAM_SUBSCRIPTION_REFRESH_SECONDS)
+            try:
+                await self.refresh_subscriptions(set(await asyncio.to_thread(self.symbols_loader)))
+            except Exception as e:
+                logger.error(f"❌ Lỗi khi đồng bộ danh sách mã stream: {e}")
+
+    async def refresh_subscriptions(self, symbols: Set[str]) -> None:
+        """Áp dụng tập mã mới lên các kết nối đang mở."""
+        added, removed = symbols - self.symbols, self.symbols - symbols
+        self.symbols = symbols
+        if not added and not removed:
+            return
+        logger.info(f"🔄 Cập nhật stream: +{len(added)} / -{len(removed)} mã.")
+        for channel, ws in list(self._sockets.items()):
+            try:
+                await self._send_op(ws, "subscribe", channel, added)
+                await self._send_op(ws, "unsubscribe", channel, removed)
+            except ConnectionClosed:
+                # Kết nối sẽ tự subscribe lại toàn bộ khi reconnect
+                pass
+        for symbol in removed:
+            self.last_confirmed.pop(symbol, None)
+            self.tickers.pop(symbol, None)
+
+    @staticmethod
+    async def _send_op(ws, op: str, channel: str, symbols: Set[str]) -> None:
+        if symbols:
+            args = [{"channel": channel, "instId": s} for s in sorted(symbols)]
+            await ws.send(json.dumps({"op": op, "args": args}))
+
+
+def main() -> None:
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    asyncio.run(OKXStreamIngestor().run())
+
+
+if __name__ == "__main__":
+    main()
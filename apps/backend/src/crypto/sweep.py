@@ -0,0 +1,53 @@
+"""
+Quét ngưỡng chấm điểm trên nến đã lưu và in bảng xếp hạng.
+
+Chạy: `python -m src.crypto.sweep --days 30 --random 200 --top 20`
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from src.constants import CryptoAssets, CryptoConfig
+from src.services.backtester import CsvCandleSource
+from src.services.param_sweep import DEFAULT_SPACE, ParamSweep, grid, random_search
+
+
+def format_table(rows, top: int) -> str:
+    names = list(DEFAULT_SPACE)
+    header = ["#", *names, "signals", "win_rate", "expectancy", "max_dd"]
+    lines = [" ".join(f"{h:>14}" for h in header)]
+    for row in rows[:top]:
+        cells = [row["rank"], *(row["params"][n] for n in names), row["signals"],
+                 f"{row['win_rate']:.1%}", f"{row['expectancy'] * 100:+.3f}%", f"{row['max_drawdown'] * 100:.2f}%"]
+        lines.append(" ".join(f"{c:>14}" for c in cells))
+    return "\n".join(lines)
+
+
+def main() -> None:
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Quét tham số Signal Scoring System trên nến đã lưu.")
+    parser.add_argument("--symbols", help="Danh sách mã, cách nhau bởi dấu phẩy (mặc định DEFAULT_IDS)")
+    parser.add_argument("--days", type=int, default=30, help="Số ngày gần nhất dùng để đánh giá")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None, help="Thời điểm kết thúc (UTC)")
+    parser.add_argument("--csv", help="Thư mục CSV <timeframe>/<symbol>.csv thay cho DB")
+    parser.add_argument("--workers", type=int, default=None, help="Số process (mặc định số CPU)")
+    parser.add_argument("--horizon", type=int, default=CryptoConfig.SIGNAL_PRIMARY_HORIZON_MINUTES)
+    parser.add_argument("--random", type=int, default=0, help="Số bộ tham số random search (mặc định: grid)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--sort-by", default="expectancy", choices=["expectancy", "win_rate", "total_return"])
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    end = args.end or datetime.utcnow()
+    symbols = args.symbols.split(",") if args.symbols else CryptoAssets.DEFAULT_IDS
+    candidates = random_search(DEFAULT_SPACE, args.random, args.seed) if args.random else grid(DEFAULT_SPACE)
+    table = ParamSweep.run(
+        symbols, end - timedelta(days=args.days), end, candidates,
+        source=CsvCandleSource(args.csv) if args.csv else None, workers=args.workers,
+        horizon_minutes=args.horizon, sort_by=args.sort_by,
+    )
+    print(format_table(table, args.top))
+
+
+if __name__ == "__main__":
+    main()
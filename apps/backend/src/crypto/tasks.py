@@ -1,12 +1,17 @@
 import logging
-import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from src.celery_app import celery_app
+from src.config import settings
 from src.database import get_session_local
 from src.services.crypto_scraper import CryptoScraperService
 from src.services.crypto_repository import CryptoRepository
-from src.services.telegram_bot import TelegramService
-from src.services.subscription_service import SubscriptionService
+from src.services.alert_digest import AlertDigest
+from src.services.notification_outbox import NotificationOutboxService
+from src.services.subscription_index import SubscriptionIndex
+from src.services.instrument_catalog import InstrumentCatalog
+from src.services.partition_manager import PartitionManager
+from src.services.price_alerts import PriceAlertIndex, PriceAlertService
+from src.services.signal_snapshot import SignalSnapshot
 from src.constants import CryptoAssets, CryptoConfig
 from src.models import CryptoHistory, CryptoDaily
 
@@ -21,36 +26,24 @@ def backfill_historical_data(symbol: str = None):
     db = get_session_local()()
     
     try:
-        for s in symbols:
-            # 1. Backfill nến 1 phút (Để tính TA ngắn hạn)
-            count_1m = db.query(CryptoHistory).filter(CryptoHistory.symbol == s).count()
-            if count_1m < 50:
-                logger.info(f"⏳ Backfill 300 nến 1m cho {s}...")
-                candles = CryptoScraperService.get_historical_candles(s, bar="1m", limit=300)
-                for c in candles:
-                    db.add(CryptoHistory(
-                        symbol=s, 
-                        open=c["open"], high=c["high"], low=c["low"], 
-                        close=c["close"], volume=c["volume"], 
-                        timestamp=c["timestamp"]
-                    ))
-                db.commit()
-                time.sleep(2) # Nghỉ để không bị rate limit
-            
-            # 2. Backfill nến 1 Ngày (Để xem xu hướng dài hạn)
-            count_1d = db.query(CryptoDaily).filter(CryptoDaily.symbol == s).count()
-            if count_1d < 10:
-                logger.info(f"⏳ Backfill 100 nến 1D cho {s}...")
-                candles = CryptoScraperService.get_historical_candles(s, bar="1D", limit=100)
-                for c in candles:
-                    db.add(CryptoDaily(
-                        symbol=s, 
-                        open=c["open"], high=c["high"], low=c["low"], 
-                        close=c["close"], volume=c["volume"], 
-                        timestamp=c["timestamp"]
-                    ))
-                db.commit()
-                time.sleep(2)
+        # 1. Backfill nến 1 phút (Để tính TA ngắn hạn)
+        need_1m = [s for s in symbols if db.query(CryptoHistory).filter(CryptoHistory.symbol == s).count() < 50]
+        if need_1m:
+            logger.info(f"⏳ Backfill 300 nến 1m cho {len(need_1m)} mã: {', '.join(need_1m)}")
+            # Lấy song song, rate limit do token bucket dùng chung đảm nhiệm (không cần sleep)
+            batch = CryptoScraperService.get_historical_candles_batch(need_1m, bar="1m", limit=300)
+            rows = [{"symbol": s, **c} for s, candles in batch.items() for c in candles]
+            CryptoRepository.bulk_save_candles(db, rows, timeframe="1m", commit=False)
+        
+        # 2. Backfill nến 1 Ngày (Để xem xu hướng dài hạn)
+        need_1d = [s for s in symbols if db.query(CryptoDaily).filter(CryptoDaily.symbol == s).count() < 10]
+        if need_1d:
+            logger.info(f"⏳ Backfill 100 nến 1D cho {len(need_1d)} mã: {', '.join(need_1d)}")
+            batch = CryptoScraperService.get_historical_candles_batch(need_1d, bar="1D", limit=100)
+            rows = [{"symbol": s, **c} for s, candles in batch.items() for c in candles]
+            CryptoRepository.bulk_save_candles(db, rows, timeframe="1D", commit=False)
+        
+        db.commit()
                 
     except Exception as e:
         logger.error(f"❌ Lỗi khi backfill dữ liệu: {e}")
@@ -63,14 +56,10 @@ def update_daily_candles():
     """Cập nhật nến ngày định kỳ (mỗi giờ)."""
     db = get_session_local()()
     try:
-        for s in CryptoAssets.DEFAULT_IDS:
-            candles = CryptoScraperService.get_historical_candles(s, bar="1D", limit=1)
-            if candles:
-                c = candles[0]
-                CryptoRepository.save_price(
-                    db, s, c["close"], timeframe="1D", timestamp=c["timestamp"],
-                    open_p=c["open"], high=c["high"], low=c["low"], volume=c["volume"]
-                )
+        # Lấy 2 nến: sau khi qua ngày, nến hôm qua (đã đóng) ghi đè bản đang chạy đã lưu lần trước
+        batch = CryptoScraperService.get_historical_candles_batch(CryptoAssets.DEFAULT_IDS, bar="1D", limit=2)
+        rows = [{"symbol": s, **c} for s, candles in batch.items() for c in candles]
+        CryptoRepository.bulk_save_candles(db, rows, timeframe="1D")
         logger.info("✅ Đã cập nhật nến ngày OHLCV cho các tài sản.")
     finally:
         db.close()
@@ -85,13 +74,17 @@ def crawl_and_save_prices():
     db = get_session_local()()
     
     try:
-        # Lấy danh sách mặc định + danh sách người dùng đăng ký
-        subscribed_symbols = SubscriptionService.get_all_subscribed_symbols(db)
-        symbols_to_crawl = list(set(CryptoAssets.DEFAULT_IDS + subscribed_symbols))
+        # Lấy danh sách mặc định + danh sách người dùng đăng ký + các mã đang có cảnh báo giá
+        subscribed_symbols = SubscriptionIndex.symbols(db)
+        symbols_to_crawl = list(set(CryptoAssets.DEFAULT_IDS + subscribed_symbols + PriceAlertIndex.symbols(db)))
         
-        for symbol in symbols_to_crawl:
-            # Lấy nến 1m gần nhất từ OKX
-            candles = CryptoScraperService.get_historical_candles(symbol, bar="1m", limit=2)
+        # Lấy nến 1m gần nhất từ OKX cho tất cả các mã song song
+        batch = CryptoScraperService.get_historical_candles_batch(symbols_to_crawl, bar="1m", limit=2)
+        rows = []
+        alerts = []
+        prices = {}
+        
+        for symbol, candles in batch.items():
             if not candles:
                 continue
             
@@ -99,55 +92,57 @@ def crawl_and_save_prices():
             # Thông thường OKX trả về nến mới nhất ở cuối list (get_historical_candles đã reverse lại)
             latest_candle = candles[-1]
             current_price = latest_candle["close"]
+            prices[symbol] = current_price
             
             # 1. Kiểm tra biến động (so với nến trước đó)
             if len(candles) > 1:
                 prev_price = candles[-2]["close"]
                 diff_pct = ((current_price - prev_price) / prev_price) * 100
                 
-                if abs(diff_pct) >= 1.0:
-                    alert_msg = f"<b>⚠️ BIẾN ĐỘNG MẠNH: {symbol}</b>\n"
-                    alert_msg += f"💰 Giá: ${current_price:,.2f} ({diff_pct:+.2f}%)\n"
-                    
-                    # Gửi cho admin mặc định (nếu có)
-                    TelegramService.send_message(alert_msg)
-                    
-                    # Gửi cho những người đã đăng ký mã này
-                    subs = db.query(UserSubscription).filter(
-                        UserSubscription.symbol == symbol, 
-                        UserSubscription.is_active == True
-                    ).all()
-                    for sub in subs:
-                        if sub.chat_id != settings.TELEGRAM_CHAT_ID: # Tránh gửi trùng nếu chat_id là admin
-                            TelegramService.send_message(alert_msg, chat_id=sub.chat_id)
-
-            # 2. Lưu nến 1m với đầy đủ OHLCV
-            CryptoRepository.save_price(
-                db, 
-                symbol=symbol, 
-                price=current_price, 
-                timeframe="1m", 
-                timestamp=latest_candle["timestamp"],
-                open_p=latest_candle["open"],
-                high=latest_candle["high"],
-                low=latest_candle["low"],
-                volume=latest_candle["volume"]
-            )
+                if abs(diff_pct) >= CryptoConfig.VOLATILITY_THRESHOLD_PCT:
+                    # Gom theo chat thành digest, ghi outbox cùng transaction với nến
+                    alerts.append({"symbol": symbol, "price": current_price, "change_pct": diff_pct})
+
+            # 2. Gom nến 1m (đầy đủ OHLCV) để upsert một lần cho cả chu kỳ:
+            #    nến trước đã đóng sẽ ghi đè bản đang chạy đã lưu ở chu kỳ trước
+            rows.extend({"symbol": symbol, **c} for c in candles)
             
-        logger.info(f"✨ Đã cập nhật dữ liệu nến 1m cho {len(CryptoAssets.DEFAULT_IDS)} đồng coin.")
+        CryptoRepository.bulk_save_candles(db, rows, timeframe="1m", commit=False)
+        PriceAlertService.evaluate(db, prices, commit=False)
+        AlertDigest.publish(db, alerts)
+        logger.info(f"✨ Đã cập nhật dữ liệu nến 1m cho {len(symbols_to_crawl)} đồng coin.")
+        
+        # Tính lại tín hiệu + snapshot cho /prices với dữ liệu nến vừa ghi
+        record_predictions_task.delay()
         
     except Exception as e:
         logger.error(f"❌ Lỗi trong task crawl_and_save_prices: {e}")
     finally:
         db.close()
 
+@celery_app.task
+def flush_alert_digests():
+    """Ghi digest cảnh báo của các chat đã hết cửa sổ gom (khi ALERT_DIGEST_WINDOW_SECONDS > 0)."""
+    if CryptoConfig.ALERT_DIGEST_WINDOW_SECONDS <= 0:
+        return
+    db = get_session_local()()
+    try:
+        sent = AlertDigest.flush_due(db)
+        if sent:
+            logger.info(f"🔔 Đã đưa {sent} digest cảnh báo vào outbox.")
+    except Exception as e:
+        logger.error(f"❌ Lỗi khi gửi digest cảnh báo: {e}")
+    finally:
+        db.close()
+
 @celery_app.task
 def send_periodic_report():
     """Gửi báo cáo thị trường định kỳ mỗi 10 phút."""
     logger.info("📊 Celery Task: Đang chuẩn bị báo cáo định kỳ...")
     db = get_session_local()()
     try:
-        data = CryptoScraperService.get_prices()
+        # Báo cáo định kỳ chấp nhận snapshot ticker cũ tới 1 phút
+        data = CryptoScraperService.get_prices(max_age=60)
         if not data:
             logger.warning("⚠️ Báo cáo định kỳ: Không lấy được giá từ OKX.")
             return
@@ -156,22 +151,27 @@ def send_periodic_report():
 
         message = "<b>📋 BÁO CÁO THỊ TRƯỜNG ĐỊNH KỲ</b>\n"
         message += f"<code>⏱ {datetime.now().strftime('%H:%M | %d/%m/%Y')}</code>\n"
+        if data[0]["stale"]:
+            # OKX lỗi, giá lấy từ snapshot dự phòng cũ hơn 1 phút
+            fetched_at = datetime.fromtimestamp(data[0]["fetched_at"]).strftime('%H:%M')
+            message += f"<i>⚠️ Không cập nhật được giá mới, dùng giá lúc {fetched_at}.</i>\n"
         message += "━━━━━━━━━━━━━━━━━━\n\n"
 
-        for coin in data:
-            symbol = coin.get("instId")
-            price = float(coin.get("last", 0))
-            suggestion = CryptoRepository.get_investment_suggestion(db, symbol, price)
+        prices = {coin.get("instId"): float(coin.get("last", 0)) for coin in data}
+        suggestions = CryptoRepository.get_investment_suggestions(db, prices)
+
+        for symbol, price in prices.items():
+            suggestion = suggestions[symbol]["suggestion"]
             
             message += f"🔸 <b>{symbol.replace('-USDT', '')}</b>: ${price:,.2f}\n"
             message += f"┗ 💡 {suggestion}\n"
             message += "──────────────────\n"
 
-        success = TelegramService.send_message(message)
-        if success:
-            logger.info("✅ Đã gửi báo cáo định kỳ đến Telegram thành công.")
-        else:
-            logger.error("❌ Thất bại khi gửi báo cáo định kỳ qua Telegram Service.")
+        if not settings.TELEGRAM_CHAT_ID:
+            logger.error("❌ TELEGRAM_CHAT_ID chưa được cấu hình, bỏ qua báo cáo định kỳ.")
+            return
+        NotificationOutboxService.enqueue(db, [(settings.TELEGRAM_CHAT_ID, message)], kind="REPORT")
+        logger.info("✅ Đã đưa báo cáo định kỳ vào outbox.")
             
     except Exception as e:
         logger.error(f"❌ Lỗi nghiêm trọng trong task gửi báo cáo định kỳ: {e}", exc_info=True)
@@ -185,16 +185,46 @@ def cleanup_old_prices():
     db = get_session_local()()
     try:
         # Giữ nến 1m trong 2 ngày (đủ để xem chart ngắn hạn)
-        count_1m = CryptoRepository.clear_old_data(db, hours=48, timeframe="1m")
+        retention_hours = CryptoConfig.HISTORY_1M_RETENTION_HOURS
+        if PartitionManager.is_partitioned(db, CryptoHistory.__tablename__):
+            # Xóa nguyên partition ngày đã hết hạn thay cho DELETE từng dòng
+            cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+            dropped = PartitionManager.drop_partitions_before(db, CryptoHistory.__tablename__, cutoff)
+            logger.info(f"✅ Đã xóa {dropped} partition nến 1m cũ.")
+        else:
+            count_1m = CryptoRepository.clear_old_data(db, hours=retention_hours, timeframe="1m")
+            logger.info(f"✅ Đã xóa {count_1m} nến 1m cũ.")
         # Giữ nến 1D trong 90 ngày (đủ để xem xu hướng quý)
         count_1d = CryptoRepository.clear_old_data(db, hours=168*12, timeframe="1D") 
-        logger.info(f"✅ Đã xóa {count_1m} nến 1m và {count_1d} nến 1D cũ.")
+        logger.info(f"✅ Đã xóa {count_1d} nến 1D cũ.")
+        count_outbox = NotificationOutboxService.clear_sent(db)
+        logger.info(f"✅ Đã xóa {count_outbox} tin outbox cũ.")
     except Exception as e:
         logger.error(f"❌ Lỗi khi dọn dẹp dữ liệu: {e}")
     finally:
         db.close()
 
 
+@celery_app.task
+def maintain_candle_partitions():
+    """Tạo trước partition ngày cho crypto_history để ingestion không bao giờ thiếu partition."""
+    db = get_session_local()()
+    try:
+        table = CryptoHistory.__tablename__
+        if not PartitionManager.is_partitioned(db, table):
+            return
+        today = datetime.utcnow().date()
+        created = PartitionManager.ensure_partitions(
+            db, table, today, today + timedelta(days=CryptoConfig.PARTITION_PREMAKE_DAYS)
+        )
+        logger.info(f"✅ Đã tạo {created} partition mới cho {table}.")
+    except Exception as e:
+        logger.error(f"❌ Lỗi khi tạo partition: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
 @celery_app.task
 def validate_signals_task():
     """Kiểm tra kết quả của các tín hiệu đã phát ra."""
@@ -211,22 +241,45 @@ def validate_signals_task():
 
 @celery_app.task
 def record_predictions_task():
-    """Tự động phân tích và lưu tín hiệu mỗi 5 phút."""
+    """
+    Tính tín hiệu một lần cho mỗi nến đóng: ghi các tín hiệu BUY/SELL và cập nhật
+    snapshot tín hiệu cho `/prices`. Được gọi sau mỗi lần ghi nến (crawl/stream) và
+    định kỳ làm dự phòng; các lần gọi trùng cùng một nến sẽ bị bỏ qua.
+    """
     logger.info("🤖 Celery Task: Bắt đầu tự động phân tích và ghi tín hiệu...")
     db = get_session_local()()
+    claimed = None
     try:
         data = CryptoScraperService.get_prices()
         if not data:
             return
 
-        for coin in data:
-            symbol = coin.get("instId")
-            price = float(coin.get("last", 0))
-            # Hàm này đã bao gồm logic record_signal bên trong
-            CryptoRepository.get_investment_suggestion(db, symbol, price)
+        symbols = [coin.get("instId") for coin in data]
+        last_timestamps = CryptoRepository.get_last_timestamps(db, symbols, timeframe="1m")
+        candle_ts = max(last_timestamps.values()) if last_timestamps else None
+        if candle_ts and not SignalSnapshot.claim(candle_ts):
+            logger.info(f"⏭️ Tín hiệu cho nến {candle_ts} đã được tính, bỏ qua.")
+            return
+        claimed = candle_ts
+
+        # Chấm điểm toàn bộ danh sách trong một lượt, ghi tín hiệu và công bố snapshot
+        snapshot = SignalSnapshot.compute(db, data, record=True, candle_ts=candle_ts)
+        SignalSnapshot.publish(snapshot)
             
         logger.info("✅ Hoàn tất lượt tự động phân tích.")
     except Exception as e:
         logger.error(f"❌ Lỗi khi tự động phân tích tín hiệu: {e}")
+        if claimed:
+            SignalSnapshot.release(claimed)
     finally:
         db.close()
+
+
+@celery_app.task
+def refresh_instrument_catalog():
+    """Tải lại danh mục instrument SPOT từ OKX vào Redis cho /search và /subscribe."""
+    try:
+        count = InstrumentCatalog.refresh()
+        logger.info(f"✅ Đã làm mới danh mục {count} instrument.")
+    except Exception as e:
+        logger.error(f"❌ Lỗi khi làm mới danh mục instrument: {e}")
@@ -1,8 +1,10 @@
 """Cấu hình database và session management."""
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 # Import models để đảm bảo chúng được tạo trong database
 from .models import Base, User, AuthAuditLog, FailedLoginAttempt
@@ -10,6 +12,14 @@ from .models import Base, User, AuthAuditLog, FailedLoginAttempt
 # Lazy loading engine và session
 _engine: Optional[object] = None
 _SessionLocal: Optional[object] = None
+_async_engine: Optional[object] = None
+_AsyncSessionLocal: Optional[object] = None
+
+# Driver async tương ứng với driver sync trong DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
 
 def get_engine():
@@ -47,6 +57,58 @@ def get_db():
         db.close()
 
 
+def to_async_url(url: str) -> str:
+    """Đổi DATABASE_URL (psycopg2/sqlite) sang driver async (asyncpg/aiosqlite)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Không hỗ trợ async cho database '{backend}'")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    """Lazy load async engine (dùng cho các route FastAPI; Celery vẫn dùng engine sync)."""
+    global _async_engine
+    if _async_engine is None:
+        from .config import settings
+        _async_engine = create_async_engine(
+            to_async_url(settings.DATABASE_URL),
+            pool_pre_ping=True,
+            pool_recycle=300
+        )
+    return _async_engine
+
+
+def get_async_session_local():
+    """Lazy load async session factory."""
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency để lấy async database session.
+
+    Yields:
+        AsyncSession: Database session không chặn event loop
+    """
+    async with get_async_session_local()() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    """Đóng pool kết nối async khi ứng dụng tắt."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _AsyncSessionLocal = None
+
+
 def create_tables():
     """Create all tables."""
     Base.metadata.create_all(bind=get_engine()) 
\ No newline at end of file
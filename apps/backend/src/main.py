@@ -10,6 +10,11 @@ from .auth.router import router as auth_router
 from .crypto.router import router as crypto_router
 
 from .config import settings
+from .database import dispose_async_engine, get_async_session_local
+from .services.okx_client import OKXClient
+from .services.telegram_dispatcher import TelegramDispatcher
+from .services.instrument_catalog import InstrumentCatalog
+from .services.subscription_index import SubscriptionIndex
 
 # Import models để đảm bảo chúng được tạo trong database
 from .models import User, AuthAuditLog, FailedLoginAttempt, UserProfile
@@ -51,6 +56,22 @@ app.include_router(auth_router, prefix="/api", tags=["Authentication"])
 app.include_router(crypto_router, prefix="/api/crypto", tags=["Crypto"])
 
 
+@app.on_event("startup")
+async def warm_caches():
+    """Nạp sẵn danh mục instrument và dựng lại index đăng ký từ DB."""
+    await InstrumentCatalog.aget_index()
+    async with get_async_session_local()() as db:
+        await SubscriptionIndex.arebuild(db)
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Đóng connection pool OKX, Telegram và pool kết nối DB async khi tắt ứng dụng."""
+    await OKXClient.aclose()
+    await TelegramDispatcher.aclose()
+    await dispose_async_engine()
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "environment": settings.ENVIRONMENT}
@@ -7,13 +7,17 @@ from typing import Optional
 from sqlalchemy import (
     Boolean,
     Column,
+    Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     Float,
+    UniqueConstraint,
     func,
+    true,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
@@ -115,17 +119,26 @@ class UserProfile(Base):
 
 
 class CryptoHistory(Base):
-    """Lưu trữ nến 1 phút (1m) đầy đủ OHLCV."""
+    """
+    Lưu trữ nến 1 phút (1m) đầy đủ OHLCV.
+
+    Trên PostgreSQL bảng được partition theo ngày trên cột timestamp (migration 008),
+    khóa chính thực tế là (id, timestamp); ORM vẫn định danh bản ghi bằng id.
+    """
     __tablename__ = "crypto_history"
+    __table_args__ = (
+        UniqueConstraint("symbol", "timestamp", name="uq_crypto_history_symbol_timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    symbol = Column(String(50), index=True, nullable=False)
+    symbol = Column(String(50), nullable=False)
     open = Column(Float, nullable=True)
     high = Column(Float, nullable=True)
     low = Column(Float, nullable=True)
     close = Column(Float, nullable=False) # Đây là cột price cũ
     volume = Column(Float, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    is_confirmed = Column(Boolean, default=True, server_default=true(), nullable=False) # False khi nến còn đang chạy
 
     def __repr__(self):
         return f"<CryptoHistory(symbol='{self.symbol}', close={self.close})>"
@@ -134,20 +147,42 @@ class CryptoHistory(Base):
 class CryptoDaily(Base):
     """Lưu trữ nến ngày (1D) đầy đủ OHLCV."""
     __tablename__ = "crypto_daily"
+    __table_args__ = (
+        UniqueConstraint("symbol", "timestamp", name="uq_crypto_daily_symbol_timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    symbol = Column(String(50), index=True, nullable=False)
+    symbol = Column(String(50), nullable=False)
     open = Column(Float, nullable=True)
     high = Column(Float, nullable=True)
     low = Column(Float, nullable=True)
     close = Column(Float, nullable=False)
     volume = Column(Float, nullable=True)
     timestamp = Column(DateTime, nullable=False)
+    is_confirmed = Column(Boolean, default=True, server_default=true(), nullable=False)
 
     def __repr__(self):
         return f"<CryptoDaily(symbol='{self.symbol}', close={self.close})>"
 
 
+# Index phủ (covering) cho truy vấn nến mới nhất/lịch sử gần nhất của một mã:
+# lọc theo symbol, sắp xếp giảm dần theo timestamp và đọc OHLCV ngay từ index (index-only scan).
+CANDLE_INDEX_INCLUDE = ["open", "high", "low", "close", "volume"]
+
+Index(
+    "ix_crypto_history_symbol_timestamp_desc",
+    CryptoHistory.symbol,
+    CryptoHistory.timestamp.desc(),
+    postgresql_include=CANDLE_INDEX_INCLUDE,
+)
+Index(
+    "ix_crypto_daily_symbol_timestamp_desc",
+    CryptoDaily.symbol,
+    CryptoDaily.timestamp.desc(),
+    postgresql_include=CANDLE_INDEX_INCLUDE,
+)
+
+
 class TradingSignal(Base):
     """Theo dõi các tín hiệu để tính tỷ lệ thắng (Win Rate)."""
     __tablename__ = "trading_signals"
@@ -163,10 +198,56 @@ class TradingSignal(Base):
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
     closed_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("ix_trading_signals_status_timestamp", "status", "timestamp"),
+    )
+
     def __repr__(self):
         return f"<TradingSignal(symbol='{self.symbol}', type='{self.signal_type}', result={self.result})>"
 
 
+class SignalStats(Base):
+    """
+    Thống kê tín hiệu đã đóng theo (ngày phát tín hiệu, mã, loại), được cộng dồn ngay
+    trong bước đối soát để báo cáo độ chính xác không phải quét trading_signals.
+    """
+    __tablename__ = "signal_stats"
+
+    day = Column(Date, primary_key=True)
+    symbol = Column(String(50), primary_key=True)
+    signal_type = Column(String(20), primary_key=True)  # BUY, SELL
+    wins = Column(Integer, nullable=False, default=0, server_default="0")
+    losses = Column(Integer, nullable=False, default=0, server_default="0")
+    draws = Column(Integer, nullable=False, default=0, server_default="0")
+    return_sum = Column(Float, nullable=False, default=0, server_default="0")  # Tổng lợi nhuận (tỷ lệ) theo hướng tín hiệu
+
+    def __repr__(self):
+        return f"<SignalStats(day={self.day}, symbol='{self.symbol}', type='{self.signal_type}', wins={self.wins})>"
+
+
+class SignalOutcome(Base):
+    """
+    Kết quả của một tín hiệu tại từng mốc thời gian (5m, 15m, 1h, 4h...), đối soát
+    bằng giá đóng cửa nến 1m tại `timestamp tín hiệu + horizon`.
+    """
+    __tablename__ = "signal_outcomes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    signal_id = Column(Integer, ForeignKey("trading_signals.id", ondelete="CASCADE"), nullable=False)
+    horizon_minutes = Column(Integer, nullable=False)
+    exit_price = Column(Float, nullable=True)  # NULL khi không có nến quanh mốc thời gian
+    result = Column(String(20), nullable=False)  # WIN, LOSS, DRAW, NO_DATA
+    candle_timestamp = Column(DateTime, nullable=True)  # Nến được dùng để đối soát
+    evaluated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("signal_id", "horizon_minutes", name="uq_signal_outcomes_signal_horizon"),
+    )
+
+    def __repr__(self):
+        return f"<SignalOutcome(signal_id={self.signal_id}, horizon={self.horizon_minutes}m, result={self.result})>"
+
+
 class UserSubscription(Base):
     """Đăng ký nhận thông báo biến động cho các mã Crypto."""
     __tablename__ = "user_subscriptions"
@@ -178,4 +259,63 @@ class UserSubscription(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f"<UserSubscription(chat_id='{self.chat_id}', symbol='{self.symbol}')>"
\ No newline at end of file
+        return f"<UserSubscription(chat_id='{self.chat_id}', symbol='{self.symbol}')>"
+
+class NotificationOutbox(Base):
+    """
+    Hàng đợi thông báo Telegram bền vững: producer ghi theo lô, sender worker claim các dòng
+    đến hạn bằng `FOR UPDATE SKIP LOCKED` rồi gửi, lỗi thì hẹn gửi lại với backoff.
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(String(50), nullable=False)
+    kind = Column(String(20), nullable=False)  # ALERT, REPORT
+    text = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="PENDING", server_default="PENDING")  # PENDING, SENT, FAILED
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    latency_ms = Column(Integer, nullable=True)  # sent_at - created_at
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # Chỉ index các dòng chờ gửi để claim không phải quét lịch sử đã gửi
+        Index(
+            "ix_notification_outbox_pending", "next_attempt_at",
+            postgresql_where=status == "PENDING", sqlite_where=status == "PENDING",
+        ),
+    )
+
+    def __repr__(self):
+        return f"<NotificationOutbox(id={self.id}, chat_id='{self.chat_id}', status={self.status})>"
+
+
+class PriceAlert(Base):
+    """
+    Cảnh báo giá do người dùng đặt: chạm mức giá, hoặc tăng/giảm `change_pct`% so với giá lúc
+    đặt (quy đổi sẵn thành `target_price`). Cảnh báo chỉ bắn một lần rồi tắt.
+    """
+    __tablename__ = "price_alerts"
+
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(String(50), index=True, nullable=False)
+    symbol = Column(String(50), nullable=False)
+    direction = Column(String(10), nullable=False)  # ABOVE: giá >= target, BELOW: giá <= target
+    target_price = Column(Float, nullable=False)
+    change_pct = Column(Float, nullable=True)  # Chỉ có với cảnh báo theo %
+    reference_price = Column(Float, nullable=True)  # Giá lúc đặt cảnh báo
+    is_active = Column(Boolean, nullable=False, default=True, server_default=true())
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    triggered_at = Column(DateTime, nullable=True)
+    triggered_price = Column(Float, nullable=True)
+
+    __table_args__ = (
+        # Đồng bộ tăng dần index trong bộ nhớ theo thời điểm thay đổi
+        Index("ix_price_alerts_updated_at", "updated_at"),
+    )
+
+    def __repr__(self):
+        return f"<PriceAlert(id={self.id}, symbol='{self.symbol}', {self.direction} {self.target_price})>"
@@ -0,0 +1,45 @@
+"""Kết nối Redis dùng chung cho cache, rate limit và các index trong bộ nhớ."""
+
+import asyncio
+import weakref
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+# Lazy loading client
+_redis: Optional[redis.Redis] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+
+# Timeout ngắn để khi Redis chết thì các caller fallback nhanh thay vì treo
+SOCKET_TIMEOUT = 2.0
+
+
+def get_redis() -> redis.Redis:
+    """Lazy load Redis client đồng bộ (Celery, script)."""
+    global _redis
+    if _redis is None:
+        from .config import settings
+        _redis = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=SOCKET_TIMEOUT,
+            socket_connect_timeout=SOCKET_TIMEOUT,
+        )
+    return _redis
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Lazy load Redis client bất đồng bộ cho event loop hiện tại."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from .config import settings
+        client = aioredis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=SOCKET_TIMEOUT,
+            socket_connect_timeout=SOCKET_TIMEOUT,
+        )
+        _async_clients[loop] = client
+    return client
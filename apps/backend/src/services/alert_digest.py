@@ -0,0 +1,131 @@
+"""Gom cảnh báo biến động theo chat_id thành một tin digest trước khi đưa vào outbox."""
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..constants import CryptoConfig
+from ..redis_client import get_redis
+from .notification_outbox import NotificationOutboxService
+from .subscription_index import SubscriptionIndex
+
+logger = logging.getLogger(__name__)
+
+Alert = Dict[str, Any]  # {"symbol", "price", "change_pct"}
+
+
+def render_digest(alerts: List[Alert]) -> str:
+    """Một tin cho nhiều cảnh báo: mã biến động mạnh nhất đứng đầu, tối đa ALERT_DIGEST_MAX_LINES dòng."""
+    if len(alerts) == 1:
+        a = alerts[0]
+        return (f"<b>⚠️ BIẾN ĐỘNG MẠNH: {a['symbol']}</b>\n"
+                f"💰 Giá: ${a['price']:,.2f} ({a['change_pct']:+.2f}%)\n")
+
+    ranked = sorted(alerts, key=lambda a: (-abs(a["change_pct"]), a["symbol"]))
+    limit = CryptoConfig.ALERT_DIGEST_MAX_LINES
+    message = f"<b>⚠️ BIẾN ĐỘNG MẠNH: {len(alerts)} mã</b>\n"
+    for a in ranked[:limit]:
+        message += f"🔸 <b>{a['symbol'].replace('-USDT', '')}</b>: ${a['price']:,.2f} ({a['change_pct']:+.2f}%)\n"
+    if len(ranked) > limit:
+        message += f"… và {len(ranked) - limit} mã khác\n"
+    return message
+
+
+class AlertDigest:
+    """
+    Gom cảnh báo theo chat: mỗi chat nhận tối đa một tin cho mỗi chu kỳ crawl (hoặc mỗi cửa sổ
+    `ALERT_DIGEST_WINDOW_SECONDS`), cảnh báo lặp lại của cùng một mã chỉ giữ bản mới nhất.
+
+    Cửa sổ = 0: gom trong bộ nhớ và ghi outbox ngay trong transaction của crawl. Cửa sổ > 0:
+    cảnh báo được đệm trong Redis (`alerts:digest:{chat_id}`, hash theo mã) và
+    `flush_due` (Celery beat) ghi digest của các chat đã hết cửa sổ vào outbox.
+    """
+
+    BUFFER_KEY_PREFIX = "alerts:digest"
+    DUE_KEY = "alerts:digest:due"  # ZSET chat_id -> thời điểm hết cửa sổ
+
+    @classmethod
+    def buffer_key(cls, chat_id: str) -> str:
+        return f"{cls.BUFFER_KEY_PREFIX}:{chat_id}"
+
+    @staticmethod
+    def route(alerts: List[Alert], db: Optional[Session] = None) -> Dict[str, Dict[str, Alert]]:
+        """chat_id -> {symbol: alert} cho admin và những người đăng ký từng mã."""
+        subscribers = SubscriptionIndex.subscribers({a["symbol"] for a in alerts}, db)
+        by_chat: Dict[str, Dict[str, Alert]] = defaultdict(dict)
+        for alert in alerts:
+            chats = set(subscribers[alert["symbol"]])
+            if settings.TELEGRAM_CHAT_ID:
+                chats.add(str(settings.TELEGRAM_CHAT_ID))
+            for chat_id in chats:
+                by_chat[chat_id][alert["symbol"]] = alert
+        return by_chat
+
+    @staticmethod
+    def _enqueue(db: Session, by_chat: Dict[str, Dict[str, Alert]], commit: bool) -> int:
+        messages = [(chat_id, render_digest(list(alerts.values()))) for chat_id, alerts in sorted(by_chat.items())]
+        return NotificationOutboxService.enqueue(db, messages, kind="ALERT", commit=commit)
+
+    @classmethod
+    def publish(cls, db: Session, alerts: List[Alert], commit: bool = True) -> int:
+        """
+        Đưa cảnh báo của một chu kỳ vào digest.
+
+        Returns:
+            Số tin đã ghi vào outbox (0 nếu cảnh báo đang được đệm chờ hết cửa sổ).
+        """
+        if not alerts:
+            if commit:
+                db.commit()
+            return 0
+        by_chat = cls.route(alerts, db)
+        window = CryptoConfig.ALERT_DIGEST_WINDOW_SECONDS
+        if window > 0:
+            try:
+                cls._buffer(by_chat, window)
+                if commit:
+                    db.commit()
+                return 0
+            except (RedisError, OSError) as e:
+                logger.warning(f"Không đệm được cảnh báo vào Redis, gửi digest ngay: {e}")
+        sent = cls._enqueue(db, by_chat, commit)
+        logger.info(f"🔔 {sum(len(a) for a in by_chat.values())} cảnh báo gom thành {sent} tin")
+        return sent
+
+    @classmethod
+    def _buffer(cls, by_chat: Dict[str, Dict[str, Alert]], window: float) -> None:
+        deadline = time.time() + window
+        pipe = get_redis().pipeline(transaction=True)
+        for chat_id, alerts in by_chat.items():
+            key = cls.buffer_key(chat_id)
+            # Cùng mã trong cửa sổ: ghi đè bằng cảnh báo mới nhất
+            pipe.hset(key, mapping={symbol: json.dumps(alert) for symbol, alert in alerts.items()})
+            pipe.expire(key, int(window * 10) + 60)
+            # NX: cửa sổ tính từ cảnh báo đầu tiên, không bị đẩy lùi bởi cảnh báo sau
+            pipe.zadd(cls.DUE_KEY, {chat_id: deadline}, nx=True)
+        pipe.execute()
+
+    @classmethod
+    def flush_due(cls, db: Session, now: Optional[float] = None) -> int:
+        """Ghi digest của các chat đã hết cửa sổ vào outbox; trả về số tin đã ghi."""
+        client = get_redis()
+        chat_ids = client.zrangebyscore(cls.DUE_KEY, "-inf", time.time() if now is None else now)
+        if not chat_ids:
+            return 0
+        # Lấy và xóa bộ đệm trong một MULTI: lượt flush chạy song song chỉ nhận hash rỗng
+        pipe = client.pipeline(transaction=True)
+        for chat_id in chat_ids:
+            pipe.hgetall(cls.buffer_key(chat_id))
+            pipe.delete(cls.buffer_key(chat_id))
+        pipe.zrem(cls.DUE_KEY, *chat_ids)
+        buffers = pipe.execute()[:-1:2]
+        by_chat = {
+            chat_id: {symbol: json.loads(raw) for symbol, raw in buffer.items()}
+            for chat_id, buffer in zip(chat_ids, buffers) if buffer
+        }
+        return cls._enqueue(db, by_chat, commit=True)
@@ -0,0 +1,268 @@
+"""
+Backtest mô hình chấm điểm tín hiệu trên nến đã lưu (DB hoặc file CSV xuất ra).
+
+Mỗi phút trong khoảng backtest được chấm điểm đúng như pipeline live: cửa sổ 100 nến 1m
+gần nhất, 30 nến ngày (nến ngày đang chạy lấy giá hiện tại làm giá đóng cửa), cùng hàm
+`score_components`/`classify_scores`. Tín hiệu được đối soát bằng giá đóng cửa tại
+`timestamp + horizon` như `validate_signals`. Các mã chạy song song trên process pool.
+"""
+import csv
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import select
+
+from ..constants import CryptoConfig
+from ..models import CryptoDaily, CryptoHistory
+from . import ta_numpy
+from .signal_outcomes import asof_close, datetimes, minutes
+from .signal_scoring import BB_STD, DEFAULT_PARAMS, ScoringParams, classify_scores, score_components
+from .ta_service import MIN_DATA_POINTS
+
+logger = logging.getLogger(__name__)
+
+WINDOW_1M = 100  # Khớp limit của get_investment_suggestions
+WINDOW_1D = 30
+
+Series = Tuple[np.ndarray, np.ndarray]  # (timestamp datetime64[us], close float64)
+
+
+# ---------- Nguồn dữ liệu ----------
+
+class DatabaseCandleSource:
+    """Đọc nến từ CryptoHistory/CryptoDaily theo từng mã (stream theo lô, không nạp ORM)."""
+
+    spec = ("db", None)
+
+    @staticmethod
+    def load(symbol: str, timeframe: str, start: datetime, end: datetime) -> Series:
+        from ..database import get_session_local
+
+        model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        db = get_session_local()()
+        try:
+            stmt = select(model.timestamp, model.close).where(
+                model.symbol == symbol, model.timestamp.between(start, end)
+            ).order_by(model.timestamp).execution_options(yield_per=CryptoConfig.BACKTEST_CHUNK_SIZE)
+            ts, close = [], []
+            for partition in db.execute(stmt).partitions():
+                for row_ts, row_close in partition:
+                    ts.append(row_ts)
+                    close.append(row_close)
+            return datetimes(ts), np.asarray(close, dtype=float)
+        finally:
+            db.close()
+
+
+class CsvCandleSource:
+    """Đọc nến từ file CSV `<root>/<timeframe>/<symbol>.csv` (cột timestamp ISO-8601 và close)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.spec = ("csv", root)
+
+    def load(self, symbol: str, timeframe: str, start: datetime, end: datetime) -> Series:
+        path = os.path.join(self.root, timeframe, f"{symbol}.csv")
+        if not os.path.exists(path):
+            return datetimes([]), np.array([])
+        with open(path, newline="") as f:
+            rows = [(datetime.fromisoformat(r["timestamp"]), float(r["close"])) for r in csv.DictReader(f)]
+        rows = sorted(r for r in rows if start <= r[0] <= end)
+        return datetimes([r[0] for r in rows]), np.asarray([r[1] for r in rows], dtype=float)
+
+
+def source_from_spec(spec: Tuple[str, Optional[str]]):
+    kind, arg = spec
+    return CsvCandleSource(arg) if kind == "csv" else DatabaseCandleSource()
+
+
+# ---------- Phần tính toán (hàm thuần) ----------
+
+def _windowed_last(values: np.ndarray, fn, chunk_size: int) -> np.ndarray:
+    """Áp `fn` lên từng cửa sổ (hàng) theo lô và lấy giá trị tại nến cuối cửa sổ."""
+    out = np.empty(len(values))
+    for lo in range(0, len(values), chunk_size):
+        out[lo:lo + chunk_size] = fn(np.ascontiguousarray(values[lo:lo + chunk_size]))[:, -1]
+    return out
+
+
+def replay_features(ts_1m: np.ndarray, close_1m: np.ndarray, ts_1d: np.ndarray, close_1d: np.ndarray,
+                    chunk_size: int = CryptoConfig.BACKTEST_CHUNK_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Chỉ báo đầu vào của mô hình chấm điểm tại mọi nến 1m có đủ cửa sổ 100 nến
+    (bỏ qua WINDOW_1M - 1 nến đầu). Không phụ thuộc ScoringParams nên chỉ cần tính một lần.
+
+    Returns:
+        {"index": chỉ số nến 1m, "price", "rsi_1m", "bb_upper", "bb_lower", "rsi_1d"} —
+        giá hiện tại là giá đóng cửa của nến đó.
+    """
+    if len(close_1m) < WINDOW_1M:
+        empty = np.array([])
+        return {"index": np.array([], dtype=int), "price": empty, "rsi_1m": empty,
+                "bb_upper": empty, "bb_lower": empty, "rsi_1d": empty}
+    index = np.arange(WINDOW_1M - 1, len(close_1m))
+    price = close_1m[index]
+
+    # RSI phụ thuộc điểm bắt đầu cửa sổ (trung bình Wilder) nên phải tính trên từng cửa sổ
+    windows_1m = sliding_window_view(close_1m, WINDOW_1M)
+    rsi_1m = _windowed_last(windows_1m, lambda w: ta_numpy.rsi(w, length=14), chunk_size)
+    # Bollinger Bands chỉ dùng 20 nến cuối, tính trên cả chuỗi cho cùng kết quả
+    bb_upper, _, bb_lower = ta_numpy.bbands(close_1m, length=20, std=BB_STD)
+
+    # Cửa sổ ngày: 29 nến ngày đã đóng trước nến ngày hiện tại + giá hiện tại
+    current_day = np.searchsorted(ts_1d, ts_1m[index], side="right") - 1
+    day_idx = current_day[:, None] + np.arange(-(WINDOW_1D - 1), 0)[None, :]
+    daily = np.where(day_idx >= 0, close_1d[np.clip(day_idx, 0, None)] if len(close_1d) else np.nan, np.nan)
+    daily = np.concatenate([daily, np.where(current_day >= 0, price, np.nan)[:, None]], axis=1)
+    rsi_1d = _windowed_last(daily, lambda w: ta_numpy.rsi(w, length=14), chunk_size)
+    rsi_1d[ta_numpy.valid_count(daily) < MIN_DATA_POINTS] = np.nan
+
+    return {"index": index, "price": price, "rsi_1m": rsi_1m,
+            "bb_upper": bb_upper[index], "bb_lower": bb_lower[index], "rsi_1d": rsi_1d}
+
+
+def score_features(features: Dict[str, np.ndarray], params: ScoringParams = DEFAULT_PARAMS) -> np.ndarray:
+    """Tổng điểm tại từng nến từ các chỉ báo đã tính sẵn."""
+    components = score_components(features["rsi_1m"], features["bb_upper"], features["bb_lower"],
+                                  features["rsi_1d"], features["price"], params)
+    return np.sum(components, axis=0)
+
+
+def replay_scores(ts_1m: np.ndarray, close_1m: np.ndarray, ts_1d: np.ndarray, close_1d: np.ndarray,
+                  params: ScoringParams = DEFAULT_PARAMS,
+                  chunk_size: int = CryptoConfig.BACKTEST_CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """(chỉ số nến 1m được chấm, điểm) — xem `replay_features`."""
+    features = replay_features(ts_1m, close_1m, ts_1d, close_1d, chunk_size)
+    return features["index"], score_features(features, params)
+
+
+def forward_returns(ts_1m: np.ndarray, close_1m: np.ndarray, index: np.ndarray,
+                    horizon_minutes: int) -> np.ndarray:
+    """
+    Biến động giá (exit - entry) / entry từ nến `index` tới `timestamp + horizon`
+    (as-of join như `validate_signals`); NaN khi không có nến đối soát.
+    """
+    targets = ts_1m[index] + minutes(horizon_minutes)
+    found, _, exit_price = asof_close(ts_1m, close_1m, targets,
+                                      minutes(CryptoConfig.SIGNAL_OUTCOME_TOLERANCE_MINUTES))
+    if ts_1m.size:
+        found &= targets < ts_1m[-1]
+    entry = close_1m[index]
+    return np.where(found, (exit_price - entry) / entry, np.nan)
+
+
+def _max_drawdown(returns: np.ndarray) -> float:
+    """Sụt giảm lớn nhất của đường lợi nhuận cộng dồn (theo tỷ lệ)."""
+    if not returns.size:
+        return 0.0
+    equity = np.concatenate([[0.0], np.cumsum(returns)])
+    return float(np.max(np.maximum.accumulate(equity) - equity))
+
+
+def summarize(returns: np.ndarray, results: np.ndarray) -> Dict[str, Any]:
+    """Win rate, expectancy (lợi nhuận TB mỗi kèo) và drawdown của một chuỗi kèo theo thời gian."""
+    total = int(results.size)
+    wins = int(np.count_nonzero(results == 1))
+    return {
+        "signals": total,
+        "wins": wins,
+        "losses": int(np.count_nonzero(results == -1)),
+        "draws": int(np.count_nonzero(results == 0)),
+        "win_rate": wins / total if total else 0.0,
+        "expectancy": float(returns.mean()) if total else 0.0,
+        "total_return": float(returns.sum()),
+        "max_drawdown": _max_drawdown(returns),
+    }
+
+
+def simulate(ts_1m: np.ndarray, close_1m: np.ndarray, ts_1d: np.ndarray, close_1d: np.ndarray,
+             start: datetime, params: ScoringParams = DEFAULT_PARAMS,
+             horizon_minutes: int = CryptoConfig.SIGNAL_PRIMARY_HORIZON_MINUTES,
+             cooldown_minutes: int = 0) -> Tuple[Dict[str, Any], np.ndarray, np.ndarray]:
+    """
+    Phát tín hiệu tại mỗi nến có điểm vượt ngưỡng (cách nhau ít nhất `cooldown_minutes`)
+    và đối soát tại `timestamp + horizon`; tín hiệu không có nến đối soát bị bỏ qua.
+
+    Returns:
+        (chỉ số tổng hợp, thời điểm các kèo đã đối soát, lợi nhuận từng kèo)
+    """
+    index, scores = replay_scores(ts_1m, close_1m, ts_1d, close_1d, params)
+    direction = classify_scores(scores, params)
+    emit = (direction != 0) & (ts_1m[index] >= datetimes(start))
+    index, direction = index[emit], direction[emit]
+
+    if cooldown_minutes and index.size:
+        keep, last = [], None
+        gap = minutes(cooldown_minutes)
+        for k, t in enumerate(ts_1m[index]):
+            if last is None or t - last >= gap:
+                keep.append(k)
+                last = t
+        index, direction = index[keep], direction[keep]
+
+    change = forward_returns(ts_1m, close_1m, index, horizon_minutes)
+    found = ~np.isnan(change)
+    returns = direction[found] * change[found]
+    return summarize(returns, np.sign(returns)), ts_1m[index][found], returns
+
+
+# ---------- Điều phối ----------
+
+def _backtest_symbol(symbol: str, start: datetime, end: datetime, params: ScoringParams,
+                     horizon_minutes: int, cooldown_minutes: int,
+                     source_spec: Tuple[str, Optional[str]]) -> Tuple[str, Dict[str, Any], np.ndarray, np.ndarray]:
+    """Chạy trong process con: tự đọc dữ liệu của mã (không truyền mảng lớn qua pickle)."""
+    source = source_from_spec(source_spec)
+    ts_1m, close_1m = source.load(symbol, "1m", start - timedelta(minutes=3 * WINDOW_1M), end)
+    ts_1d, close_1d = source.load(symbol, "1D", start - timedelta(days=2 * WINDOW_1D), end)
+    metrics, trade_ts, returns = simulate(ts_1m, close_1m, ts_1d, close_1d, start, params,
+                                          horizon_minutes, cooldown_minutes)
+    return symbol, metrics, trade_ts, returns
+
+
+class Backtester:
+    """Chạy backtest cho nhiều mã song song (mỗi mã một tác vụ trên process pool)."""
+
+    @staticmethod
+    def run(symbols: Sequence[str], start: datetime, end: datetime,
+            params: ScoringParams = DEFAULT_PARAMS, source=None, workers: Optional[int] = None,
+            horizon_minutes: int = CryptoConfig.SIGNAL_PRIMARY_HORIZON_MINUTES,
+            cooldown_minutes: int = 0) -> Dict[str, Any]:
+        """
+        Returns:
+            {"params", "symbols": {symbol: chỉ số}, "total": chỉ số gộp mọi mã theo thời gian}
+        """
+        source = source or DatabaseCandleSource()
+        workers = workers or os.cpu_count() or 1
+        args = [(s, start, end, params, horizon_minutes, cooldown_minutes, source.spec) for s in symbols]
+
+        if workers == 1:
+            outputs = [_backtest_symbol(*a) for a in args]
+        else:
+            # spawn: process con tự tạo engine DB, không kế thừa connection pool của process cha
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+                outputs = list(pool.map(_backtest_symbol, *zip(*args))) if args else []
+
+        per_symbol: Dict[str, Dict[str, Any]] = {}
+        all_ts: List[np.ndarray] = []
+        all_returns: List[np.ndarray] = []
+        for symbol, metrics, trade_ts, returns in outputs:
+            per_symbol[symbol] = metrics
+            all_ts.append(trade_ts)
+            all_returns.append(returns)
+            logger.info(f"📈 Backtest {symbol}: {metrics['signals']} kèo, win rate {metrics['win_rate']:.1%}")
+
+        returns = np.concatenate(all_returns) if all_returns else np.array([])
+        order = np.argsort(np.concatenate(all_ts), kind="stable") if all_ts else np.array([], dtype=int)
+        returns = returns[order]
+        return {
+            "params": params.to_dict(),
+            "symbols": per_symbol,
+            "total": summarize(returns, np.sign(returns)),
+        }
@@ -1,11 +1,20 @@
 """Repository quản lý dữ liệu lịch sử Crypto."""
+import csv
+import io
 from sqlalchemy.orm import Session
-from sqlalchemy import func, delete
-from datetime import datetime, timedelta
-from ..models import CryptoHistory, CryptoDaily, TradingSignal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import DateTime, Float, Integer, String, case, column, func, delete, insert, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from ..models import CryptoHistory, CryptoDaily, SignalOutcome, SignalStats, TradingSignal
 from ..constants import CryptoConfig
 import logging
-from .ta_service import TechnicalAnalysisService
+from .indicator_cache import IndicatorCache
+from .indicator_engine import IndicatorEngine
+from .signal_outcomes import RESOLVED_RESULTS, evaluate_outcomes, signal_return
+from .signal_scoring import score_table
 
 logger = logging.getLogger(__name__)
 
@@ -16,14 +25,7 @@ class CryptoRepository:
     def record_signal(db: Session, symbol: str, signal_type: str, score: int, entry_price: float):
         """Lưu một tín hiệu mới để theo dõi hiệu quả (Bỏ cooldown để test)."""
         try:
-            new_signal = TradingSignal(
-                symbol=symbol,
-                signal_type=signal_type,
-                score=score,
-                entry_price=entry_price,
-                status="PENDING",
-                timestamp=datetime.utcnow()
-            )
+            new_signal = CryptoRepository._new_signal(symbol, signal_type, score, entry_price)
             db.add(new_signal)
             db.commit()
             db.refresh(new_signal)
@@ -35,114 +37,423 @@ class CryptoRepository:
             return None
 
     @staticmethod
-    def validate_signals(db: Session):
-        """Kiểm tra kết quả các tín hiệu sau 1 giờ."""
-        from .crypto_scraper import CryptoScraperService
-        
-        # Lấy các tín hiệu PENDING đã đủ thời gian chờ (ít nhất 1 phút) để giá kịp biến động
-        threshold = datetime.utcnow() - timedelta(minutes=CryptoConfig.SIGNAL_VALIDATE_THRESHOLD_MINUTES)
-        pending_signals = db.query(TradingSignal).filter(
-            TradingSignal.status == "PENDING",
-            TradingSignal.timestamp <= threshold
-        ).all()
+    def record_signals(db: Session, scores: List[Dict]) -> int:
+        """Lưu tín hiệu BUY/SELL của cả bảng điểm trong một lần commit."""
+        signals = [
+            CryptoRepository._new_signal(row["symbol"], row["signal_type"], row["score"], row["price"])
+            for row in scores if row["signal_type"]
+        ]
+        if not signals:
+            return 0
+        try:
+            db.add_all(signals)
+            db.commit()
+            logger.info(f"✅ Đã ghi nhận {len(signals)} tín hiệu.")
+            return len(signals)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Lỗi khi lưu TradingSignal: {e}")
+            return 0
 
-        if not pending_signals:
+    @staticmethod
+    async def arecord_signals(db: AsyncSession, scores: List[Dict]) -> int:
+        """Phiên bản async của `record_signals`."""
+        signals = [
+            CryptoRepository._new_signal(row["symbol"], row["signal_type"], row["score"], row["price"])
+            for row in scores if row["signal_type"]
+        ]
+        if not signals:
+            return 0
+        try:
+            db.add_all(signals)
+            await db.commit()
+            logger.info(f"✅ Đã ghi nhận {len(signals)} tín hiệu.")
+            return len(signals)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"❌ Lỗi khi lưu TradingSignal: {e}")
             return 0
 
-        # Lấy giá hiện tại từ OKX
-        current_data = CryptoScraperService.get_prices()
-        price_map = {item["instId"]: float(item["last"]) for item in current_data}
+    @staticmethod
+    def _new_signal(symbol: str, signal_type: str, score: int, entry_price: float) -> TradingSignal:
+        return TradingSignal(
+            symbol=symbol,
+            signal_type=signal_type,
+            score=score,
+            entry_price=entry_price,
+            status="PENDING",
+            timestamp=datetime.utcnow()
+        )
+
+    @staticmethod
+    def pending_signals_batch_stmt(threshold: datetime, after_id: int, batch_size: int):
+        """
+        Lô tín hiệu PENDING kế tiếp (phân trang theo id) đã qua mốc đối soát ngắn nhất.
+
+        `FOR UPDATE SKIP LOCKED` để nhiều worker chia nhau các lô mà không tranh cùng dòng.
+        """
+        return select(
+            TradingSignal.id, TradingSignal.symbol, TradingSignal.signal_type,
+            TradingSignal.entry_price, TradingSignal.timestamp,
+        ).where(
+            TradingSignal.status == "PENDING",
+            TradingSignal.timestamp <= threshold,
+            TradingSignal.id > after_id,
+        ).order_by(TradingSignal.id).limit(batch_size).with_for_update(skip_locked=True)
+
+    @staticmethod
+    def outcome_candles_stmt(symbols: List[str], start: datetime, end: datetime):
+        """Giá đóng cửa nến 1m của các mã trong khoảng [start, end] (dùng index symbol, timestamp)."""
+        return select(CryptoHistory.symbol, CryptoHistory.timestamp, CryptoHistory.close).where(
+            CryptoHistory.symbol.in_(symbols),
+            CryptoHistory.timestamp.between(start, end),
+        ).order_by(CryptoHistory.symbol, CryptoHistory.timestamp)
+
+    @staticmethod
+    def close_signals_stmt(dialect: str, closed: List[Dict]):
+        """
+        Một câu UPDATE đóng nhiều tín hiệu với exit_price/result/closed_at riêng của từng dòng.
+
+        Trên PostgreSQL dùng `UPDATE ... FROM (VALUES ...)`; các DB khác (SQLite khi test)
+        dùng biểu thức CASE theo id.
+        """
+        ids = [row["id"] for row in closed]
+        if dialect == "postgresql":
+            data = values(
+                column("id", Integer), column("exit_price", Float), column("result", String),
+                column("closed_at", DateTime), name="closed",
+            ).data([(row["id"], row["exit_price"], row["result"], row["closed_at"]) for row in closed])
+            exit_price, result, closed_at = data.c.exit_price, data.c.result, data.c.closed_at
+            join = TradingSignal.id == data.c.id
+        else:
+            def by_id(name):
+                return case({row["id"]: row[name] for row in closed}, value=TradingSignal.id)
+            exit_price, result, closed_at = by_id("exit_price"), by_id("result"), by_id("closed_at")
+            join = TradingSignal.id.in_(ids)
+
+        return update(TradingSignal).where(join, TradingSignal.status == "PENDING").values(
+            exit_price=exit_price, status="COMPLETED", result=result, closed_at=closed_at,
+        ).execution_options(synchronize_session=False)
+
+    @staticmethod
+    def validate_signals(db: Session, batch_size: int = CryptoConfig.SIGNAL_VALIDATE_BATCH_SIZE,
+                         now: datetime = None) -> int:
+        """
+        Đối soát tín hiệu PENDING bằng giá đóng cửa nến 1m đã lưu tại đúng
+        `timestamp + horizon` cho từng mốc trong `SIGNAL_HORIZONS_MINUTES` (không gọi OKX,
+        chạy lại cho cùng kết quả).
+
+        Mỗi mốc có kết quả được ghi vào signal_outcomes; khi đủ mọi mốc, tín hiệu được
+        đóng với exit_price/result của mốc chính (`SIGNAL_PRIMARY_HORIZON_MINUTES`).
+        Mỗi lô commit riêng để nhả khóa sớm.
+
+        Returns:
+            int: Số tín hiệu đã đóng.
+        """
+        horizons = CryptoConfig.SIGNAL_HORIZONS_MINUTES
+        primary = CryptoConfig.SIGNAL_PRIMARY_HORIZON_MINUTES
+        now = now or datetime.utcnow()
+        threshold = now - timedelta(minutes=min(horizons))
+        dialect = db.get_bind().dialect.name
 
         count = 0
-        for signal in pending_signals:
-            curr_price = price_map.get(signal.symbol)
-            if not curr_price:
-                continue
-            
-            signal.exit_price = curr_price
-            signal.status = "COMPLETED"
-            signal.closed_at = datetime.utcnow()
-            
-            # Tính toán kết quả
-            if signal.signal_type == "BUY":
-                signal.result = "WIN" if curr_price > signal.entry_price else "LOSS"
-            else: # SELL
-                signal.result = "WIN" if curr_price < signal.entry_price else "LOSS"
-            
-            count += 1
-        
-        db.commit()
+        after_id = 0
+        while True:
+            signals = db.execute(
+                CryptoRepository.pending_signals_batch_stmt(threshold, after_id, batch_size)
+            ).all()
+            if not signals:
+                break
+            after_id = signals[-1].id
+            ids = [s.id for s in signals]
+            symbols = sorted({s.symbol for s in signals})
+
+            # (signal_id, horizon) -> (exit_price, result) của các mốc đã đối soát
+            existing = {
+                (row.signal_id, row.horizon_minutes): (row.exit_price, row.result)
+                for row in db.execute(select(
+                    SignalOutcome.signal_id, SignalOutcome.horizon_minutes,
+                    SignalOutcome.exit_price, SignalOutcome.result,
+                ).where(SignalOutcome.signal_id.in_(ids))).all()
+            }
+            start = min(s.timestamp for s in signals) + timedelta(
+                minutes=min(horizons) - CryptoConfig.SIGNAL_OUTCOME_TOLERANCE_MINUTES
+            )
+            end = max(s.timestamp for s in signals) + timedelta(minutes=max(horizons))
+            candles = db.execute(CryptoRepository.outcome_candles_stmt(symbols, start, end)).all()
+
+            outcomes = evaluate_outcomes(
+                signals, candles, CryptoRepository.get_last_timestamps(db, symbols, timeframe="1m"),
+                horizons, now, CryptoConfig.SIGNAL_OUTCOME_TOLERANCE_MINUTES,
+                CryptoConfig.SIGNAL_OUTCOME_GRACE_MINUTES, done=set(existing),
+            )
+            if outcomes:
+                db.execute(insert(SignalOutcome), [{**o, "evaluated_at": now} for o in outcomes])
+                for o in outcomes:
+                    existing[(o["signal_id"], o["horizon_minutes"])] = (o["exit_price"], o["result"])
+
+            closed = []
+            for s in signals:
+                if all((s.id, h) in existing for h in horizons):
+                    exit_price, result = existing[(s.id, primary)]
+                    closed.append({
+                        "id": s.id, "exit_price": exit_price, "result": result,
+                        "closed_at": s.timestamp + timedelta(minutes=max(horizons)),
+                    })
+            if closed:
+                db.execute(CryptoRepository.close_signals_stmt(dialect, closed))
+                # Cộng dồn thống kê trong cùng transaction với việc đóng tín hiệu
+                CryptoRepository._increment_signal_stats(
+                    db, CryptoRepository._stats_increments(signals, closed)
+                )
+            db.commit()
+            count += len(closed)
+            if len(signals) < batch_size:
+                break
         return count
 
+    STATS_COUNTERS = ("wins", "losses", "draws", "return_sum")
+
+    @staticmethod
+    def _stats_increments(signals, closed: List[Dict]) -> List[Dict]:
+        """Gom các tín hiệu vừa đóng thành phần cộng thêm cho signal_stats theo (ngày, mã, loại)."""
+        by_id = {s.id: s for s in signals}
+        increments: Dict[tuple, Dict] = {}
+        for row in closed:
+            if row["result"] not in RESOLVED_RESULTS:
+                continue
+            signal = by_id[row["id"]]
+            key = (signal.timestamp.date(), signal.symbol, signal.signal_type)
+            inc = increments.setdefault(key, {
+                "day": key[0], "symbol": key[1], "signal_type": key[2],
+                "wins": 0, "losses": 0, "draws": 0, "return_sum": 0.0,
+            })
+            inc[{"WIN": "wins", "LOSS": "losses", "DRAW": "draws"}[row["result"]]] += 1
+            inc["return_sum"] += signal_return(signal.signal_type, signal.entry_price, row["exit_price"])
+        return list(increments.values())
+
+    @staticmethod
+    def _increment_signal_stats(db: Session, increments: List[Dict]) -> None:
+        """INSERT ... ON CONFLICT DO UPDATE cộng dồn bộ đếm (an toàn khi nhiều worker cùng ghi)."""
+        if not increments:
+            return
+        dialect_insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+        stmt = dialect_insert(SignalStats)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "symbol", "signal_type"],
+            set_={c: getattr(SignalStats, c) + stmt.excluded[c] for c in CryptoRepository.STATS_COUNTERS},
+        )
+        db.execute(stmt, increments)
+
+    @staticmethod
+    def accuracy_stats_stmt(since: date):
+        """
+        Bộ đếm theo mã (toàn thời gian và từ ngày `since`) trong một lượt đọc signal_stats.
+        """
+        recent = SignalStats.day >= since
+        return select(
+            SignalStats.symbol,
+            func.sum(SignalStats.wins).label("wins"),
+            func.sum(SignalStats.wins + SignalStats.losses + SignalStats.draws).label("total"),
+            func.sum(SignalStats.return_sum).label("return_sum"),
+            func.coalesce(func.sum(SignalStats.wins).filter(recent), 0).label("wins_7d"),
+            func.coalesce(
+                func.sum(SignalStats.wins + SignalStats.losses + SignalStats.draws).filter(recent), 0
+            ).label("total_7d"),
+        ).group_by(SignalStats.symbol)
+
     @staticmethod
     def get_accuracy_report(db: Session):
-        """Lấy báo cáo tỷ lệ chính xác."""
-        total = db.query(TradingSignal).filter(TradingSignal.status == "COMPLETED").count()
+        """Lấy báo cáo tỷ lệ chính xác (đọc từ bảng thống kê cộng dồn)."""
+        week_ago = datetime.utcnow().date() - timedelta(days=7)
+        rows = db.execute(CryptoRepository.accuracy_stats_stmt(week_ago)).all()
+        return CryptoRepository._format_accuracy_report(rows)
+
+    @staticmethod
+    async def aget_accuracy_report(db: AsyncSession):
+        """Phiên bản async của `get_accuracy_report`."""
+        week_ago = datetime.utcnow().date() - timedelta(days=7)
+        rows = (await db.execute(CryptoRepository.accuracy_stats_stmt(week_ago))).all()
+        return CryptoRepository._format_accuracy_report(rows)
+
+    @staticmethod
+    def _format_accuracy_report(rows) -> str:
+        total = sum(r.total for r in rows)
         if total == 0:
             return "Chưa có đủ dữ liệu đối soát tín hiệu."
         
-        wins = db.query(TradingSignal).filter(
-            TradingSignal.status == "COMPLETED",
-            TradingSignal.result == "WIN"
-        ).count()
-        
+        wins = sum(r.wins for r in rows)
+        total_7d = sum(r.total_7d for r in rows)
+        wins_7d = sum(r.wins_7d for r in rows)
         win_rate = (wins / total) * 100
-        
-        # Thống kê theo tuần
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        total_7d = db.query(TradingSignal).filter(
-            TradingSignal.status == "COMPLETED",
-            TradingSignal.timestamp >= week_ago
-        ).count()
-        
-        wins_7d = db.query(TradingSignal).filter(
-            TradingSignal.status == "COMPLETED",
-            TradingSignal.result == "WIN",
-            TradingSignal.timestamp >= week_ago
-        ).count()
-        
         win_rate_7d = (wins_7d / total_7d * 100) if total_7d > 0 else 0
+        avg_return = sum(r.return_sum for r in rows) / total * 100
 
         report = (
             f"📊 <b>THỐNG KÊ ĐỘ CHÍNH XÁC</b>\n"
             f"━━━━━━━━━━━━━━━━━━\n"
             f"🏆 Tổng Win Rate: <b>{win_rate:.1f}%</b>\n"
-            f"📈 Tổng số kèo: {total} ({wins} Thắng)\n\n"
+            f"📈 Tổng số kèo: {total} ({wins} Thắng)\n"
+            f"💵 Lợi nhuận TB mỗi kèo: {avg_return:+.2f}%\n\n"
             f"📅 Trong 7 ngày qua:\n"
             f"┗ Win Rate: <b>{win_rate_7d:.1f}%</b>\n"
             f"┗ Số kèo: {total_7d}\n"
-            f"━━━━━━━━━━━━━━━━━━"
         )
+        by_symbol = sorted((r for r in rows if r.total), key=lambda r: (-r.total, r.symbol))
+        if by_symbol:
+            report += "\n🔎 Theo mã:\n"
+            for r in by_symbol[:CryptoConfig.ACCURACY_REPORT_TOP_SYMBOLS]:
+                report += (f"┗ {r.symbol.replace('-USDT', '')}: {r.wins / r.total * 100:.1f}% "
+                           f"({r.total} kèo, TB {r.return_sum / r.total * 100:+.2f}%)\n")
+        report += "━━━━━━━━━━━━━━━━━━"
         return report
 
     @staticmethod
     def save_price(db: Session, symbol: str, price: float, timeframe: str = "1m", timestamp: datetime = None, 
-                   open_p: float = None, high: float = None, low: float = None, volume: float = None):
-        """Lưu nến mới vào lịch sử."""
+                   open_p: float = None, high: float = None, low: float = None, volume: float = None,
+                   confirmed: bool = True):
+        """Lưu (upsert) một nến vào lịch sử."""
+        CryptoRepository.bulk_save_candles(db, [{
+            "symbol": symbol, "open": open_p, "high": high, "low": low, "close": price,
+            "volume": volume, "timestamp": timestamp, "confirm": confirmed
+        }], timeframe=timeframe)
+
+    CANDLE_COLUMNS = ("symbol", "open", "high", "low", "close", "volume", "timestamp", "is_confirmed")
+    CANDLE_UPDATE_COLUMNS = ("open", "high", "low", "close", "volume", "is_confirmed")
+
+    @staticmethod
+    def _candle_row(candle: Dict) -> Dict:
+        """Chuẩn hóa một nến (dict từ OKX) thành bản ghi để ghi hàng loạt."""
+        price = candle["close"]
+        return {
+            "symbol": candle["symbol"],
+            "open": candle.get("open") or price,
+            "high": candle.get("high") or price,
+            "low": candle.get("low") or price,
+            "close": price,
+            "volume": candle.get("volume") or 0,
+            "timestamp": candle.get("timestamp") or datetime.utcnow(),
+            "is_confirmed": bool(candle.get("confirm", True)),
+        }
+
+    @staticmethod
+    def _upsert_rows(db: Session, model, rows: List[Dict]) -> None:
+        """INSERT nhiều dòng ... ON CONFLICT (symbol, timestamp) DO UPDATE chỉ với nến chưa đóng."""
+        dialect = db.get_bind().dialect.name
+        dialect_insert = sqlite_insert if dialect == "sqlite" else pg_insert
+        stmt = dialect_insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["symbol", "timestamp"],
+            set_={c: stmt.excluded[c] for c in CryptoRepository.CANDLE_UPDATE_COLUMNS},
+            where=model.__table__.c.is_confirmed.is_(False),
+        )
+        db.execute(stmt, rows)
+
+    @staticmethod
+    def _copy_upsert_rows(db: Session, table_name: str, rows: List[Dict]) -> None:
+        """COPY vào bảng tạm rồi upsert sang bảng chính trong transaction của session (psycopg2)."""
+        columns = ", ".join(CryptoRepository.CANDLE_COLUMNS)
+        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in CryptoRepository.CANDLE_UPDATE_COLUMNS)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[c].isoformat() if c == "timestamp" else row[c] for c in CryptoRepository.CANDLE_COLUMNS])
+        buffer.seek(0)
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.execute(f"CREATE TEMP TABLE candle_staging (LIKE {table_name} INCLUDING DEFAULTS)")
+            cursor.copy_expert(f"COPY candle_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM candle_staging "
+                f"ON CONFLICT (symbol, timestamp) DO UPDATE SET {updates} "
+                f"WHERE {table_name}.is_confirmed = false"
+            )
+            cursor.execute("DROP TABLE candle_staging")
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def bulk_save_candles(db: Session, candles: List[Dict], timeframe: str = "1m", commit: bool = True) -> int:
+        """
+        Upsert một lô nến của nhiều mã trong một câu lệnh (idempotent theo symbol + timestamp).
+        
+        Nến đã tồn tại chỉ được cập nhật khi bản ghi cũ chưa đóng (`is_confirmed = false`),
+        nên nến đang chạy được ghi đè tại chỗ cho tới khi OKX trả về `confirm`.
+        Lô lớn trên PostgreSQL dùng COPY vào bảng tạm rồi upsert, còn lại dùng
+        INSERT nhiều dòng ... ON CONFLICT DO UPDATE.
+        
+        Args:
+            candles: Danh sách dict có symbol, open, high, low, close, volume, timestamp, confirm.
+            timeframe: "1m" (CryptoHistory) hoặc "1D" (CryptoDaily).
+            commit: Commit ngay; truyền False để caller gộp vào transaction của cả chu kỳ.
+            
+        Returns:
+            int: Số nến đã gửi xuống DB.
+        """
+        if not candles:
+            return 0
         model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        # Một câu lệnh ON CONFLICT không được chạm cùng một dòng hai lần: giữ bản cuối cùng
+        deduped = {}
+        for c in candles:
+            row = CryptoRepository._candle_row(c)
+            deduped[(row["symbol"], row["timestamp"])] = row
+        rows = list(deduped.values())
         
-        db_history = model(
-            symbol=symbol, 
-            open=open_p if open_p else price,
-            high=high if high else price,
-            low=low if low else price,
-            close=price,
-            volume=volume if volume else 0,
-            timestamp=timestamp if timestamp else datetime.utcnow()
-        )
-        db.add(db_history)
-        db.commit()
-        db.refresh(db_history)
-        return db_history
+        latest: Dict[str, datetime] = {}
+        for row in rows:
+            if row["symbol"] not in latest or row["timestamp"] > latest[row["symbol"]]:
+                latest[row["symbol"]] = row["timestamp"]
+        # Cache chỉ báo của các mã này hết hiệu lực khi transaction commit
+        IndicatorCache.invalidate_on_commit(db, timeframe, latest)
+        
+        if db.get_bind().dialect.name == "postgresql" and len(rows) >= CryptoConfig.BULK_COPY_MIN_ROWS:
+            CryptoRepository._copy_upsert_rows(db, model.__tablename__, rows)
+        else:
+            CryptoRepository._upsert_rows(db, model, rows)
+        
+        if commit:
+            db.commit()
+        return len(rows)
+
+    @staticmethod
+    def last_price_stmt(model, symbol: str):
+        """Giá đóng cửa của nến mới nhất; chỉ chọn cột có trong index phủ (symbol, timestamp DESC)."""
+        return select(model.close).where(
+            model.symbol == symbol
+        ).order_by(model.timestamp.desc()).limit(1)
+
+    @staticmethod
+    def recent_history_stmt(model, symbol: str, limit: int):
+        """N nến gần nhất (mới nhất trước), chỉ chọn các cột OHLCV để Postgres dùng index-only scan."""
+        return select(
+            model.open, model.high, model.low, model.close, model.volume, model.timestamp
+        ).where(
+            model.symbol == symbol
+        ).order_by(model.timestamp.desc()).limit(limit)
 
     @staticmethod
     def get_last_price(db: Session, symbol: str, timeframe: str = "1m") -> float:
         """Lấy giá gần nhất."""
         model = CryptoDaily if timeframe == "1D" else CryptoHistory
-        last_record = db.query(model).filter(
-            model.symbol == symbol
-        ).order_by(model.timestamp.desc()).first()
-        return float(last_record.close) if last_record else 0.0
+        close = db.execute(CryptoRepository.last_price_stmt(model, symbol)).scalar()
+        return float(close) if close is not None else 0.0
+
+    @staticmethod
+    async def aget_last_price(db: AsyncSession, symbol: str, timeframe: str = "1m") -> float:
+        """Phiên bản async của `get_last_price`."""
+        model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        close = (await db.execute(CryptoRepository.last_price_stmt(model, symbol))).scalar()
+        return float(close) if close is not None else 0.0
+
+    @staticmethod
+    def get_last_timestamps(db: Session, symbols: List[str], timeframe: str = "1m") -> Dict[str, datetime]:
+        """Lấy thời điểm nến mới nhất đã lưu của nhiều mã trong một truy vấn."""
+        model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        rows = db.query(model.symbol, func.max(model.timestamp)).filter(
+            model.symbol.in_(symbols)
+        ).group_by(model.symbol).all()
+        return {symbol: ts for symbol, ts in rows}
 
     @staticmethod
     def get_average_price(db: Session, symbol: str, hours: int = 24, timeframe: str = "1m"):
@@ -155,18 +466,67 @@ class CryptoRepository:
         ).scalar()
         return float(avg_price) if avg_price else 0
 
+    @staticmethod
+    def price_stats_stmt(model, symbol: str, since: datetime):
+        """Giá cao nhất/thấp nhất của một mã kể từ `since`."""
+        return select(
+            func.max(model.high).label("max_price"),
+            func.min(model.low).label("min_price")
+        ).where(
+            model.symbol == symbol,
+            model.timestamp >= since
+        )
+
     @staticmethod
     def get_price_stats(db: Session, symbol: str, hours: int = 24, timeframe: str = "1m"):
         """Lấy giá cao nhất và thấp nhất."""
         model = CryptoDaily if timeframe == "1D" else CryptoHistory
         since = datetime.utcnow() - timedelta(hours=hours)
-        stats = db.query(
+        stats = db.execute(CryptoRepository.price_stats_stmt(model, symbol, since)).first()
+        return CryptoRepository._format_price_stats(stats)
+
+    @staticmethod
+    async def aget_price_stats(db: AsyncSession, symbol: str, hours: int = 24, timeframe: str = "1m"):
+        """Phiên bản async của `get_price_stats`."""
+        model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        since = datetime.utcnow() - timedelta(hours=hours)
+        stats = (await db.execute(CryptoRepository.price_stats_stmt(model, symbol, since))).first()
+        return CryptoRepository._format_price_stats(stats)
+
+    @staticmethod
+    def price_stats_batch_stmt(model, symbols: List[str], since: datetime):
+        """Giá cao nhất/thấp nhất của nhiều mã kể từ `since` (một truy vấn GROUP BY)."""
+        return select(
+            model.symbol,
             func.max(model.high).label("max_price"),
             func.min(model.low).label("min_price")
-        ).filter(
-            model.symbol == symbol,
+        ).where(
+            model.symbol.in_(symbols),
             model.timestamp >= since
-        ).first()
+        ).group_by(model.symbol)
+
+    @staticmethod
+    def get_price_stats_batch(db: Session, symbols: List[str], hours: int = 24,
+                              timeframe: str = "1m") -> Dict[str, Dict[str, float]]:
+        """Như `get_price_stats` cho cả danh sách mã: {symbol: {max, min}}."""
+        model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        since = datetime.utcnow() - timedelta(hours=hours)
+        rows = db.execute(CryptoRepository.price_stats_batch_stmt(model, symbols, since)).all()
+        found = {row.symbol: CryptoRepository._format_price_stats(row) for row in rows}
+        return {symbol: found.get(symbol) or CryptoRepository._format_price_stats(None) for symbol in symbols}
+
+    @staticmethod
+    async def aget_price_stats_batch(db: AsyncSession, symbols: List[str], hours: int = 24,
+                                     timeframe: str = "1m") -> Dict[str, Dict[str, float]]:
+        """Phiên bản async của `get_price_stats_batch`."""
+        model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        since = datetime.utcnow() - timedelta(hours=hours)
+        rows = (await db.execute(CryptoRepository.price_stats_batch_stmt(model, symbols, since))).all()
+        found = {row.symbol: CryptoRepository._format_price_stats(row) for row in rows}
+        return {symbol: found.get(symbol) or CryptoRepository._format_price_stats(None) for symbol in symbols}
+
+    @staticmethod
+    def _format_price_stats(stats) -> Dict[str, float]:
         return {
             "max": float(stats.max_price) if stats and stats.max_price else 0,
             "min": float(stats.min_price) if stats and stats.min_price else 0
@@ -194,96 +554,142 @@ class CryptoRepository:
     def get_recent_history(db: Session, symbol: str, limit: int = 100, timeframe: str = "1m"):
         """Lấy danh sách nến (OHLCV) gần nhất."""
         model = CryptoDaily if timeframe == "1D" else CryptoHistory
-        records = db.query(model).filter(
-            model.symbol == symbol
-        ).order_by(model.timestamp.desc()).limit(limit).all()
-        
-        return [
-            {
-                "open": r.open,
-                "high": r.high,
-                "low": r.low,
-                "close": r.close,
-                "volume": r.volume,
-                "timestamp": r.timestamp
-            } 
-            for r in reversed(records)
-        ]
+        records = db.execute(CryptoRepository.recent_history_stmt(model, symbol, limit)).all()
+        return [dict(r._mapping) for r in reversed(records)]
+
+    @staticmethod
+    async def aget_recent_history(db: AsyncSession, symbol: str, limit: int = 100, timeframe: str = "1m"):
+        """Phiên bản async của `get_recent_history`."""
+        model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        records = (await db.execute(CryptoRepository.recent_history_stmt(model, symbol, limit))).all()
+        return [dict(r._mapping) for r in reversed(records)]
             
     @staticmethod
-    def get_investment_suggestion(db: Session, symbol: str, current_price: float):
+    def recent_candles_batch_stmt(model, symbols: List[str], limit: int, since: Optional[datetime] = None):
         """
-        Đưa ra gợi ý dựa trên Signal Scoring System (Điểm số tín hiệu).
+        `limit` nến gần nhất (symbol, close, timestamp) của mỗi mã, cũ -> mới; có `since` thì
+        chỉ lấy các nến từ mốc đó (đọc phần nối tiếp của trạng thái chỉ báo tăng dần).
         """
-        # 1. Lấy dữ liệu 1m và 1D
-        history_1m = CryptoRepository.get_recent_history(db, symbol, limit=100, timeframe="1m")
-        history_1d = CryptoRepository.get_recent_history(db, symbol, limit=30, timeframe="1D")
-        
-        ta_1m = TechnicalAnalysisService.calculate_indicators(history_1m)
-        ta_1d = TechnicalAnalysisService.calculate_indicators(history_1d)
-
-        # 2. Kiểm tra dữ liệu đủ để phân tích chưa
-        if ta_1m.get("status") != "success":
-            return f"⚪ ĐANG CẬP NHẬT [Chưa đủ dữ liệu nến]"
-
-        score = 0
-        reasons = []
-
-        # --- Tín hiệu RSI (1m) ---
-        rsi_1m = ta_1m.get("rsi")
-        if rsi_1m is not None:
-            if rsi_1m < 30:
-                score += 2
-                reasons.append(f"RSI Quá bán ({rsi_1m:.1f})")
-            elif rsi_1m < 40:
-                score += 1
-                reasons.append("RSI Thấp")
-            elif rsi_1m > 70:
-                score -= 2
-                reasons.append(f"RSI Quá mua ({rsi_1m:.1f})")
-            elif rsi_1m > 60:
-                score -= 1
-                reasons.append("RSI Cao")
-
-        # --- Tín hiệu Bollinger Bands (1m) ---
-        bb = ta_1m.get("bbands")
-        if bb and bb["lower"] is not None and bb["upper"] is not None:
-            if current_price <= bb["lower"]:
-                score += 2
-                reasons.append("Chạm đáy BB")
-            elif current_price >= bb["upper"]:
-                score -= 2
-                reasons.append("Chạm đỉnh BB")
-
-        # --- Xu hướng nến ngày (1D) ---
-        rsi_1d = ta_1d.get("rsi")
-        if rsi_1d is not None:
-            if rsi_1d > 55:
-                score += 1
-                reasons.append("Xu hướng ngày Tăng")
-            elif rsi_1d < 45:
-                score -= 1
-                reasons.append("Xu hướng ngày Giảm")
-
-        # --- Kết luận dựa trên điểm ---
-        status = "⚪ TRUNG LẬP"
-        signal_type = None
-
-        if score >= 4:
-            status = "🔥 MUA MẠNH"
-            signal_type = "BUY"
-        elif score >= 2:
-            status = "🟢 MUA"
-            signal_type = "BUY"
-        elif score <= -4:
-            status = "💀 BÁN MẠNH"
-            signal_type = "SELL"
-        elif score <= -2:
-            status = "🔴 BÁN"
-            signal_type = "SELL"
-
-        if signal_type:
-            CryptoRepository.record_signal(db, symbol, signal_type, score, current_price)
-
-        reasons_text = f" | {', '.join(reasons[:2])}" if reasons else ""
-        return f"<b>{status}</b> [Điểm: {score:+} {reasons_text}]"
+        conditions = [model.symbol.in_(symbols)]
+        if since is not None:
+            conditions.append(model.timestamp >= since)
+        ranked = select(
+            model.symbol,
+            model.close,
+            model.timestamp,
+            func.row_number().over(partition_by=model.symbol, order_by=model.timestamp.desc()).label("rn"),
+        ).where(*conditions).subquery()
+        return select(ranked.c.symbol, ranked.c.close, ranked.c.timestamp).where(
+            ranked.c.rn <= limit
+        ).order_by(ranked.c.symbol, ranked.c.timestamp)
+
+    @staticmethod
+    def _candle_histories(rows) -> Dict[str, List[Dict]]:
+        histories: Dict[str, List[Dict]] = {}
+        for symbol, close, timestamp in rows:
+            histories.setdefault(symbol, []).append({"close": close, "timestamp": timestamp})
+        return histories
+
+    @staticmethod
+    def compute_indicators(db: Session, symbols: List[str], limit: int = 100, timeframe: str = "1m") -> List[Dict]:
+        """
+        Chỉ báo của các mã bằng `IndicatorEngine`: mã đã có trạng thái chỉ đọc các nến từ mốc
+        của trạng thái (O(1) mỗi nến mới), mã chưa có hoặc không nối tiếp được đọc cả cửa sổ
+        `limit` nến. Tối đa hai truy vấn cho cả danh sách.
+        """
+        model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        states = IndicatorEngine.load_states(symbols, timeframe)
+        histories: Dict[str, List[Dict]] = {}
+        if states:
+            since = min(state.last_timestamp for state in states.values())
+            rows = db.execute(CryptoRepository.recent_candles_batch_stmt(model, list(states), limit, since)).all()
+            histories = IndicatorEngine.continuations(states, CryptoRepository._candle_histories(rows))
+        rebuild = [symbol for symbol in symbols if symbol not in histories]
+        if rebuild:
+            rows = db.execute(CryptoRepository.recent_candles_batch_stmt(model, rebuild, limit)).all()
+            histories.update(CryptoRepository._candle_histories(rows))
+        states = {symbol: state for symbol, state in states.items() if symbol not in rebuild}
+        results, changed = IndicatorEngine.advance_many(symbols, states, histories)
+        IndicatorEngine.save_states(timeframe, changed)
+        return results
+
+    @staticmethod
+    async def acompute_indicators(db: AsyncSession, symbols: List[str], limit: int = 100,
+                                  timeframe: str = "1m") -> List[Dict]:
+        """Phiên bản async của `compute_indicators`."""
+        model = CryptoDaily if timeframe == "1D" else CryptoHistory
+        states = await IndicatorEngine.aload_states(symbols, timeframe)
+        histories: Dict[str, List[Dict]] = {}
+        if states:
+            since = min(state.last_timestamp for state in states.values())
+            stmt = CryptoRepository.recent_candles_batch_stmt(model, list(states), limit, since)
+            rows = (await db.execute(stmt)).all()
+            histories = IndicatorEngine.continuations(states, CryptoRepository._candle_histories(rows))
+        rebuild = [symbol for symbol in symbols if symbol not in histories]
+        if rebuild:
+            rows = (await db.execute(CryptoRepository.recent_candles_batch_stmt(model, rebuild, limit))).all()
+            histories.update(CryptoRepository._candle_histories(rows))
+        states = {symbol: state for symbol, state in states.items() if symbol not in rebuild}
+        results, changed = IndicatorEngine.advance_many(symbols, states, histories)
+        await IndicatorEngine.asave_states(timeframe, changed)
+        return results
+
+    @staticmethod
+    def get_indicators_batch(db: Session, symbols: List[str], limit: int = 100, timeframe: str = "1m") -> List[Dict]:
+        """
+        Chỉ báo của nhiều mã qua `IndicatorCache`; chỉ các mã bị miss mới được đọc
+        từ DB và tính tiếp bằng engine tăng dần (`compute_indicators`). Kết quả cùng thứ tự với `symbols`.
+        """
+        def compute(missing: List[str]) -> List[Dict]:
+            return CryptoRepository.compute_indicators(db, missing, limit=limit, timeframe=timeframe)
+
+        results = IndicatorCache.get_many(symbols, timeframe, compute)
+        return [results[symbol] for symbol in symbols]
+
+    @staticmethod
+    async def aget_indicators_batch(db: AsyncSession, symbols: List[str], limit: int = 100,
+                                    timeframe: str = "1m") -> List[Dict]:
+        """Phiên bản async của `get_indicators_batch`."""
+        async def compute(missing: List[str]) -> List[Dict]:
+            return await CryptoRepository.acompute_indicators(db, missing, limit=limit, timeframe=timeframe)
+
+        results = await IndicatorCache.aget_many(symbols, timeframe, compute)
+        return [results[symbol] for symbol in symbols]
+
+    @staticmethod
+    def get_investment_suggestions(db: Session, prices: Dict[str, float], record: bool = False) -> Dict[str, Dict]:
+        """
+        Gợi ý đầu tư cho nhiều mã: chỉ báo lấy từ cache, các mã bị miss được đọc bằng
+        một truy vấn mỗi khung thời gian và tính vector cho cả danh sách.
+
+        Args:
+            prices: {symbol: giá hiện tại}.
+            record: Lưu các tín hiệu BUY/SELL vào trading_signals (chỉ pipeline định kỳ
+                của Celery bật, đường đọc như API không ghi gì).
+
+        Returns:
+            Bảng điểm {symbol: {price, score, signal_type, suggestion, ...}}.
+        """
+        symbols = list(prices)
+        if not symbols:
+            return {}
+        ta_1m = CryptoRepository.get_indicators_batch(db, symbols, limit=100, timeframe="1m")
+        ta_1d = CryptoRepository.get_indicators_batch(db, symbols, limit=30, timeframe="1D")
+        table = score_table(symbols, ta_1m, ta_1d, [prices[s] for s in symbols])
+        if record:
+            CryptoRepository.record_signals(db, list(table.values()))
+        return table
+
+    @staticmethod
+    async def aget_investment_suggestions(db: AsyncSession, prices: Dict[str, float],
+                                          record: bool = False) -> Dict[str, Dict]:
+        """Phiên bản async của `get_investment_suggestions`."""
+        symbols = list(prices)
+        if not symbols:
+            return {}
+        ta_1m = await CryptoRepository.aget_indicators_batch(db, symbols, limit=100, timeframe="1m")
+        ta_1d = await CryptoRepository.aget_indicators_batch(db, symbols, limit=30, timeframe="1D")
+        table = score_table(symbols, ta_1m, ta_1d, [prices[s] for s in symbols])
+        if record:
+            await CryptoRepository.arecord_signals(db, list(table.values()))
+        return table
@@ -1,59 +1,61 @@
 """Service crawl thông tin từ sàn OKX."""
-import requests
 import logging
+from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
-from ..config import settings
+
 from ..constants import CryptoAssets
+from .okx_client import OKXClient
+from .ticker_cache import TickerSnapshotCache
 
 logger = logging.getLogger(__name__)
 
 class CryptoScraperService:
     """Service hỗ trợ lấy thông tin giá crypto từ OKX V5 API."""
     
-    BASE_URL = "https://www.okx.com/api/v5"
+    BASE_URL = OKXClient.BASE_URL
     
     @classmethod
-    def get_prices(cls, ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    async def aget_prices(cls, ids: Optional[List[str]] = None, max_age: Optional[float] = None) -> List[Dict[str, Any]]:
         """
-        Lấy thông tin giá crypto từ OKX.
+        Lấy thông tin giá crypto từ snapshot ticker dùng chung (chỉ gọi OKX khi snapshot quá cũ).
+        
+        Args:
+            ids: Danh sách mã cần lấy (mặc định CryptoAssets.DEFAULT_IDS).
+            max_age: Độ cũ tối đa (giây) chấp nhận được của snapshot.
         
         Returns:
-            List[Dict]: Danh sách thông tin giá từ OKX.
+            List[Dict]: Danh sách thông tin giá từ OKX, mỗi phần tử kèm `fetched_at` (epoch giây)
+            của snapshot và `stale` = True nếu OKX lỗi và đây là snapshot dự phòng cũ hơn `max_age`.
         """
-        url = f"{cls.BASE_URL}/market/tickers"
-        params = {"instType": "SPOT"}
-        
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            all_tickers = response.json().get("data", [])
-            
-            target_ids = ids or CryptoAssets.DEFAULT_IDS
-            # Lọc chỉ lấy những mã chúng ta quan tâm
-            filtered_data = [t for t in all_tickers if t.get("instId") in target_ids]
-            return filtered_data
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Lỗi khi crawl dữ liệu từ OKX: {e}")
+        snapshot = await TickerSnapshotCache.aget_snapshot(max_age)
+        if snapshot is None:
             return []
+        return [
+            {**ticker, "fetched_at": snapshot.fetched_at, "stale": snapshot.stale}
+            for ticker in snapshot.select(ids or CryptoAssets.DEFAULT_IDS)
+        ]
 
     @classmethod
-    def get_all_instruments(cls) -> List[Dict[str, Any]]:
+    def get_prices(cls, ids: Optional[List[str]] = None, max_age: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Phiên bản đồng bộ của `aget_prices` (dùng trong Celery)."""
+        return OKXClient.run_sync(cls.aget_prices(ids, max_age=max_age))
+
+    @classmethod
+    async def aget_all_instruments(cls) -> List[Dict[str, Any]]:
         """Lấy danh sách tất cả các mã giao dịch SPOT từ OKX."""
-        url = f"{cls.BASE_URL}/public/instruments"
-        params = {"instType": "SPOT"}
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json().get("data", [])
+            return await OKXClient.get_instruments("SPOT")
         except Exception as e:
             logger.error(f"Lỗi khi lấy danh sách instruments từ OKX: {e}")
             return []
 
     @classmethod
-    def search_instruments(cls, query: str) -> List[Dict[str, Any]]:
-        """Tìm kiếm các mã giao dịch theo query."""
-        instruments = cls.get_all_instruments()
+    def get_all_instruments(cls) -> List[Dict[str, Any]]:
+        """Phiên bản đồng bộ của `aget_all_instruments`."""
+        return OKXClient.run_sync(cls.aget_all_instruments())
+
+    @staticmethod
+    def _filter_instruments(instruments: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
         query = query.upper()
         # Tìm kiếm theo baseCcy (ví dụ BTC) hoặc instId (ví dụ BTC-USDT)
         return [
@@ -62,7 +64,38 @@ class CryptoScraperService:
         ]
 
     @classmethod
-    def get_historical_candles(cls, symbol: str, bar: str = "1m", limit: int = 100) -> List[Dict[str, Any]]:
+    async def asearch_instruments(cls, query: str) -> List[Dict[str, Any]]:
+        """Tìm kiếm các mã giao dịch theo query."""
+        return cls._filter_instruments(await cls.aget_all_instruments(), query)
+
+    @classmethod
+    def search_instruments(cls, query: str) -> List[Dict[str, Any]]:
+        """Phiên bản đồng bộ của `asearch_instruments`."""
+        return cls._filter_instruments(cls.get_all_instruments(), query)
+
+    @staticmethod
+    def parse_candles(data: List[List[str]]) -> List[Dict[str, Any]]:
+        """Chuyển nến thô của OKX (REST hoặc WebSocket) thành dict OHLCV, sắp xếp từ cũ đến mới."""
+        # OKX returns [ts, open, high, low, close, vol, volCcy, volCcyQuote, confirm]
+        formatted_data = []
+        for candle in data:
+            formatted_data.append({
+                # Giờ UTC (naive) như mọi timestamp khác trong DB (tín hiệu, partition, dọn dữ liệu)
+                "timestamp": datetime.fromtimestamp(int(candle[0]) / 1000, tz=timezone.utc).replace(tzinfo=None),
+                "open": float(candle[1]),
+                "high": float(candle[2]),
+                "low": float(candle[3]),
+                "close": float(candle[4]),
+                "volume": float(candle[5]),
+                # confirm = "1" khi nến đã đóng, "0" khi nến còn đang chạy
+                "confirm": len(candle) > 8 and candle[8] == "1"
+            })
+        
+        # API trả về từ mới đến cũ, ta cần đảo ngược lại
+        return formatted_data[::-1]
+
+    @classmethod
+    async def aget_historical_candles(cls, symbol: str, bar: str = "1m", limit: int = 100) -> List[Dict[str, Any]]:
         """
         Lấy dữ liệu nến lịch sử từ OKX.
         
@@ -74,38 +107,44 @@ class CryptoScraperService:
         Returns:
             List[Dict]: Dữ liệu nến gồm timestamp và giá đóng cửa.
         """
-        from datetime import datetime
-        url = f"{cls.BASE_URL}/market/history-candles"
-        params = {
-            "instId": symbol,
-            "bar": bar,
-            "limit": str(limit)
-        }
-        
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json().get("data", [])
-            
-            # OKX returns [ts, open, high, low, close, vol, volCcy, volCcyQuote, confirm]
-            formatted_data = []
-            for candle in data:
-                formatted_data.append({
-                    "timestamp": datetime.fromtimestamp(int(candle[0]) / 1000),
-                    "open": float(candle[1]),
-                    "high": float(candle[2]),
-                    "low": float(candle[3]),
-                    "close": float(candle[4]),
-                    "volume": float(candle[5])
-                })
-            
-            # API trả về từ mới đến cũ, ta cần đảo ngược lại
-            return formatted_data[::-1]
-            
+            data = await OKXClient.get_candles(symbol, bar=bar, limit=limit)
+            return cls.parse_candles(data)
         except Exception as e:
             logger.error(f"Lỗi khi lấy dữ liệu lịch sử cho {symbol}: {e}")
             return []
 
+    @classmethod
+    def get_historical_candles(cls, symbol: str, bar: str = "1m", limit: int = 100) -> List[Dict[str, Any]]:
+        """Phiên bản đồng bộ của `aget_historical_candles` (dùng trong Celery)."""
+        return OKXClient.run_sync(cls.aget_historical_candles(symbol, bar=bar, limit=limit))
+
+    @classmethod
+    async def aget_historical_candles_batch(
+        cls, symbols: List[str], bar: str = "1m", limit: int = 100, after: Optional[datetime] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Lấy nến lịch sử cho nhiều mã cùng lúc (song song, tuân thủ rate limit OKX).
+
+        Args:
+            after: Chỉ lấy các nến trước thời điểm này (giờ UTC naive) - dùng để phân trang lùi.
+        
+        Returns:
+            Dict[str, List[Dict]]: Nến theo từng mã; mã bị lỗi trả về danh sách rỗng.
+        """
+        after_ms = None
+        if after is not None:
+            after_ms = int(after.replace(tzinfo=timezone.utc).timestamp() * 1000)
+        raw = await OKXClient.get_candles_batch(symbols, bar=bar, limit=limit, after=after_ms)
+        return {s: cls.parse_candles(raw.get(s, [])) for s in symbols}
+
+    @classmethod
+    def get_historical_candles_batch(
+        cls, symbols: List[str], bar: str = "1m", limit: int = 100, after: Optional[datetime] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Phiên bản đồng bộ của `aget_historical_candles_batch` (dùng trong Celery)."""
+        return OKXClient.run_sync(cls.aget_historical_candles_batch(symbols, bar=bar, limit=limit, after=after))
+
     @classmethod
     def format_price_message(cls, data: List[Dict[str, Any]]) -> str:
         """ Định dạng dữ liệu từ OKX thành tin nhắn văn bản. """
@@ -0,0 +1,256 @@
+"""Cache kết quả chỉ báo kỹ thuật theo (symbol, timeframe, nến mới nhất): LRU trong process + Redis."""
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..constants import CryptoConfig
+from ..redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+PENDING_INFO_KEY = "indicator_cache_pending"
+
+
+class IndicatorCache:
+    """
+    Kết quả chỉ báo chỉ thay đổi khi có nến mới hoặc nến đang chạy được ghi lại, nên được
+    cache theo khóa `(symbol, timeframe, timestamp nến mới nhất, generation)`.
+
+    - Ghi: sau mỗi lần commit nến, `ta:version:<symbol>:<tf>` được tăng `gen` và cập nhật
+      `last_ts` (xem `invalidate_on_commit`). Khóa cũ không còn được đọc nên không cần xóa.
+    - Đọc: lấy version của cả danh sách mã trong một round-trip, tra LRU trong process rồi
+      Redis; chỉ các mã bị miss mới phải truy vấn DB và tính lại.
+    - Đếm hit/miss theo process (`get_stats`) và cộng dồn trong Redis (`ta:cache:stats`).
+
+    Nếu Redis không khả dụng thì không có version, mọi lượt đều tính lại như trước.
+    """
+
+    VERSION_KEY_PREFIX = "ta:version"
+    CACHE_KEY_PREFIX = "ta:cache"
+    STATS_KEY = "ta:cache:stats"
+
+    _local: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    _lock = threading.Lock()
+    _stats: Dict[str, int] = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+
+    @staticmethod
+    def version_key(symbol: str, timeframe: str) -> str:
+        return f"{IndicatorCache.VERSION_KEY_PREFIX}:{symbol}:{timeframe}"
+
+    @staticmethod
+    def cache_key(symbol: str, timeframe: str, last_ts: str, gen: str) -> str:
+        return f"{IndicatorCache.CACHE_KEY_PREFIX}:{symbol}:{timeframe}:{last_ts}:{gen}"
+
+    # ---------- Ghi (invalidate) ----------
+
+    @staticmethod
+    def invalidate_on_commit(db: Session, timeframe: str, last_ts_by_symbol: Dict[str, datetime]) -> None:
+        """Đánh dấu các mã vừa ghi nến; version được tăng khi transaction commit thành công."""
+        pending = db.info.setdefault(PENDING_INFO_KEY, {}).setdefault(timeframe, {})
+        for symbol, ts in last_ts_by_symbol.items():
+            if symbol not in pending or ts > pending[symbol]:
+                pending[symbol] = ts
+
+    @classmethod
+    def bump_versions(cls, timeframe: str, last_ts_by_symbol: Dict[str, datetime]) -> None:
+        """Tăng generation của các mã (mọi kết quả đã cache của chúng trở thành lỗi thời)."""
+        if not last_ts_by_symbol:
+            return
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for symbol, ts in last_ts_by_symbol.items():
+                key = cls.version_key(symbol, timeframe)
+                pipe.hincrby(key, "gen", 1)
+                pipe.hset(key, "last_ts", ts.isoformat())
+            pipe.execute()
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không cập nhật được version cache chỉ báo: {e}")
+
+    # ---------- Đọc ----------
+
+    @classmethod
+    def _keys_from_versions(cls, symbols: List[str], timeframe: str, versions: List[list]) -> Dict[str, Optional[str]]:
+        keys = {}
+        for symbol, (gen, last_ts) in zip(symbols, versions):
+            keys[symbol] = cls.cache_key(symbol, timeframe, last_ts, gen) if gen and last_ts else None
+        return keys
+
+    @classmethod
+    def _lookup_local(cls, keys: Dict[str, Optional[str]]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        with cls._lock:
+            for symbol, key in keys.items():
+                if key is not None and key in cls._local:
+                    cls._local.move_to_end(key)
+                    found[symbol] = cls._local[key]
+        return found
+
+    @classmethod
+    def _store_local(cls, items: Dict[str, Dict[str, Any]]) -> None:
+        with cls._lock:
+            for key, value in items.items():
+                cls._local[key] = value
+                cls._local.move_to_end(key)
+            while len(cls._local) > CryptoConfig.INDICATOR_CACHE_LOCAL_SIZE:
+                cls._local.popitem(last=False)
+
+    @classmethod
+    def _count(cls, local_hits: int, redis_hits: int, misses: int) -> Dict[str, int]:
+        delta = {"local_hits": local_hits, "redis_hits": redis_hits, "misses": misses}
+        with cls._lock:
+            for name, value in delta.items():
+                cls._stats[name] += value
+        return delta
+
+    @classmethod
+    def _versions_pipeline(cls, redis, symbols: List[str], timeframe: str):
+        """Pipeline đọc version (gen, last_ts) của cả danh sách mã (sync hoặc async client)."""
+        pipe = redis.pipeline(transaction=False)
+        for symbol in symbols:
+            pipe.hmget(cls.version_key(symbol, timeframe), "gen", "last_ts")
+        return pipe
+
+    @classmethod
+    def _merge_remote(cls, found: Dict[str, Dict[str, Any]], remote: Dict[str, str], raws: List[Optional[str]]) -> None:
+        """Thêm các kết quả đọc được từ Redis vào `found` và LRU trong process."""
+        for symbol, raw in zip(remote, raws):
+            if raw:
+                found[symbol] = json.loads(raw)
+        cls._store_local({remote[s]: found[s] for s in remote if s in found})
+
+    @classmethod
+    def _store_computed(cls, redis, found: Dict[str, Dict[str, Any]], keys: Dict[str, Optional[str]],
+                        computed: Dict[str, Dict[str, Any]], local_hits: int, misses: int):
+        """
+        Gộp kết quả vừa tính vào `found`, đếm hit/miss và lưu LRU; trả về pipeline ghi cache +
+        thống kê vào Redis để người gọi execute (None nếu không có Redis).
+        """
+        found.update(computed)
+        delta = cls._count(local_hits, len(found) - len(computed) - local_hits, misses)
+        fresh = {keys[s]: value for s, value in computed.items() if keys[s] is not None}
+        cls._store_local(fresh)
+        if redis is None:
+            return None
+        pipe = redis.pipeline(transaction=False)
+        for key, value in fresh.items():
+            pipe.set(key, json.dumps(value), ex=CryptoConfig.INDICATOR_CACHE_TTL_SECONDS)
+        for name, value in delta.items():
+            pipe.hincrby(cls.STATS_KEY, name, value)
+        return pipe
+
+    @classmethod
+    def get_many(cls, symbols: List[str], timeframe: str,
+                 compute: Callable[[List[str]], List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Kết quả chỉ báo của các mã; `compute(missing)` chỉ được gọi cho các mã bị miss
+        và phải trả về danh sách kết quả cùng thứ tự.
+        """
+        redis = None
+        keys: Dict[str, Optional[str]] = {symbol: None for symbol in symbols}
+        try:
+            redis = get_redis()
+            keys = cls._keys_from_versions(symbols, timeframe, cls._versions_pipeline(redis, symbols, timeframe).execute())
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đọc được version cache chỉ báo: {e}")
+            redis = None
+
+        found = cls._lookup_local(keys)
+        local_hits = len(found)
+        remote = {s: k for s, k in keys.items() if k is not None and s not in found}
+        if remote and redis is not None:
+            try:
+                cls._merge_remote(found, remote, redis.mget(list(remote.values())))
+            except (RedisError, OSError) as e:
+                logger.warning(f"Không đọc được cache chỉ báo từ Redis: {e}")
+
+        missing = [s for s in symbols if s not in found]
+        computed = dict(zip(missing, compute(missing))) if missing else {}
+        pipe = cls._store_computed(redis, found, keys, computed, local_hits, len(missing))
+        if pipe is not None:
+            try:
+                pipe.execute()
+            except (RedisError, OSError) as e:
+                logger.warning(f"Không ghi được cache chỉ báo vào Redis: {e}")
+        return found
+
+    @classmethod
+    async def aget_many(cls, symbols: List[str], timeframe: str,
+                        compute: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]]) -> Dict[str, Dict[str, Any]]:
+        """Phiên bản async của `get_many` (`compute` là coroutine function)."""
+        redis = None
+        keys: Dict[str, Optional[str]] = {symbol: None for symbol in symbols}
+        try:
+            redis = get_async_redis()
+            keys = cls._keys_from_versions(
+                symbols, timeframe, await cls._versions_pipeline(redis, symbols, timeframe).execute()
+            )
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đọc được version cache chỉ báo: {e}")
+            redis = None
+
+        found = cls._lookup_local(keys)
+        local_hits = len(found)
+        remote = {s: k for s, k in keys.items() if k is not None and s not in found}
+        if remote and redis is not None:
+            try:
+                cls._merge_remote(found, remote, await redis.mget(list(remote.values())))
+            except (RedisError, OSError) as e:
+                logger.warning(f"Không đọc được cache chỉ báo từ Redis: {e}")
+
+        missing = [s for s in symbols if s not in found]
+        computed = dict(zip(missing, await compute(missing))) if missing else {}
+        pipe = cls._store_computed(redis, found, keys, computed, local_hits, len(missing))
+        if pipe is not None:
+            try:
+                await pipe.execute()
+            except (RedisError, OSError) as e:
+                logger.warning(f"Không ghi được cache chỉ báo vào Redis: {e}")
+        return found
+
+    # ---------- Thống kê ----------
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        """Số hit/miss của process hiện tại."""
+        with cls._lock:
+            stats = dict(cls._stats)
+            stats["local_size"] = len(cls._local)
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["local_hits"] + stats["redis_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    @classmethod
+    async def aget_total_stats(cls) -> Dict[str, int]:
+        """Số hit/miss cộng dồn của mọi process (API, worker) từ Redis."""
+        try:
+            raw = await get_async_redis().hgetall(cls.STATS_KEY)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đọc được thống kê cache chỉ báo: {e}")
+            return {}
+        return {name: int(value) for name, value in raw.items()}
+
+    @classmethod
+    def clear_local(cls) -> None:
+        with cls._lock:
+            cls._local.clear()
+            for name in cls._stats:
+                cls._stats[name] = 0
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_versions_after_commit(session: Session) -> None:
+    pending = session.info.pop(PENDING_INFO_KEY, None)
+    for timeframe, last_ts_by_symbol in (pending or {}).items():
+        IndicatorCache.bump_versions(timeframe, last_ts_by_symbol)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_INFO_KEY, None)
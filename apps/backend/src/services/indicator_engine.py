@@ -0,0 +1,321 @@
+"""Engine tính RSI, MACD, Bollinger Bands tăng dần (O(1) mỗi nến), trạng thái lưu trong Redis."""
+import copy
+import json
+import logging
+import math
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from ..constants import CryptoConfig
+from ..redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+MIN_DATA_POINTS = 20
+INSUFFICIENT_DATA_STATUS = "Dữ liệu không đủ (Cần ít nhất 20 điểm dữ liệu)"
+
+
+class SeededEMA:
+    """EMA khởi tạo bằng SMA của `length` giá trị đầu (giống pandas-ta `ema(presma=True)`)."""
+
+    __slots__ = ("length", "alpha", "seed_sum", "seed_count", "value")
+
+    def __init__(self, length: int):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.seed_sum = 0.0
+        self.seed_count = 0
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> Optional[float]:
+        if self.value is None:
+            self.seed_sum += x
+            self.seed_count += 1
+            if self.seed_count == self.length:
+                self.value = self.seed_sum / self.length
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"seed_sum": self.seed_sum, "seed_count": self.seed_count, "value": self.value}
+
+    def load(self, data: Dict[str, Any]) -> None:
+        self.seed_sum = data["seed_sum"]
+        self.seed_count = data["seed_count"]
+        self.value = data["value"]
+
+
+class IncrementalIndicators:
+    """
+    Trạng thái chỉ báo của một chuỗi giá đóng cửa, cập nhật O(1) mỗi nến mới.
+
+    - RSI: trung bình Wilder (RMA, alpha = 1/length) của phần tăng/giảm.
+    - MACD: hiệu hai EMA (khởi tạo bằng SMA), đường signal là EMA của MACD.
+    - Bollinger Bands: trung bình và phương sai trượt (ddof=1) cập nhật kiểu Welford
+      khi thêm giá mới/bỏ giá cũ nhất khỏi cửa sổ.
+
+    Công thức bám theo pandas-ta (không dùng TA-Lib) để kết quả khớp
+    `TechnicalAnalysisService.calculate_indicators` trên cùng chuỗi dữ liệu.
+    """
+
+    def __init__(self, rsi_length: int = 14, macd_fast: int = 12, macd_slow: int = 26,
+                 macd_signal: int = 9, bb_length: int = 20, bb_std: float = 2.0):
+        self.params = {
+            "rsi_length": rsi_length, "macd_fast": macd_fast, "macd_slow": macd_slow,
+            "macd_signal": macd_signal, "bb_length": bb_length, "bb_std": bb_std,
+        }
+        self.count = 0
+        self.last_timestamp: Optional[datetime] = None
+        self.last_close: Optional[float] = None
+
+        self._rsi_alpha = 1.0 / rsi_length
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+
+        self.ema_fast = SeededEMA(macd_fast)
+        self.ema_slow = SeededEMA(macd_slow)
+        self.ema_signal = SeededEMA(macd_signal)
+        self.macd: Optional[float] = None
+
+        self.window: deque = deque(maxlen=bb_length)
+        self.bb_mean = 0.0
+        self.bb_m2 = 0.0
+
+    def update(self, close: float, timestamp: Optional[datetime] = None) -> None:
+        """Nạp thêm một nến đã đóng."""
+        close = float(close)
+        self.count += 1
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+
+        if self.last_close is not None:
+            diff = close - self.last_close
+            gain, loss = max(diff, 0.0), max(-diff, 0.0)
+            if self.avg_gain is None:
+                self.avg_gain, self.avg_loss = gain, loss
+            else:
+                self.avg_gain += self._rsi_alpha * (gain - self.avg_gain)
+                self.avg_loss += self._rsi_alpha * (loss - self.avg_loss)
+        self.last_close = close
+
+        fast = self.ema_fast.update(close)
+        slow = self.ema_slow.update(close)
+        if fast is not None and slow is not None:
+            self.macd = fast - slow
+            self.ema_signal.update(self.macd)
+
+        if len(self.window) < self.window.maxlen:
+            self.window.append(close)
+            delta = close - self.bb_mean
+            self.bb_mean += delta / len(self.window)
+            self.bb_m2 += delta * (close - self.bb_mean)
+        else:
+            oldest = self.window[0]
+            self.window.append(close)
+            new_mean = self.bb_mean + (close - oldest) / len(self.window)
+            self.bb_m2 += (close - oldest) * (close - new_mean + oldest - self.bb_mean)
+            self.bb_mean = new_mean
+        self.bb_m2 = max(self.bb_m2, 0.0)
+
+    def preview(self, close: float) -> Dict[str, Any]:
+        """Chỉ báo nếu thêm nến `close` (nến đang chạy), không thay đổi trạng thái."""
+        tentative = copy.deepcopy(self)
+        tentative.update(close)
+        return tentative.result()
+
+    def result(self) -> Dict[str, Any]:
+        """Giá trị chỉ báo mới nhất, cùng định dạng với `calculate_indicators`."""
+        if self.count < MIN_DATA_POINTS:
+            return {"rsi": None, "macd": None, "bbands": None, "status": INSUFFICIENT_DATA_STATUS}
+
+        rsi = None
+        if self.avg_gain is not None and self.avg_gain + self.avg_loss > 0:
+            rsi = 100.0 * self.avg_gain / (self.avg_gain + self.avg_loss)
+
+        # pandas-ta chỉ tính MACD khi có ít nhất slow + signal - 1 điểm dữ liệu
+        macd = signal = hist = None
+        if self.count >= self.params["macd_slow"] + self.params["macd_signal"] - 1:
+            macd, signal = self.macd, self.ema_signal.value
+            hist = macd - signal if macd is not None and signal is not None else None
+
+        upper = middle = lower = None
+        if len(self.window) == self.window.maxlen:
+            std = math.sqrt(self.bb_m2 / (len(self.window) - 1))
+            middle = self.bb_mean
+            upper = middle + self.params["bb_std"] * std
+            lower = middle - self.params["bb_std"] * std
+
+        return {
+            "rsi": rsi,
+            "macd": {"value": macd, "signal": signal, "hist": hist},
+            "bbands": {"upper": upper, "middle": middle, "lower": lower},
+            "status": "success",
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "params": self.params,
+            "count": self.count,
+            "last_timestamp": self.last_timestamp.isoformat() if self.last_timestamp else None,
+            "last_close": self.last_close,
+            "avg_gain": self.avg_gain,
+            "avg_loss": self.avg_loss,
+            "ema_fast": self.ema_fast.to_dict(),
+            "ema_slow": self.ema_slow.to_dict(),
+            "ema_signal": self.ema_signal.to_dict(),
+            "macd": self.macd,
+            "window": list(self.window),
+            "bb_mean": self.bb_mean,
+            "bb_m2": self.bb_m2,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IncrementalIndicators":
+        state = cls(**data["params"])
+        state.count = data["count"]
+        state.last_timestamp = datetime.fromisoformat(data["last_timestamp"]) if data["last_timestamp"] else None
+        state.last_close = data["last_close"]
+        state.avg_gain = data["avg_gain"]
+        state.avg_loss = data["avg_loss"]
+        state.ema_fast.load(data["ema_fast"])
+        state.ema_slow.load(data["ema_slow"])
+        state.ema_signal.load(data["ema_signal"])
+        state.macd = data["macd"]
+        state.window.extend(data["window"])
+        state.bb_mean = data["bb_mean"]
+        state.bb_m2 = data["bb_m2"]
+        return state
+
+
+def _close(candle: Dict[str, Any]) -> float:
+    return float(candle["close"] if candle.get("close") is not None else candle["price"])
+
+
+class IndicatorEngine:
+    """
+    Tính chỉ báo cho (symbol, timeframe) bằng trạng thái tăng dần lưu trong Redis.
+
+    Mỗi lần gọi chỉ nạp các nến mới hơn nến cuối cùng đã có trong trạng thái; nến mới
+    nhất của cửa sổ được coi là nến đang chạy nên chỉ tính thử (`preview`), chưa ghi vào
+    trạng thái. Nếu trạng thái bị hụt (cũ hơn cả nến đầu của cửa sổ) thì dựng lại từ cửa sổ.
+
+    Dùng theo lô khi `IndicatorCache` bị miss (xem `CryptoRepository.get_indicators_batch`):
+    `load_states` -> đọc nến từ mốc của từng trạng thái (`continuations`) hoặc cả cửa sổ ->
+    `advance_many` -> `save_states`.
+    """
+
+    KEY_PREFIX = "ta:state"
+
+    @staticmethod
+    def key(symbol: str, timeframe: str) -> str:
+        return f"{IndicatorEngine.KEY_PREFIX}:{symbol}:{timeframe}"
+
+    @staticmethod
+    def advance(state: Optional[IncrementalIndicators],
+                history: List[Dict[str, Any]]) -> Tuple[IncrementalIndicators, Dict[str, Any], bool]:
+        """
+        Đưa trạng thái tới nến mới nhất của `history` (sắp xếp cũ -> mới).
+
+        Returns:
+            (trạng thái mới, kết quả chỉ báo, trạng thái có thay đổi hay không)
+        """
+        if state is None or state.last_timestamp is None or (
+            history and state.last_timestamp < history[0]["timestamp"]
+        ):
+            state = IncrementalIndicators()
+        if not history:
+            return state, state.result(), False
+
+        changed = False
+        for candle in history[:-1]:
+            if state.last_timestamp is None or candle["timestamp"] > state.last_timestamp:
+                state.update(_close(candle), candle["timestamp"])
+                changed = True
+
+        newest = history[-1]
+        if state.last_timestamp is None or newest["timestamp"] > state.last_timestamp:
+            return state, state.preview(_close(newest)), changed
+        return state, state.result(), changed
+
+    @staticmethod
+    def _states_from_raw(symbols: List[str], raws: List[Optional[str]]) -> Dict[str, IncrementalIndicators]:
+        return {symbol: IncrementalIndicators.from_dict(json.loads(raw)) for symbol, raw in zip(symbols, raws) if raw}
+
+    @staticmethod
+    def load_states(symbols: List[str], timeframe: str) -> Dict[str, IncrementalIndicators]:
+        """Trạng thái đã lưu của các mã (một MGET); mã chưa có trạng thái không có trong kết quả."""
+        try:
+            raws = get_redis().mget([IndicatorEngine.key(s, timeframe) for s in symbols])
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đọc được trạng thái chỉ báo {timeframe}: {e}")
+            return {}
+        return IndicatorEngine._states_from_raw(symbols, raws)
+
+    @staticmethod
+    async def aload_states(symbols: List[str], timeframe: str) -> Dict[str, IncrementalIndicators]:
+        """Phiên bản async của `load_states`."""
+        try:
+            raws = await get_async_redis().mget([IndicatorEngine.key(s, timeframe) for s in symbols])
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đọc được trạng thái chỉ báo {timeframe}: {e}")
+            return {}
+        return IndicatorEngine._states_from_raw(symbols, raws)
+
+    @staticmethod
+    def _save_pipeline(redis, timeframe: str, states: Dict[str, IncrementalIndicators]):
+        pipe = redis.pipeline(transaction=False)
+        for symbol, state in states.items():
+            pipe.set(IndicatorEngine.key(symbol, timeframe), json.dumps(state.to_dict()),
+                     ex=CryptoConfig.INDICATOR_STATE_TTL_SECONDS)
+        return pipe
+
+    @staticmethod
+    def save_states(timeframe: str, states: Dict[str, IncrementalIndicators]) -> None:
+        """Lưu trạng thái đã thay đổi của các mã (một pipeline)."""
+        if not states:
+            return
+        try:
+            IndicatorEngine._save_pipeline(get_redis(), timeframe, states).execute()
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không lưu được trạng thái chỉ báo {timeframe}: {e}")
+
+    @staticmethod
+    async def asave_states(timeframe: str, states: Dict[str, IncrementalIndicators]) -> None:
+        """Phiên bản async của `save_states`."""
+        if not states:
+            return
+        try:
+            await IndicatorEngine._save_pipeline(get_async_redis(), timeframe, states).execute()
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không lưu được trạng thái chỉ báo {timeframe}: {e}")
+
+    @staticmethod
+    def continuations(states: Dict[str, IncrementalIndicators],
+                      histories: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Lọc các chuỗi nến đọc từ mốc `last_timestamp` của trạng thái: chỉ giữ mã có chuỗi bắt đầu
+        đúng tại mốc đó (nối tiếp được). Mã khác (nến mốc đã bị xóa, hụt quá `limit` nến) phải dựng lại.
+        """
+        continued = {}
+        for symbol, state in states.items():
+            history = [c for c in histories.get(symbol, []) if c["timestamp"] >= state.last_timestamp]
+            if history and history[0]["timestamp"] == state.last_timestamp:
+                continued[symbol] = history
+        return continued
+
+    @staticmethod
+    def advance_many(
+        symbols: List[str], states: Dict[str, IncrementalIndicators], histories: Dict[str, List[Dict[str, Any]]],
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, IncrementalIndicators]]:
+        """`advance` cho từng mã; trả về (kết quả cùng thứ tự `symbols`, trạng thái có thay đổi cần lưu)."""
+        results, changed = [], {}
+        for symbol in symbols:
+            state, result, was_changed = IndicatorEngine.advance(states.get(symbol), histories.get(symbol, []))
+            results.append(result)
+            if was_changed:
+                changed[symbol] = state
+        return results, changed
@@ -0,0 +1,193 @@
+"""Danh mục instrument SPOT của OKX: lưu trong Redis, tra cứu qua index trong bộ nhớ."""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from redis.exceptions import RedisError
+
+from ..constants import CryptoConfig
+from ..redis_client import get_async_redis
+from .okx_client import OKXClient
+
+logger = logging.getLogger(__name__)
+
+# Chỉ giữ các trường cần cho validate/search để snapshot trong Redis gọn nhẹ
+INSTRUMENT_FIELDS = ("instId", "baseCcy", "quoteCcy", "state")
+
+
+class InstrumentIndex:
+    """
+    Index bất biến trên danh sách instrument.
+
+    - `ids`: hash set để validate mã trong O(1).
+    - `_prefix`: tiền tố của instId và baseCcy -> tập instId; mọi kết quả khớp chính xác
+      hoặc khớp tiền tố đều nằm trong đây.
+    - `_ngrams`: n-gram (1..NGRAM_SIZE ký tự) của instId và baseCcy -> tập instId,
+      dùng để tìm substring mà không phải quét toàn bộ danh sách.
+    """
+
+    NGRAM_SIZE = 3
+
+    def __init__(self, instruments: Iterable[Dict[str, Any]]):
+        self.by_id: Dict[str, Dict[str, Any]] = {
+            inst["instId"]: {k: inst.get(k) for k in INSTRUMENT_FIELDS} for inst in instruments if inst.get("instId")
+        }
+        self.ids = frozenset(self.by_id)
+        self._prefix: Dict[str, Set[str]] = defaultdict(set)
+        self._ngrams: Dict[str, Set[str]] = defaultdict(set)
+        for inst_id, inst in self.by_id.items():
+            for key in (inst_id, (inst.get("baseCcy") or "").upper()):
+                for i in range(1, len(key) + 1):
+                    self._prefix[key[:i]].add(inst_id)
+                for n in range(1, self.NGRAM_SIZE + 1):
+                    for i in range(len(key) - n + 1):
+                        self._ngrams[key[i:i + n]].add(inst_id)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def contains(self, symbol: str) -> bool:
+        return symbol in self.ids
+
+    def _substring_candidates(self, query: str) -> Set[str]:
+        if len(query) <= self.NGRAM_SIZE:
+            return self._ngrams.get(query, set())
+        grams = [query[i:i + self.NGRAM_SIZE] for i in range(len(query) - self.NGRAM_SIZE + 1)]
+        sets = sorted((self._ngrams.get(g, set()) for g in grams), key=len)
+        candidates = set.intersection(*sets) if sets else set()
+        # Giao các n-gram có thể dương tính giả, kiểm tra lại substring thật
+        return {
+            i for i in candidates
+            if query in i or query in (self.by_id[i].get("baseCcy") or "").upper()
+        }
+
+    def _rank(self, inst_id: str, query: str) -> tuple:
+        base = (self.by_id[inst_id].get("baseCcy") or "").upper()
+        if inst_id == query:
+            level = 0
+        elif base == query:
+            level = 1
+        elif inst_id.startswith(query):
+            level = 2
+        elif base.startswith(query):
+            level = 3
+        else:
+            level = 4
+        # Ưu tiên cặp USDT (mặc định của hệ thống), mã ngắn hơn, rồi theo alphabet
+        return level, self.by_id[inst_id].get("quoteCcy") != "USDT", len(inst_id), inst_id
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Tìm theo instId/baseCcy, xếp hạng: khớp chính xác > tiền tố > chứa chuỗi."""
+        query = query.strip().upper()
+        if not query:
+            return []
+        candidates = self._prefix.get(query, set())
+        # Đủ kết quả khớp tiền tố thì kết quả chỉ chứa chuỗi (xếp sau) không lọt vào top
+        if len(candidates) < limit:
+            candidates = candidates | self._substring_candidates(query)
+        ranked = sorted(candidates, key=lambda i: self._rank(i, query))
+        return [self.by_id[i] for i in ranked[:limit]]
+
+
+class InstrumentCatalog:
+    """
+    Danh mục instrument dùng chung.
+
+    Celery beat (`refresh_instrument_catalog`) tải từ OKX và ghi vào Redis. Các process
+    giữ một `InstrumentIndex` trong bộ nhớ và đọc lại Redis ở chế độ nền khi bản local cũ
+    hơn `INSTRUMENT_CATALOG_LOCAL_TTL_SECONDS`, nên `/search` và `/subscribe` không
+    chạm tới mạng trên đường xử lý request (trừ lần nạp đầu tiên khi chưa có dữ liệu).
+
+    Khi cả Redis lẫn OKX đều lỗi, không thử lại trong `INSTRUMENT_CATALOG_RETRY_SECONDS`
+    để mỗi request không kéo theo một lần gọi OKX thất bại.
+    """
+
+    REDIS_KEY = "okx:instruments:SPOT"
+
+    _index: Optional[InstrumentIndex] = None
+    _loaded_at: float = 0.0
+    _failed_at: Optional[float] = None
+    _refreshing: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def refresh_from_okx(cls) -> int:
+        """Tải danh sách instrument từ OKX, ghi vào Redis và cập nhật index local."""
+        instruments = await OKXClient.get_instruments("SPOT")
+        index = InstrumentIndex(instruments)
+        payload = json.dumps({"fetched_at": time.time(), "instruments": list(index.by_id.values())})
+        try:
+            await get_async_redis().set(cls.REDIS_KEY, payload)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không ghi được danh mục instrument vào Redis: {e}")
+        cls._set_index(index)
+        return len(index)
+
+    @classmethod
+    def refresh(cls) -> int:
+        """Phiên bản đồng bộ của `refresh_from_okx` (dùng trong Celery)."""
+        return OKXClient.run_sync(cls.refresh_from_okx())
+
+    @classmethod
+    def _set_index(cls, index: InstrumentIndex) -> None:
+        cls._index = index
+        cls._loaded_at = time.monotonic()
+        cls._failed_at = None
+
+    @classmethod
+    def _backing_off(cls) -> bool:
+        """Lần nạp gần nhất thất bại và chưa hết thời gian chờ trước khi thử lại."""
+        return (
+            cls._failed_at is not None
+            and time.monotonic() - cls._failed_at < CryptoConfig.INSTRUMENT_CATALOG_RETRY_SECONDS
+        )
+
+    @classmethod
+    async def _load(cls) -> None:
+        """Nạp index từ Redis; nếu Redis trống/lỗi thì tải trực tiếp từ OKX."""
+        try:
+            raw = await get_async_redis().get(cls.REDIS_KEY)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đọc được danh mục instrument từ Redis: {e}")
+            raw = None
+        if raw:
+            cls._set_index(InstrumentIndex(json.loads(raw)["instruments"]))
+            return
+        try:
+            await cls.refresh_from_okx()
+        except Exception as e:
+            cls._failed_at = time.monotonic()
+            logger.error(f"Lỗi khi lấy danh sách instruments từ OKX, thử lại sau "
+                         f"{CryptoConfig.INSTRUMENT_CATALOG_RETRY_SECONDS:.0f}s: {e}")
+
+    @classmethod
+    async def _background_reload(cls) -> None:
+        try:
+            await cls._load()
+        finally:
+            cls._refreshing = None
+
+    @classmethod
+    async def aget_index(cls) -> InstrumentIndex:
+        """Trả về index hiện có; nếu đã cũ thì làm mới ở chế độ nền (stale-while-revalidate)."""
+        if cls._backing_off():
+            return cls._index or InstrumentIndex([])
+        if cls._index is None:
+            await cls._load()
+            return cls._index or InstrumentIndex([])
+        stale = time.monotonic() - cls._loaded_at > CryptoConfig.INSTRUMENT_CATALOG_LOCAL_TTL_SECONDS
+        if stale and cls._refreshing is None:
+            cls._refreshing = asyncio.create_task(cls._background_reload())
+        return cls._index
+
+    @classmethod
+    async def ais_valid(cls, symbol: str) -> bool:
+        """Kiểm tra mã có tồn tại trên OKX SPOT."""
+        return (await cls.aget_index()).contains(symbol)
+
+    @classmethod
+    async def asearch(cls, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Tìm kiếm mã theo instId/baseCcy, đã xếp hạng."""
+        return (await cls.aget_index()).search(query, limit=limit)
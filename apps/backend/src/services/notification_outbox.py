@@ -0,0 +1,143 @@
+"""Outbox thông báo Telegram: producer ghi theo lô, sender worker claim và gửi với backoff."""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..constants import CryptoConfig
+from ..models import NotificationOutbox
+from .telegram_dispatcher import TelegramDispatcher
+
+logger = logging.getLogger(__name__)
+
+PENDING = "PENDING"
+SENT = "SENT"
+FAILED = "FAILED"
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Thời gian chờ trước lần gửi thứ `attempts + 1` (cấp số nhân, có trần)."""
+    return min(CryptoConfig.OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), CryptoConfig.OUTBOX_BACKOFF_MAX_SECONDS)
+
+
+class NotificationOutboxService:
+    """
+    Hàng đợi thông báo lưu trong bảng `notification_outbox`.
+
+    Producer (Celery) chỉ INSERT rồi đi tiếp, không chờ Telegram. Sender worker claim các dòng
+    đến hạn bằng `FOR UPDATE SKIP LOCKED` và đẩy `next_attempt_at` thêm một khoảng lease trong
+    cùng câu lệnh: nhiều sender chạy song song không bao giờ lấy trùng dòng, và dòng của một
+    sender chết giữa chừng sẽ được sender khác lấy lại khi hết lease.
+    """
+
+    @staticmethod
+    def enqueue(db: Session, messages: Iterable[Tuple[str, str]], kind: str, commit: bool = True) -> int:
+        """
+        Ghi lô thông báo (chat_id, text) vào outbox bằng một câu INSERT nhiều dòng.
+
+        Args:
+            commit: Commit ngay; truyền False để gộp vào transaction của producer.
+        """
+        now = datetime.utcnow()
+        rows = [
+            {"chat_id": chat_id, "kind": kind, "text": text, "next_attempt_at": now, "created_at": now}
+            for chat_id, text in dict.fromkeys((str(c), t) for c, t in messages)
+        ]
+        if rows:
+            db.execute(insert(NotificationOutbox), rows)
+        if commit:
+            db.commit()
+        return len(rows)
+
+    @staticmethod
+    def claim_stmt(now: datetime, batch_size: int):
+        """Claim tối đa `batch_size` dòng đến hạn và gia hạn lease cho chúng (UPDATE ... RETURNING)."""
+        due = (
+            select(NotificationOutbox.id)
+            .where(NotificationOutbox.status == PENDING, NotificationOutbox.next_attempt_at <= now)
+            .order_by(NotificationOutbox.next_attempt_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        return (
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(due.scalar_subquery()))
+            .values(next_attempt_at=now + timedelta(seconds=CryptoConfig.OUTBOX_LEASE_SECONDS))
+            .returning(
+                NotificationOutbox.id, NotificationOutbox.chat_id, NotificationOutbox.text,
+                NotificationOutbox.attempts, NotificationOutbox.created_at,
+            )
+        )
+
+    @staticmethod
+    async def aclaim(db: AsyncSession, batch_size: int, now: Optional[datetime] = None) -> List:
+        """Claim một lô và commit ngay để không giữ khóa trong lúc gửi."""
+        rows = (await db.execute(
+            NotificationOutboxService.claim_stmt(now or datetime.utcnow(), batch_size),
+            execution_options={"synchronize_session": False},
+        )).all()
+        await db.commit()
+        return rows
+
+    @staticmethod
+    async def adeliver_batch(db: AsyncSession, batch_size: Optional[int] = None) -> int:
+        """
+        Claim, gửi song song và ghi kết quả cho một lô.
+
+        Gửi được thì ghi SENT cùng độ trễ giao tin (từ lúc vào outbox). Lỗi tạm thời thì hẹn
+        lại theo `backoff_seconds`; lỗi vĩnh viễn hoặc quá `OUTBOX_MAX_ATTEMPTS` lần thì FAILED.
+
+        Returns:
+            Số dòng đã claim (0 nghĩa là outbox đang trống).
+        """
+        rows = await NotificationOutboxService.aclaim(db, batch_size or CryptoConfig.OUTBOX_BATCH_SIZE)
+        if not rows:
+            return 0
+
+        deliveries = await asyncio.gather(*(TelegramDispatcher.send_once(r.chat_id, r.text) for r in rows))
+        now = datetime.utcnow()
+        updates, latencies, failed = [], [], 0
+        for row, delivery in zip(rows, deliveries):
+            attempts = row.attempts + 1
+            if delivery.ok:
+                latency_ms = int((now - row.created_at).total_seconds() * 1000)
+                latencies.append(latency_ms)
+                updates.append({"id": row.id, "status": SENT, "attempts": attempts, "sent_at": now,
+                                "latency_ms": latency_ms, "last_error": None})
+            elif not delivery.retryable or attempts >= CryptoConfig.OUTBOX_MAX_ATTEMPTS:
+                failed += 1
+                updates.append({"id": row.id, "status": FAILED, "attempts": attempts, "last_error": delivery.error})
+            else:
+                updates.append({"id": row.id, "attempts": attempts, "last_error": delivery.error,
+                                "next_attempt_at": now + timedelta(seconds=backoff_seconds(attempts))})
+
+        # Cập nhật hàng loạt theo khóa chính (executemany)
+        await db.execute(update(NotificationOutbox), updates)
+        await db.commit()
+
+        if latencies:
+            logger.info(
+                f"📨 Outbox: gửi {len(latencies)}/{len(rows)} tin, độ trễ p50 {np.percentile(latencies, 50):.0f}ms, "
+                f"max {max(latencies)}ms"
+            )
+        if failed:
+            logger.error(f"❌ Outbox: {failed} tin bị bỏ (lỗi vĩnh viễn hoặc hết lượt thử)")
+        return len(rows)
+
+    @staticmethod
+    def clear_sent(db: Session, hours: int = CryptoConfig.OUTBOX_RETENTION_HOURS) -> int:
+        """Xóa các tin đã gửi (hoặc đã bỏ) cũ hơn `hours` giờ."""
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        result = db.execute(
+            delete(NotificationOutbox).where(
+                NotificationOutbox.status.in_((SENT, FAILED)),
+                NotificationOutbox.created_at < cutoff,
+            )
+        )
+        db.commit()
+        return result.rowcount
@@ -0,0 +1,160 @@
+"""Client bất đồng bộ cho OKX V5 API dùng chung một connection pool."""
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Awaitable, Dict, List, Optional, TypeVar
+
+import httpx
+
+from ..constants import CryptoConfig
+from .rate_limiter import OKXRateLimiter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class OKXAPIError(Exception):
+    """OKX trả về mã lỗi nghiệp vụ (code != "0")."""
+
+    def __init__(self, code: str, msg: str):
+        super().__init__(f"OKX API error {code}: {msg}")
+        self.code = code
+        self.msg = msg
+
+
+class OKXClient:
+    """
+    Client OKX V5 dùng chung một httpx.AsyncClient (keep-alive, HTTP/2 nếu có `h2`).
+
+    Mỗi event loop có một client riêng vì connection pool của httpx gắn với loop.
+    Celery (code đồng bộ) gọi qua `run_sync`, chạy coroutine trên một event loop nền
+    sống suốt vòng đời process để pool không bị tạo lại sau mỗi lần gọi.
+    """
+
+    BASE_URL = "https://www.okx.com/api/v5"
+    TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+    LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0)
+
+    # Cho phép test thay transport (httpx.MockTransport)
+    transport: Optional[httpx.AsyncBaseTransport] = None
+
+    _clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+    _bg_loop: Optional[asyncio.AbstractEventLoop] = None
+    _bg_pid: Optional[int] = None
+    _bg_lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """Lấy AsyncClient dùng chung cho event loop hiện tại."""
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=cls.BASE_URL,
+                http2=HTTP2_AVAILABLE and cls.transport is None,
+                timeout=cls.TIMEOUT,
+                limits=cls.LIMITS,
+                transport=cls.transport,
+            )
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Đóng client của event loop hiện tại (gọi khi app shutdown)."""
+        client = cls._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    @classmethod
+    def _get_background_loop(cls) -> asyncio.AbstractEventLoop:
+        """Khởi tạo (lazy) event loop nền cho các lời gọi đồng bộ, an toàn sau fork."""
+        with cls._bg_lock:
+            if cls._bg_loop is None or cls._bg_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="okx-client-loop", daemon=True)
+                thread.start()
+                cls._bg_loop = loop
+                cls._bg_pid = os.getpid()
+            return cls._bg_loop
+
+    @classmethod
+    def run_sync(cls, coro: Awaitable[T]) -> T:
+        """Chạy coroutine trên event loop nền và chờ kết quả (dùng trong Celery)."""
+        return asyncio.run_coroutine_threadsafe(coro, cls._get_background_loop()).result()
+
+    @classmethod
+    async def _get(cls, path: str, params: Dict[str, Any]) -> List[Any]:
+        """Gọi GET tới OKX (sau khi lấy token của endpoint) và trả về trường `data`."""
+        await OKXRateLimiter.acquire(path)
+        response = await cls.get_client().get(path, params=params)
+        response.raise_for_status()
+        payload = response.json()
+        code = str(payload.get("code", "0"))
+        if code != "0":
+            raise OKXAPIError(code, payload.get("msg", ""))
+        return payload.get("data", [])
+
+    @classmethod
+    async def get_tickers(cls, inst_type: str = "SPOT") -> List[Dict[str, Any]]:
+        """Lấy toàn bộ ticker theo loại sản phẩm."""
+        return await cls._get("/market/tickers", {"instType": inst_type})
+
+    @classmethod
+    async def get_instruments(cls, inst_type: str = "SPOT") -> List[Dict[str, Any]]:
+        """Lấy danh sách instruments theo loại sản phẩm."""
+        return await cls._get("/public/instruments", {"instType": inst_type})
+
+    @classmethod
+    async def get_candles(
+        cls, symbol: str, bar: str = "1m", limit: int = 100, after: Optional[int] = None
+    ) -> List[List[str]]:
+        """
+        Lấy nến lịch sử dạng thô (mới nhất đứng đầu) như OKX trả về.
+
+        OKX trả tối đa `CryptoConfig.OKX_CANDLES_MAX_LIMIT` nến mỗi lần gọi; lấy trang cũ hơn
+        bằng `after` (timestamp ms, chỉ trả các nến có thời điểm nhỏ hơn).
+        """
+        params = {"instId": symbol, "bar": bar, "limit": str(min(limit, CryptoConfig.OKX_CANDLES_MAX_LIMIT))}
+        if after is not None:
+            params["after"] = str(after)
+        return await cls._get("/market/history-candles", params)
+
+    @classmethod
+    async def get_candles_batch(
+        cls,
+        symbols: List[str],
+        bar: str = "1m",
+        limit: int = 100,
+        concurrency: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> Dict[str, List[List[str]]]:
+        """
+        Lấy nến cho nhiều mã song song, giới hạn bởi semaphore và token bucket của endpoint.
+
+        Returns:
+            Dict[symbol, nến thô]. Mã bị lỗi sẽ không có trong kết quả (đã log lỗi).
+        """
+        semaphore = asyncio.Semaphore(concurrency or CryptoConfig.OKX_BATCH_CONCURRENCY)
+
+        async def fetch(symbol: str):
+            async with semaphore:
+                return await cls.get_candles(symbol, bar=bar, limit=limit, after=after)
+
+        results = await asyncio.gather(*(fetch(s) for s in symbols), return_exceptions=True)
+        batch = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.error(f"Lỗi khi lấy dữ liệu lịch sử cho {symbol}: {result}")
+                continue
+            batch[symbol] = result
+        return batch
@@ -0,0 +1,179 @@
+"""
+Quét tham số chấm điểm (grid hoặc random search) trên nến lịch sử.
+
+Ngưỡng chấm điểm không ảnh hưởng tới chỉ báo, nên chỉ báo (RSI 1m, BB, RSI ngày) và
+biến động giá tới mốc đối soát được tính một lần cho mỗi nhóm (khoảng thời gian, horizon),
+đặt vào shared memory; các process con đọc chung (chỉ đọc) và chỉ phải chấm điểm lại
+cho từng bộ tham số.
+"""
+import itertools
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context, shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..constants import CryptoConfig
+from .backtester import (
+    WINDOW_1D, WINDOW_1M, DatabaseCandleSource, forward_returns, replay_features,
+    score_features, source_from_spec, summarize,
+)
+from .signal_outcomes import datetimes
+from .signal_scoring import ScoringParams, classify_scores
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ("price", "rsi_1m", "bb_upper", "bb_lower", "rsi_1d", "change")
+
+# Không gian tham số mặc định quanh bộ tham số production. Không quét strong_score: `evaluate`
+# chỉ xét hướng tín hiệu (buy_score), đổi strong_score không thay đổi kết quả.
+DEFAULT_SPACE: Dict[str, List[float]] = {
+    "rsi_oversold": [25, 30, 35],
+    "rsi_low": [40, 45],
+    "rsi_high": [55, 60],
+    "rsi_overbought": [65, 70, 75],
+    "daily_rsi_bull": [50, 55, 60],
+    "daily_rsi_bear": [40, 45, 50],
+    "buy_score": [1, 2, 3],
+    "bb_std": [1.5, 2.0, 2.5],
+    "bb_points": [1, 2],
+}
+
+
+def is_valid(params: ScoringParams) -> bool:
+    """Bỏ các bộ tham số vô nghĩa (ngưỡng RSI chồng chéo, ngưỡng mạnh thấp hơn ngưỡng thường)."""
+    return (params.rsi_oversold <= params.rsi_low < params.rsi_high <= params.rsi_overbought
+            and params.daily_rsi_bear <= params.daily_rsi_bull
+            and 0 < params.buy_score <= params.strong_score
+            and params.bb_std > 0)
+
+
+def grid(space: Dict[str, Sequence[float]]) -> List[ScoringParams]:
+    """Mọi tổ hợp của `space` (các tham số không có trong `space` giữ mặc định)."""
+    names = list(space)
+    candidates = (ScoringParams(**dict(zip(names, values))) for values in itertools.product(*space.values()))
+    return [p for p in candidates if is_valid(p)]
+
+
+def random_search(space: Dict[str, Sequence[float]], samples: int, seed: Optional[int] = None) -> List[ScoringParams]:
+    """`samples` bộ tham số hợp lệ chọn ngẫu nhiên (không trùng) từ `space`."""
+    rng = random.Random(seed)
+    total = 1
+    for values in space.values():
+        total *= len(values)
+    seen, candidates = set(), []
+    while len(candidates) < samples and len(seen) < total:
+        values = tuple(rng.choice(list(v)) for v in space.values())
+        if values in seen:
+            continue
+        seen.add(values)
+        params = ScoringParams(**dict(zip(space, values)))
+        if is_valid(params):
+            candidates.append(params)
+    return candidates
+
+
+def evaluate(features: np.ndarray, params: ScoringParams) -> Dict[str, Any]:
+    """
+    Chỉ số của một bộ tham số trên ma trận đặc trưng (len(FEATURES), N) đã sắp theo thời gian.
+    Chỉ các nến có biến động tới mốc đối soát (cột change khác NaN) được tính.
+    """
+    columns = dict(zip(FEATURES, features))
+    direction = classify_scores(score_features(columns, params), params)
+    change = columns["change"]
+    emitted = (direction != 0) & ~np.isnan(change)
+    returns = direction[emitted] * change[emitted]
+    return summarize(returns, np.sign(returns))
+
+
+# ---------- Process con ----------
+
+_shared: Dict[str, Any] = {}
+
+
+def _symbol_features(symbol: str, start: datetime, end: datetime, horizon_minutes: int,
+                     source_spec: Tuple[str, Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(thời điểm, ma trận đặc trưng) của một mã trong [start, end]."""
+    source = source_from_spec(source_spec)
+    ts_1m, close_1m = source.load(symbol, "1m", start - timedelta(minutes=3 * WINDOW_1M), end)
+    ts_1d, close_1d = source.load(symbol, "1D", start - timedelta(days=2 * WINDOW_1D), end)
+    columns = replay_features(ts_1m, close_1m, ts_1d, close_1d)
+    index = columns["index"]
+    columns["change"] = forward_returns(ts_1m, close_1m, index, horizon_minutes)
+    keep = ts_1m[index] >= datetimes(start)
+    return ts_1m[index][keep], np.stack([columns[name][keep] for name in FEATURES])
+
+
+def _attach(name: str, shape: Tuple[int, int]) -> None:
+    """Initializer của process con: gắn ma trận đặc trưng trong shared memory (chỉ đọc)."""
+    block = shared_memory.SharedMemory(name=name)
+    features = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+    features.flags.writeable = False
+    _shared["block"], _shared["features"] = block, features
+
+
+def _evaluate_many(params_list: List[ScoringParams]) -> List[Dict[str, Any]]:
+    return [evaluate(_shared["features"], params) for params in params_list]
+
+
+class ParamSweep:
+    """Đánh giá nhiều bộ ScoringParams song song và xếp hạng."""
+
+    @staticmethod
+    def load_features(symbols: Sequence[str], start: datetime, end: datetime, horizon_minutes: int,
+                      source=None, workers: Optional[int] = None) -> np.ndarray:
+        """Đặc trưng của mọi mã, ghép và sắp theo thời gian: ma trận (len(FEATURES), N)."""
+        source = source or DatabaseCandleSource()
+        args = [(s, start, end, horizon_minutes, source.spec) for s in symbols]
+        if (workers or 1) == 1:
+            parts = [_symbol_features(*a) for a in args]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+                parts = list(pool.map(_symbol_features, *zip(*args))) if args else []
+        if not parts:
+            return np.empty((len(FEATURES), 0))
+        ts = np.concatenate([p[0] for p in parts])
+        features = np.concatenate([p[1] for p in parts], axis=1)
+        return features[:, np.argsort(ts, kind="stable")]
+
+    @staticmethod
+    def run(symbols: Sequence[str], start: datetime, end: datetime, candidates: Sequence[ScoringParams],
+            source=None, workers: Optional[int] = None,
+            horizon_minutes: int = CryptoConfig.SIGNAL_PRIMARY_HORIZON_MINUTES,
+            sort_by: str = "expectancy", min_signals: int = CryptoConfig.SWEEP_MIN_SIGNALS) -> List[Dict[str, Any]]:
+        """
+        Returns:
+            Bảng xếp hạng (giảm dần theo `sort_by`), mỗi dòng gồm params và các chỉ số
+            của `summarize`; bộ tham số có ít hơn `min_signals` kèo xếp cuối.
+        """
+        workers = workers or os.cpu_count() or 1
+        features = ParamSweep.load_features(symbols, start, end, horizon_minutes, source, workers)
+        logger.info(f"🧮 Quét {len(candidates)} bộ tham số trên {features.shape[1]} nến của {len(symbols)} mã")
+
+        if workers == 1 or len(candidates) < 2:
+            results = [evaluate(features, params) for params in candidates]
+        else:
+            block = shared_memory.SharedMemory(create=True, size=max(features.nbytes, 1))
+            try:
+                np.ndarray(features.shape, dtype=np.float64, buffer=block.buf)[:] = features
+                chunks = [list(candidates[i::workers]) for i in range(workers)]
+                with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                         initializer=_attach, initargs=(block.name, features.shape)) as pool:
+                    outputs = list(pool.map(_evaluate_many, chunks))
+                # Ghép lại đúng thứ tự `candidates` (chunk i chứa các phần tử i, i + workers, ...)
+                results = [None] * len(candidates)
+                for i, chunk_results in enumerate(outputs):
+                    results[i::workers] = chunk_results
+            finally:
+                block.close()
+                block.unlink()
+
+        table = [{"params": params.to_dict(), **metrics} for params, metrics in zip(candidates, results)]
+        table.sort(key=lambda row: (row["signals"] >= min_signals, row[sort_by]), reverse=True)
+        for rank, row in enumerate(table, start=1):
+            row["rank"] = rank
+        return table
@@ -0,0 +1,86 @@
+"""Quản lý partition theo ngày cho các bảng nến (PostgreSQL native range partitioning)."""
+import logging
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionManager:
+    """
+    Tạo trước partition cho các ngày sắp tới và xóa partition đã hết hạn.
+
+    Partition được đặt tên `<bảng>_pYYYYMMDD`, chứa dữ liệu trong khoảng [ngày, ngày + 1).
+    Ranh giới ngày là giờ UTC (naive), cùng đồng hồ với timestamp nến và `datetime.utcnow()`
+    mà các task dùng để tính ngày tạo trước và mốc xóa.
+    Xóa dữ liệu cũ bằng DETACH + DROP cả partition thay cho DELETE hàng loạt
+    (không sinh WAL cho từng dòng, không để lại bloat cần VACUUM).
+    """
+
+    @staticmethod
+    def partition_name(table: str, day: date) -> str:
+        return f"{table}_p{day:%Y%m%d}"
+
+    @staticmethod
+    def is_partitioned(db: Session, table: str) -> bool:
+        """Bảng đã là partitioned table chưa (luôn False nếu không phải PostgreSQL)."""
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        return db.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+            {"table": table},
+        ).first() is not None
+
+    @staticmethod
+    def list_partitions(db: Session, table: str) -> List[Tuple[str, date]]:
+        """Danh sách (tên partition, ngày) theo thứ tự thời gian."""
+        rows = db.execute(
+            text("""
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass(:table)
+            """),
+            {"table": table},
+        ).all()
+        prefix = f"{table}_p"
+        partitions = []
+        for (name,) in rows:
+            if name.startswith(prefix):
+                partitions.append((name, datetime.strptime(name[len(prefix):], "%Y%m%d").date()))
+        return sorted(partitions, key=lambda p: p[1])
+
+    @staticmethod
+    def ensure_partitions(db: Session, table: str, start: date, end: date) -> int:
+        """Tạo các partition còn thiếu cho mọi ngày trong [start, end]. Trả về số partition mới."""
+        created = 0
+        day = start
+        while day <= end:
+            name = PartitionManager.partition_name(table, day)
+            exists = db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+            if exists is None:
+                db.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+                ))
+                created += 1
+            day += timedelta(days=1)
+        db.commit()
+        return created
+
+    @staticmethod
+    def drop_partitions_before(db: Session, table: str, cutoff: datetime) -> int:
+        """DETACH và DROP các partition mà toàn bộ dữ liệu cũ hơn `cutoff`. Trả về số partition đã xóa."""
+        dropped = 0
+        for name, day in PartitionManager.list_partitions(db, table):
+            if datetime.combine(day + timedelta(days=1), datetime.min.time()) > cutoff:
+                break
+            db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            dropped += 1
+            logger.info(f"🗑️ Đã xóa partition {name}.")
+        db.commit()
+        return dropped
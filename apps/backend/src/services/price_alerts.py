@@ -0,0 +1,316 @@
+"""Cảnh báo giá theo người dùng: lưu trong bảng price_alerts, đánh giá qua index ngưỡng đã sắp xếp."""
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import case, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..constants import CryptoConfig
+from ..models import PriceAlert
+from ..redis_client import get_async_redis, get_redis
+from .notification_outbox import NotificationOutboxService
+
+logger = logging.getLogger(__name__)
+
+ABOVE = "ABOVE"
+BELOW = "BELOW"
+
+# Cảnh báo đã lấy ra khỏi index trong transaction chưa commit của session (trả lại nếu rollback)
+POPPED_INFO_KEY = "price_alerts_popped"
+
+Entry = Tuple[str, str, float]  # (symbol, chiều, giá mục tiêu)
+
+
+class ThresholdBook:
+    """
+    Ngưỡng của một mã theo một chiều, sắp tăng dần theo khóa sao cho cảnh báo bị chạm luôn nằm
+    ở đuôi danh sách: ABOVE dùng khóa -target (chạm khi target <= giá), BELOW dùng khóa target
+    (chạm khi target >= giá). Vị trí cắt tìm bằng bisect O(log n), cắt đuôi k phần tử O(k).
+    """
+
+    def __init__(self, direction: str):
+        self.sign = -1.0 if direction == ABOVE else 1.0
+        self.keys: List[float] = []
+        self.ids: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, alert_id: int, target: float) -> None:
+        key = self.sign * target
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.ids.insert(i, alert_id)
+
+    def remove(self, alert_id: int, target: float) -> bool:
+        key = self.sign * target
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.ids[i] == alert_id:
+                del self.keys[i], self.ids[i]
+                return True
+            i += 1
+        return False
+
+    def pop_triggered(self, price: float) -> List[int]:
+        """Lấy ra (và xóa khỏi book) các cảnh báo bị chạm ở mức giá `price`."""
+        i = bisect_left(self.keys, self.sign * price)
+        triggered = self.ids[i:]
+        del self.keys[i:], self.ids[i:]
+        return triggered
+
+
+class PriceAlertIndex:
+    """
+    Index cảnh báo đang bật của process: (symbol, chiều) -> ThresholdBook.
+
+    Lần đầu nạp toàn bộ từ DB; sau đó chỉ đọc các dòng có `updated_at` mới (chồng lấn
+    `PRICE_ALERT_SYNC_OVERLAP_SECONDS` để không lỡ transaction commit muộn), và chỉ khi
+    `alerts:price:version` trong Redis đổi (API tăng sau mỗi lần tạo/xóa). Redis lỗi thì
+    đồng bộ tăng dần theo chu kỳ `PRICE_ALERT_SYNC_SECONDS`.
+    """
+
+    VERSION_KEY = "alerts:price:version"
+
+    _books: Dict[Tuple[str, str], ThresholdBook] = {}
+    _entries: Dict[int, Entry] = {}
+    _synced_at: Optional[datetime] = None
+    _version: Optional[str] = None
+    _checked_at: float = 0.0
+
+    @staticmethod
+    def rows_stmt(since: Optional[datetime] = None):
+        stmt = select(
+            PriceAlert.id, PriceAlert.symbol, PriceAlert.direction, PriceAlert.target_price, PriceAlert.is_active
+        )
+        if since is None:
+            return stmt.where(PriceAlert.is_active == True)
+        return stmt.where(PriceAlert.updated_at > since)
+
+    @classmethod
+    def reset(cls) -> None:
+        cls._books, cls._entries = {}, {}
+        cls._synced_at, cls._version, cls._checked_at = None, None, 0.0
+
+    @classmethod
+    def add(cls, alert_id: int, symbol: str, direction: str, target: float) -> None:
+        if alert_id in cls._entries:
+            return
+        book = cls._books.get((symbol, direction))
+        if book is None:
+            book = cls._books[(symbol, direction)] = ThresholdBook(direction)
+        book.add(alert_id, target)
+        cls._entries[alert_id] = (symbol, direction, target)
+
+    @classmethod
+    def remove(cls, alert_id: int) -> None:
+        entry = cls._entries.pop(alert_id, None)
+        if entry is not None:
+            symbol, direction, target = entry
+            cls._books[(symbol, direction)].remove(alert_id, target)
+
+    @classmethod
+    def _apply(cls, rows) -> None:
+        for alert_id, symbol, direction, target, is_active in rows:
+            if is_active:
+                cls.add(alert_id, symbol, direction, target)
+            else:
+                cls.remove(alert_id)
+
+    @classmethod
+    def sync(cls, db: Session) -> None:
+        """Đồng bộ index với bảng price_alerts nếu đã quá `PRICE_ALERT_SYNC_SECONDS` từ lần kiểm tra trước."""
+        if cls._synced_at is not None and time.monotonic() - cls._checked_at < CryptoConfig.PRICE_ALERT_SYNC_SECONDS:
+            return
+        try:
+            version = get_redis().get(cls.VERSION_KEY)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đọc được version cảnh báo giá từ Redis: {e}")
+            version = None
+
+        started = datetime.utcnow()
+        if cls._synced_at is None:
+            cls.reset()
+            cls._apply(db.execute(cls.rows_stmt()).all())
+            logger.info(f"🎯 Đã nạp {len(cls._entries)} cảnh báo giá vào index.")
+        elif version is None or version != cls._version:
+            since = cls._synced_at - timedelta(seconds=CryptoConfig.PRICE_ALERT_SYNC_OVERLAP_SECONDS)
+            cls._apply(db.execute(cls.rows_stmt(since)).all())
+        else:
+            started = cls._synced_at
+        cls._synced_at, cls._version, cls._checked_at = started, version, time.monotonic()
+
+    @classmethod
+    def pop_triggered(cls, symbol: str, price: float) -> Dict[int, Entry]:
+        """Các cảnh báo của mã bị chạm ở mức `price` (O(log n + k)), xóa khỏi index."""
+        triggered = []
+        for direction in (ABOVE, BELOW):
+            book = cls._books.get((symbol, direction))
+            if book:
+                triggered.extend(book.pop_triggered(price))
+        return {alert_id: cls._entries.pop(alert_id) for alert_id in triggered}
+
+    @classmethod
+    def symbols(cls, db: Session) -> List[str]:
+        """Các mã đang có cảnh báo giá (để đưa vào danh sách crawl/stream)."""
+        cls.sync(db)
+        return sorted({symbol for (symbol, _), book in cls._books.items() if book})
+
+    @classmethod
+    async def abump_version(cls) -> None:
+        """Báo cho các process khác đồng bộ lại (gọi sau khi tạo/xóa cảnh báo)."""
+        try:
+            await get_async_redis().incr(cls.VERSION_KEY)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không tăng được version cảnh báo giá: {e}")
+
+
+def render_alerts(alerts) -> str:
+    """Một tin cho các cảnh báo giá của cùng một chat."""
+    message = "<b>🎯 CẢNH BÁO GIÁ</b>\n"
+    for a in alerts:
+        name = a.symbol.replace("-USDT", "")
+        verb = "đã lên" if a.direction == ABOVE else "đã xuống"
+        message += f"🔸 <b>{name}</b> {verb} ${a.target_price:,.2f} (giá ${a.triggered_price:,.2f})"
+        if a.change_pct is not None:
+            message += f" | {a.change_pct:+.2f}% từ ${a.reference_price:,.2f}"
+        message += "\n"
+    return message
+
+
+class PriceAlertService:
+    @staticmethod
+    def target_for(current_price: float, price: Optional[float] = None,
+                   change_pct: Optional[float] = None) -> Tuple[str, float]:
+        """
+        (chiều, giá mục tiêu) của cảnh báo theo mức giá hoặc theo % so với giá hiện tại.
+
+        Raises:
+            ValueError: Mức giá trùng giá hiện tại hoặc % thay đổi bằng 0 (cảnh báo sẽ bắn ngay).
+        """
+        if change_pct is not None:
+            if change_pct == 0:
+                raise ValueError("% thay đổi phải khác 0.")
+            return (ABOVE if change_pct > 0 else BELOW), current_price * (1 + change_pct / 100)
+        if price == current_price:
+            raise ValueError(f"Mức giá trùng giá hiện tại (${current_price:,.2f}), hãy chọn mức khác.")
+        return (ABOVE if price > current_price else BELOW), price
+
+    @staticmethod
+    def active_stmt(chat_id: str):
+        return select(PriceAlert).where(
+            PriceAlert.chat_id == chat_id,
+            PriceAlert.is_active == True
+        ).order_by(PriceAlert.symbol, PriceAlert.target_price)
+
+    @staticmethod
+    async def acreate(db: AsyncSession, chat_id: str, symbol: str, current_price: float,
+                      price: Optional[float] = None, change_pct: Optional[float] = None) -> PriceAlert:
+        """
+        Tạo cảnh báo giá (đúng một trong `price` / `change_pct`).
+
+        Raises:
+            ValueError: Vượt số cảnh báo tối đa của chat, hoặc mức giá / % không tạo được cảnh báo
+                (xem `target_for`).
+        """
+        direction, target = PriceAlertService.target_for(current_price, price, change_pct)
+        count = (await db.execute(
+            select(func.count()).select_from(PriceAlert).where(
+                PriceAlert.chat_id == chat_id, PriceAlert.is_active == True
+            )
+        )).scalar()
+        if count >= CryptoConfig.PRICE_ALERT_MAX_PER_CHAT:
+            raise ValueError(f"Mỗi chat chỉ được đặt tối đa {CryptoConfig.PRICE_ALERT_MAX_PER_CHAT} cảnh báo giá.")
+
+        alert = PriceAlert(
+            chat_id=chat_id, symbol=symbol, direction=direction, target_price=target,
+            change_pct=change_pct, reference_price=current_price,
+        )
+        db.add(alert)
+        await db.commit()
+        await db.refresh(alert)
+        await PriceAlertIndex.abump_version()
+        return alert
+
+    @staticmethod
+    async def alist(db: AsyncSession, chat_id: str) -> List[PriceAlert]:
+        """Các cảnh báo giá đang bật của chat."""
+        return (await db.execute(PriceAlertService.active_stmt(chat_id))).scalars().all()
+
+    @staticmethod
+    async def adelete(db: AsyncSession, chat_id: str, alert_id: int) -> bool:
+        """Tắt cảnh báo (xóa mềm để các process khác thấy thay đổi khi đồng bộ tăng dần)."""
+        result = await db.execute(
+            update(PriceAlert)
+            .where(PriceAlert.id == alert_id, PriceAlert.chat_id == chat_id, PriceAlert.is_active == True)
+            .values(is_active=False)
+        )
+        await db.commit()
+        if not result.rowcount:
+            return False
+        await PriceAlertIndex.abump_version()
+        return True
+
+    @staticmethod
+    def evaluate(db: Session, prices: Dict[str, float], commit: bool = True) -> int:
+        """
+        Đánh giá cảnh báo giá với giá mới của các mã và ghi thông báo vào outbox.
+
+        Index trả về các cảnh báo bị chạm; UPDATE ... WHERE is_active chỉ tắt được những cảnh
+        báo chưa bị process khác bắn, nên mỗi cảnh báo chỉ được gửi một lần. Nếu transaction
+        bị rollback, các cảnh báo đã lấy ra được trả lại index (xem `_restore_popped_after_rollback`).
+
+        Returns:
+            Số cảnh báo đã bắn.
+        """
+        PriceAlertIndex.sync(db)
+        popped: Dict[int, Entry] = {}
+        for symbol, price in prices.items():
+            popped.update(PriceAlertIndex.pop_triggered(symbol, price))
+        if not popped:
+            if commit:
+                db.commit()
+            return 0
+
+        db.info.setdefault(POPPED_INFO_KEY, {}).update(popped)
+        fired = db.execute(
+            update(PriceAlert)
+            .where(PriceAlert.id.in_(list(popped)), PriceAlert.is_active == True)
+            .values(
+                is_active=False,
+                triggered_at=datetime.utcnow(),
+                triggered_price=case(prices, value=PriceAlert.symbol),
+            )
+            .returning(
+                PriceAlert.chat_id, PriceAlert.symbol, PriceAlert.direction, PriceAlert.target_price,
+                PriceAlert.change_pct, PriceAlert.reference_price, PriceAlert.triggered_price,
+            ),
+            execution_options={"synchronize_session": False},
+        ).all()
+
+        by_chat = defaultdict(list)
+        for row in fired:
+            by_chat[row.chat_id].append(row)
+        messages = [(chat_id, render_alerts(rows)) for chat_id, rows in sorted(by_chat.items())]
+        NotificationOutboxService.enqueue(db, messages, kind="PRICE_ALERT", commit=commit)
+        logger.info(f"🎯 {len(fired)} cảnh báo giá được bắn cho {len(by_chat)} chat.")
+        return len(fired)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_popped_after_commit(session: Session) -> None:
+    session.info.pop(POPPED_INFO_KEY, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _restore_popped_after_rollback(session: Session, transaction) -> None:
+    # Transaction gốc kết thúc mà không commit (rollback hoặc close): cảnh báo vẫn bật trong DB
+    if transaction.parent is None:
+        for alert_id, (symbol, direction, target) in session.info.pop(POPPED_INFO_KEY, {}).items():
+            PriceAlertIndex.add(alert_id, symbol, direction, target)
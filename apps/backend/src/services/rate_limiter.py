@@ -0,0 +1,170 @@
+"""Token bucket giới hạn tần suất gọi API, chia sẻ giữa các worker qua Redis."""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+from redis.exceptions import RedisError
+
+from ..constants import CryptoConfig
+from ..redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket trong process, dùng khi không có Redis hoặc cho giới hạn cục bộ."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Lấy token nếu đủ; trả về số giây cần chờ (0 nếu đã lấy được)."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Chờ đến khi lấy được token."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class RedisTokenBucket:
+    """
+    Token bucket lưu trong Redis để mọi worker/process dùng chung một hạn mức.
+
+    Việc nạp lại và lấy token chạy nguyên tử trong một Lua script, dùng đồng hồ của Redis
+    nên không phụ thuộc lệch giờ giữa các máy. Khi Redis lỗi, bucket tạm chuyển sang
+    TokenBucket cục bộ trong `FALLBACK_SECONDS` để không chặn việc crawl.
+    """
+
+    FALLBACK_SECONDS = 30.0
+
+    LUA_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= requested then
+  tokens = tokens - requested
+else
+  wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+    def __init__(self, key: str, rate: float, capacity: float):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self._local = TokenBucket(rate, capacity)
+        self._redis_down_until = 0.0
+
+    async def _try_acquire_redis(self, tokens: float) -> float:
+        result = await get_async_redis().eval(self.LUA_SCRIPT, 1, self.key, self.rate, self.capacity, tokens)
+        return float(result)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Chờ đến khi lấy được token từ bucket dùng chung."""
+        while True:
+            if time.monotonic() < self._redis_down_until:
+                return await self._local.acquire(tokens)
+            try:
+                wait = await self._try_acquire_redis(tokens)
+            except (RedisError, OSError) as e:
+                logger.warning(f"Redis rate limiter lỗi, tạm dùng bucket cục bộ cho {self.key}: {e}")
+                self._redis_down_until = time.monotonic() + self.FALLBACK_SECONDS
+                continue
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class OKXRateLimiter:
+    """Quản lý các bucket theo từng endpoint của OKX (giới hạn theo IP)."""
+
+    KEY_PREFIX = "ratelimit:okx"
+
+    _buckets: Dict[str, RedisTokenBucket] = {}
+
+    @classmethod
+    def limit_for(cls, path: str) -> Optional[Tuple[int, float]]:
+        """Trả về (số request, chu kỳ giây) cho endpoint, None nếu không giới hạn."""
+        return CryptoConfig.OKX_RATE_LIMITS.get(path)
+
+    @classmethod
+    def bucket_for(cls, path: str) -> Optional[RedisTokenBucket]:
+        if path not in cls._buckets:
+            limit = cls.limit_for(path)
+            if limit is None:
+                return None
+            requests, period = limit
+            cls._buckets[path] = RedisTokenBucket(f"{cls.KEY_PREFIX}:{path}", rate=requests / period, capacity=requests)
+        return cls._buckets[path]
+
+    @classmethod
+    async def acquire(cls, path: str) -> None:
+        """Chờ lượt gọi endpoint `path` theo hạn mức chung."""
+        bucket = cls.bucket_for(path)
+        if bucket is not None:
+            await bucket.acquire()
+
+
+class TelegramRateLimiter:
+    """Hạn mức gửi tin của Telegram: một bucket toàn bot và một bucket cho mỗi chat."""
+
+    KEY_PREFIX = "ratelimit:telegram"
+
+    _global: Optional[RedisTokenBucket] = None
+    _chats: "OrderedDict[str, RedisTokenBucket]" = OrderedDict()
+
+    @classmethod
+    def global_bucket(cls) -> RedisTokenBucket:
+        if cls._global is None:
+            requests, period = CryptoConfig.TELEGRAM_RATE_LIMIT_GLOBAL
+            cls._global = RedisTokenBucket(f"{cls.KEY_PREFIX}:global", rate=requests / period, capacity=requests)
+        return cls._global
+
+    @classmethod
+    def chat_bucket(cls, chat_id: Union[str, int]) -> RedisTokenBucket:
+        """Bucket của chat (LRU giới hạn `TELEGRAM_CHAT_BUCKETS_MAX`; trạng thái thật nằm trong Redis)."""
+        key = str(chat_id)
+        bucket = cls._chats.get(key)
+        if bucket is None:
+            requests, period = CryptoConfig.TELEGRAM_RATE_LIMIT_CHAT
+            bucket = RedisTokenBucket(f"{cls.KEY_PREFIX}:chat:{key}", rate=requests / period, capacity=requests)
+            cls._chats[key] = bucket
+            if len(cls._chats) > CryptoConfig.TELEGRAM_CHAT_BUCKETS_MAX:
+                cls._chats.popitem(last=False)
+        else:
+            cls._chats.move_to_end(key)
+        return bucket
+
+    @classmethod
+    async def acquire(cls, chat_id: Union[str, int]) -> None:
+        """Chờ lượt gửi cho chat (theo hạn mức chat trước, rồi hạn mức toàn bot)."""
+        await cls.chat_bucket(chat_id).acquire()
+        await cls.global_bucket().acquire()
@@ -0,0 +1,115 @@
+"""Đối soát tín hiệu theo nhiều mốc thời gian bằng as-of join vector trên nến 1m (hàm thuần, không I/O)."""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+NO_DATA = "NO_DATA"
+RESOLVED_RESULTS = ("WIN", "LOSS", "DRAW")
+
+
+def signal_return(signal_type: str, entry_price: float, exit_price: float) -> float:
+    """Lợi nhuận (tỷ lệ) theo hướng tín hiệu: BUY lời khi giá tăng, SELL lời khi giá giảm."""
+    change = (exit_price - entry_price) / entry_price
+    return change if signal_type == "BUY" else -change
+
+
+def minutes(values) -> np.ndarray:
+    return np.asarray(values, dtype="timedelta64[m]").astype("timedelta64[us]")
+
+
+def datetimes(values) -> np.ndarray:
+    return np.asarray(values, dtype="datetime64[us]")
+
+
+def asof_close(ts: np.ndarray, close: np.ndarray, targets: np.ndarray, tolerance: np.ndarray):
+    """
+    As-of join: với mỗi mốc trong `targets`, lấy nến cuối cùng có timestamp <= mốc.
+
+    Returns:
+        (found, candle_ts, exit_price) cùng shape với `targets`; `found` False khi không có
+        nến hoặc nến cách mốc quá `tolerance`.
+    """
+    idx = np.searchsorted(ts, targets, side="right") - 1
+    found = idx >= 0
+    if not ts.size:
+        return found, np.full(targets.shape, np.datetime64("NaT"), dtype="datetime64[us]"), np.full(targets.shape, np.nan)
+    safe_idx = np.where(found, idx, 0)
+    candle_ts, exit_price = ts[safe_idx], close[safe_idx]
+    found &= targets - candle_ts <= tolerance
+    return found, candle_ts, exit_price
+
+
+def evaluate_outcomes(signals: Sequence[Any], candles: Iterable[Tuple[str, datetime, float]],
+                      last_timestamps: Dict[str, datetime], horizons: Sequence[int], now: datetime,
+                      tolerance_minutes: int, grace_minutes: int,
+                      done: Optional[Set[Tuple[int, int]]] = None) -> List[Dict[str, Any]]:
+    """
+    Kết quả của các tín hiệu tại `timestamp + horizon`.
+
+    Với mỗi mã, mọi mốc (tín hiệu x horizon) được tra cùng lúc bằng `np.searchsorted`
+    trên dãy timestamp nến: nến dùng đối soát là nến cuối cùng có timestamp <= mốc.
+
+    - Có nến cách mốc không quá `tolerance_minutes` và đã có nến mới hơn mốc
+      (nến đối soát đã đóng) -> WIN/LOSS/DRAW theo giá đóng cửa của nến đó.
+    - Đã quá mốc `grace_minutes` mà vẫn không có nến phù hợp -> NO_DATA.
+    - Còn lại: chưa tới lúc đối soát, bỏ qua để lần sau tính.
+
+    Args:
+        signals: Các dòng có id, symbol, signal_type, entry_price, timestamp.
+        candles: (symbol, timestamp, close) sắp xếp theo symbol rồi timestamp.
+        last_timestamps: Nến mới nhất đã lưu của từng mã.
+        done: Các cặp (signal_id, horizon) đã có kết quả, không tính lại.
+
+    Returns:
+        Danh sách dict có signal_id, horizon_minutes, exit_price, result, candle_timestamp.
+    """
+    done = done or set()
+    series: Dict[str, Tuple[list, list]] = defaultdict(lambda: ([], []))
+    for symbol, ts, close in candles:
+        series[symbol][0].append(ts)
+        series[symbol][1].append(close)
+
+    by_symbol: Dict[str, list] = defaultdict(list)
+    for signal in signals:
+        by_symbol[signal.symbol].append(signal)
+
+    steps = minutes(horizons)
+    tolerance, grace = minutes(tolerance_minutes), minutes(grace_minutes)
+    now64 = datetimes(now)
+    outcomes = []
+    for symbol, rows in by_symbol.items():
+        ts, close = series.get(symbol, ([], []))
+        ts, close = datetimes(ts), np.asarray(close, dtype=float)
+        last = last_timestamps.get(symbol)
+
+        # Ma trận (tín hiệu x horizon) các mốc cần tra
+        targets = datetimes([r.timestamp for r in rows])[:, None] + steps[None, :]
+        found, candle_ts, exit_price = asof_close(ts, close, targets, tolerance)
+        elapsed = targets < datetimes(last) if last is not None else np.zeros(targets.shape, dtype=bool)
+        ready = found & elapsed
+        expired = ~ready & (now64 >= targets + grace)
+
+        entry = np.array([r.entry_price for r in rows], dtype=float)[:, None]
+        is_buy = np.array([r.signal_type == "BUY" for r in rows])[:, None]
+        win = np.where(is_buy, exit_price > entry, exit_price < entry)
+
+        for i, j in zip(*np.nonzero(ready | expired)):
+            key = (rows[i].id, int(horizons[j]))
+            if key in done:
+                continue
+            if ready[i, j]:
+                outcomes.append({
+                    "signal_id": key[0],
+                    "horizon_minutes": key[1],
+                    "exit_price": float(exit_price[i, j]),
+                    "result": "DRAW" if exit_price[i, j] == entry[i, 0] else ("WIN" if win[i, j] else "LOSS"),
+                    "candle_timestamp": candle_ts[i, j].astype(datetime),
+                })
+            else:
+                outcomes.append({
+                    "signal_id": key[0], "horizon_minutes": key[1],
+                    "exit_price": None, "result": NO_DATA, "candle_timestamp": None,
+                })
+    return outcomes
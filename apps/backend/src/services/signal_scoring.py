@@ -0,0 +1,172 @@
+"""Signal Scoring System: chấm điểm tín hiệu từ chỉ báo kỹ thuật (hàm thuần, không I/O)."""
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NOT_READY_SUGGESTION = "⚪ ĐANG CẬP NHẬT [Chưa đủ dữ liệu nến]"
+# Độ lệch chuẩn của dải Bollinger trong chỉ báo (ta_service, backtester)
+BB_STD = 2.0
+
+
+class ScoringParams:
+    """Ngưỡng chấm điểm; giá trị mặc định là bộ tham số đang chạy production."""
+
+    def __init__(self, rsi_oversold: float = 30, rsi_low: float = 40, rsi_high: float = 60,
+                 rsi_overbought: float = 70, daily_rsi_bull: float = 55, daily_rsi_bear: float = 45,
+                 buy_score: int = 2, strong_score: int = 4, bb_std: float = BB_STD, bb_points: int = 2):
+        self.rsi_oversold = rsi_oversold
+        self.rsi_low = rsi_low
+        self.rsi_high = rsi_high
+        self.rsi_overbought = rsi_overbought
+        self.daily_rsi_bull = daily_rsi_bull
+        self.daily_rsi_bear = daily_rsi_bear
+        self.buy_score = buy_score
+        self.strong_score = strong_score
+        self.bb_std = bb_std
+        self.bb_points = bb_points
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+DEFAULT_PARAMS = ScoringParams()
+
+
+def _value(x: Optional[float]) -> float:
+    return math.nan if x is None else float(x)
+
+
+def score_components(rsi_1m, bb_upper, bb_lower, rsi_1d, price, params: ScoringParams = DEFAULT_PARAMS):
+    """
+    Điểm thành phần (RSI 1m, Bollinger Bands 1m, xu hướng RSI 1D), tính vector trên mảng.
+
+    `bb_upper`/`bb_lower` là dải tính với BB_STD; `params.bb_std` khác thì dải được co giãn
+    quanh đường giữa nên quét tham số không phải tính lại chỉ báo.
+
+    NaN (chưa đủ dữ liệu) cho 0 điểm vì mọi phép so sánh với NaN đều False.
+    """
+    rsi_1m, rsi_1d = np.asarray(rsi_1m, dtype=float), np.asarray(rsi_1d, dtype=float)
+    bb_upper, bb_lower = np.asarray(bb_upper, dtype=float), np.asarray(bb_lower, dtype=float)
+    price = np.asarray(price, dtype=float)
+
+    rsi_points = np.select(
+        [rsi_1m < params.rsi_oversold, rsi_1m < params.rsi_low,
+         rsi_1m > params.rsi_overbought, rsi_1m > params.rsi_high],
+        [2, 1, -2, -1], 0,
+    )
+    if params.bb_std != BB_STD:
+        # Dải trong chỉ báo tính với BB_STD: giữ đường giữa, co giãn nửa độ rộng theo bb_std
+        middle = (bb_upper + bb_lower) / 2
+        half_width = (bb_upper - bb_lower) / 2 * (params.bb_std / BB_STD)
+        bb_upper, bb_lower = middle + half_width, middle - half_width
+    bb_points = np.select([price <= bb_lower, price >= bb_upper], [params.bb_points, -params.bb_points], 0)
+    trend_points = np.select([rsi_1d > params.daily_rsi_bull, rsi_1d < params.daily_rsi_bear], [1, -1], 0)
+    return rsi_points, bb_points, trend_points
+
+
+def classify(score: int, params: ScoringParams = DEFAULT_PARAMS) -> Tuple[str, Optional[str]]:
+    """Kết luận (nhãn hiển thị, BUY/SELL/None) từ tổng điểm."""
+    if score >= params.strong_score:
+        return "🔥 MUA MẠNH", "BUY"
+    if score >= params.buy_score:
+        return "🟢 MUA", "BUY"
+    if score <= -params.strong_score:
+        return "💀 BÁN MẠNH", "SELL"
+    if score <= -params.buy_score:
+        return "🔴 BÁN", "SELL"
+    return "⚪ TRUNG LẬP", None
+
+
+def classify_scores(scores, params: ScoringParams = DEFAULT_PARAMS) -> np.ndarray:
+    """Hướng tín hiệu của cả mảng điểm: 1 (BUY), -1 (SELL), 0 (không có tín hiệu), khớp `classify`."""
+    scores = np.asarray(scores)
+    return np.select([scores >= params.buy_score, scores <= -params.buy_score], [1, -1], 0)
+
+
+def _reasons(rsi_points: int, bb_points: int, trend_points: int, rsi_1m: float) -> List[str]:
+    reasons = []
+    if rsi_points == 2:
+        reasons.append(f"RSI Quá bán ({rsi_1m:.1f})")
+    elif rsi_points == 1:
+        reasons.append("RSI Thấp")
+    elif rsi_points == -2:
+        reasons.append(f"RSI Quá mua ({rsi_1m:.1f})")
+    elif rsi_points == -1:
+        reasons.append("RSI Cao")
+    if bb_points > 0:
+        reasons.append("Chạm đáy BB")
+    elif bb_points < 0:
+        reasons.append("Chạm đỉnh BB")
+    if trend_points == 1:
+        reasons.append("Xu hướng ngày Tăng")
+    elif trend_points == -1:
+        reasons.append("Xu hướng ngày Giảm")
+    return reasons
+
+
+def format_suggestion(score: int, reasons: List[str], params: ScoringParams = DEFAULT_PARAMS) -> str:
+    status, _ = classify(score, params)
+    reasons_text = f" | {', '.join(reasons[:2])}" if reasons else ""
+    return f"<b>{status}</b> [Điểm: {score:+} {reasons_text}]"
+
+
+def score_indicators(ta_1m: Dict[str, Any], ta_1d: Dict[str, Any], current_price: float,
+                     params: ScoringParams = DEFAULT_PARAMS) -> Tuple[str, Optional[str], int]:
+    """Chấm điểm một mã từ kết quả `calculate_indicators`; trả về (câu gợi ý, BUY/SELL/None, điểm)."""
+    if ta_1m.get("status") != "success":
+        return NOT_READY_SUGGESTION, None, 0
+
+    bb = ta_1m.get("bbands") or {}
+    rsi_1m = _value(ta_1m.get("rsi"))
+    components = score_components(
+        rsi_1m, _value(bb.get("upper")), _value(bb.get("lower")), _value(ta_1d.get("rsi")), current_price, params
+    )
+    points = [int(c) for c in components]
+    score = sum(points)
+    _, signal_type = classify(score, params)
+    return format_suggestion(score, _reasons(*points, rsi_1m), params), signal_type, score
+
+
+def score_table(symbols: Sequence[str], ta_1m: Sequence[Dict[str, Any]], ta_1d: Sequence[Dict[str, Any]],
+                prices: Sequence[float], params: ScoringParams = DEFAULT_PARAMS) -> Dict[str, Dict[str, Any]]:
+    """
+    Chấm điểm nhiều mã cùng lúc (điểm thành phần tính vector trên toàn bộ danh sách).
+
+    Args:
+        ta_1m, ta_1d: kết quả chỉ báo của từng mã, cùng thứ tự với `symbols`
+            (xem `TechnicalAnalysisService.calculate_indicators_batch`).
+        prices: giá hiện tại của từng mã.
+
+    Returns:
+        Bảng điểm theo mã: {symbol: {price, score, signal_type, suggestion, rsi_1m}}.
+    """
+    bbands = [t.get("bbands") or {} for t in ta_1m]
+    rsi_1m = np.array([_value(t.get("rsi")) for t in ta_1m])
+    rsi_points, bb_points, trend_points = score_components(
+        rsi_1m,
+        [_value(b.get("upper")) for b in bbands],
+        [_value(b.get("lower")) for b in bbands],
+        [_value(t.get("rsi")) for t in ta_1d],
+        prices,
+        params,
+    )
+
+    table = {}
+    for i, symbol in enumerate(symbols):
+        price = float(prices[i])
+        if ta_1m[i].get("status") != "success":
+            table[symbol] = {"symbol": symbol, "price": price, "score": 0,
+                             "signal_type": None, "suggestion": NOT_READY_SUGGESTION, "rsi_1m": None}
+            continue
+        points = (int(rsi_points[i]), int(bb_points[i]), int(trend_points[i]))
+        score = sum(points)
+        table[symbol] = {
+            "symbol": symbol,
+            "price": price,
+            "score": score,
+            "signal_type": classify(score, params)[1],
+            "suggestion": format_suggestion(score, _reasons(*points, float(rsi_1m[i])), params),
+            "rsi_1m": ta_1m[i].get("rsi"),
+        }
+    return table
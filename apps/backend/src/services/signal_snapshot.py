@@ -0,0 +1,120 @@
+"""Snapshot tín hiệu (giá, gợi ý, điểm, đỉnh/đáy 24h) tính sẵn sau mỗi lần đóng nến, lưu trong Redis."""
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..constants import CryptoConfig
+from ..redis_client import get_async_redis, get_redis
+from .crypto_repository import CryptoRepository
+
+logger = logging.getLogger(__name__)
+
+
+class SignalSnapshot:
+    """
+    Bảng gợi ý cho toàn bộ danh sách coin, được Celery tính một lần cho mỗi nến đóng
+    (`record_predictions_task`) rồi ghi vào Redis. `/prices` chỉ đọc snapshot; khi
+    snapshot hết hạn hoặc Redis lỗi thì tính tại chỗ từ DB nhưng không ghi tín hiệu.
+    """
+
+    REDIS_KEY = "signals:snapshot"
+    CLAIM_KEY_PREFIX = "signals:snapshot:candle"
+    SCHEDULE_KEY_PREFIX = "signals:snapshot:scheduled"
+
+    @staticmethod
+    def build(tickers: List[Dict[str, Any]], table: Dict[str, Dict], stats: Dict[str, Dict[str, float]],
+              candle_ts: Optional[datetime] = None) -> Dict[str, Any]:
+        """Ghép ticker với bảng điểm và đỉnh/đáy 24h (hàm thuần, giữ thứ tự `tickers`)."""
+        coins = []
+        for ticker in tickers:
+            symbol = ticker.get("instId")
+            row = table.get(symbol, {})
+            coin_stats = stats.get(symbol, {"max": 0, "min": 0})
+            coins.append({
+                **ticker,
+                "suggestion": row.get("suggestion"),
+                "score": row.get("score"),
+                "signal_type": row.get("signal_type"),
+                "db_high_24h": coin_stats["max"],
+                "db_low_24h": coin_stats["min"],
+            })
+        return {
+            "generated_at": time.time(),
+            "candle_ts": candle_ts.isoformat() if candle_ts else None,
+            "coins": coins,
+        }
+
+    @staticmethod
+    def compute(db: Session, tickers: List[Dict[str, Any]], record: bool = False,
+                candle_ts: Optional[datetime] = None) -> Dict[str, Any]:
+        """Tính snapshot từ DB; `record=True` chỉ dùng trong pipeline định kỳ."""
+        prices = {t.get("instId"): float(t.get("last", 0)) for t in tickers}
+        stats = CryptoRepository.get_price_stats_batch(db, list(prices), hours=24)
+        # Ghi tín hiệu sau cùng: lượt tính lỗi trước đó được tính lại mà không ghi trùng
+        table = CryptoRepository.get_investment_suggestions(db, prices, record=record)
+        return SignalSnapshot.build(tickers, table, stats, candle_ts)
+
+    @staticmethod
+    async def acompute(db: AsyncSession, tickers: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Phiên bản async của `compute`, không bao giờ ghi tín hiệu (dùng cho API)."""
+        prices = {t.get("instId"): float(t.get("last", 0)) for t in tickers}
+        table = await CryptoRepository.aget_investment_suggestions(db, prices, record=False)
+        stats = await CryptoRepository.aget_price_stats_batch(db, list(prices), hours=24)
+        return SignalSnapshot.build(tickers, table, stats)
+
+    @staticmethod
+    def _set_once(key: str) -> bool:
+        """SET NX; Redis lỗi thì coi như giành được để không mất tín hiệu."""
+        try:
+            return bool(get_redis().set(key, "1", nx=True, ex=CryptoConfig.SIGNAL_SNAPSHOT_TTL_SECONDS))
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không giành được khóa snapshot tín hiệu {key}: {e}")
+            return True
+
+    @staticmethod
+    def claim(candle_ts: datetime) -> bool:
+        """Giành quyền tính tín hiệu cho nến `candle_ts`; False nếu đã có worker khác tính."""
+        return SignalSnapshot._set_once(f"{SignalSnapshot.CLAIM_KEY_PREFIX}:{candle_ts.isoformat()}")
+
+    @staticmethod
+    def release(candle_ts: datetime) -> None:
+        """Trả quyền tính khi lượt tính lỗi, để lượt sau (stream/crawl/beat) tính lại nến này."""
+        key = f"{SignalSnapshot.CLAIM_KEY_PREFIX}:{candle_ts.isoformat()}"
+        try:
+            get_redis().delete(key)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không trả được khóa snapshot tín hiệu {key}: {e}")
+
+    @staticmethod
+    def schedule_once(candle_ts: datetime) -> bool:
+        """
+        True nếu đây là lần ghi nến đầu tiên của phút `candle_ts`: stream nhận nến từng mã
+        một, chỉ lần đầu hẹn task tính (sau `SIGNAL_SNAPSHOT_DELAY_SECONDS`), các lần sau bỏ qua.
+        """
+        minute = candle_ts.replace(second=0, microsecond=0)
+        return SignalSnapshot._set_once(f"{SignalSnapshot.SCHEDULE_KEY_PREFIX}:{minute.isoformat()}")
+
+    @staticmethod
+    def publish(snapshot: Dict[str, Any]) -> bool:
+        try:
+            get_redis().set(SignalSnapshot.REDIS_KEY, json.dumps(snapshot),
+                            ex=CryptoConfig.SIGNAL_SNAPSHOT_TTL_SECONDS)
+            return True
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không ghi được snapshot tín hiệu: {e}")
+            return False
+
+    @staticmethod
+    async def aread() -> Optional[Dict[str, Any]]:
+        try:
+            raw = await get_async_redis().get(SignalSnapshot.REDIS_KEY)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đọc được snapshot tín hiệu: {e}")
+            return None
+        return json.loads(raw) if raw else None
@@ -0,0 +1,299 @@
+"""Index mã -> tập chat_id đang đăng ký: lưu trong Redis set, mỗi process giữ một bản sao."""
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..constants import CryptoConfig
+from ..models import UserSubscription
+from ..redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionIndex:
+    """
+    Index đăng ký dùng để định tuyến cảnh báo và lập danh sách mã cần crawl.
+
+    Redis giữ `subs:chats:{symbol}` (tập chat_id), `subs:symbols` (các mã có người đăng ký)
+    và `subs:version` tăng sau mỗi thay đổi. Mỗi process giữ bản sao trong bộ nhớ và chỉ
+    đọc lại toàn bộ khi version trong Redis khác bản local (kiểm tra tối đa mỗi
+    `SUBSCRIPTION_INDEX_LOCAL_TTL_SECONDS`), nên tra cứu là O(1) và không chạm DB.
+
+    Index được dựng lại từ bảng `user_subscriptions` khi ứng dụng khởi động, hoặc khi người
+    đọc có `db` thấy Redis chưa có index (`subs:version` không tồn tại) hoặc index bị đánh dấu
+    lỗi thời (`subs:stale`, khi một lượt thêm/xóa không ghi được vào Redis). Thêm/xóa chỉ ghi
+    khi index đã được dựng, để không bao giờ có index thiếu mà trông như đầy đủ.
+    """
+
+    SYMBOLS_KEY = "subs:symbols"
+    CHATS_KEY_PREFIX = "subs:chats"
+    VERSION_KEY = "subs:version"
+    STALE_KEY = "subs:stale"
+
+    # KEYS: chats của mã, symbols, version; ARGV: chat_id, symbol
+    ADD_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 then return false end
+redis.call('SADD', KEYS[1], ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[2])
+return redis.call('INCR', KEYS[3])
+"""
+    REMOVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 then return false end
+redis.call('SREM', KEYS[1], ARGV[1])
+if redis.call('SCARD', KEYS[1]) == 0 then redis.call('SREM', KEYS[2], ARGV[2]) end
+return redis.call('INCR', KEYS[3])
+"""
+
+    _mirror: Dict[str, FrozenSet[str]] = {}
+    _version: Optional[int] = None
+    _checked_at: float = 0.0
+    # Chưa ghi được dấu lỗi thời vào Redis (Redis lỗi): thử lại ở lần truy cập kế tiếp
+    _stale_pending: bool = False
+
+    @classmethod
+    def chats_key(cls, symbol: str) -> str:
+        return f"{cls.CHATS_KEY_PREFIX}:{symbol}"
+
+    @staticmethod
+    def active_stmt():
+        return select(UserSubscription.symbol, UserSubscription.chat_id).where(UserSubscription.is_active == True)
+
+    @staticmethod
+    def _group(rows) -> Dict[str, FrozenSet[str]]:
+        grouped = defaultdict(set)
+        for symbol, chat_id in rows:
+            grouped[symbol].add(str(chat_id))
+        return {symbol: frozenset(chats) for symbol, chats in grouped.items()}
+
+    @classmethod
+    def _set_mirror(cls, mirror: Dict[str, FrozenSet[str]], version: Optional[int]) -> None:
+        cls._mirror = mirror
+        cls._version = version
+        cls._checked_at = time.monotonic()
+
+    @classmethod
+    def _queue_rebuild(cls, pipe, old_symbols: Iterable[str], mirror: Dict[str, FrozenSet[str]]) -> None:
+        """Xóa index cũ và ghi index mới trong cùng một MULTI/EXEC (lệnh cuối là INCR version)."""
+        stale = [cls.chats_key(s) for s in old_symbols]
+        pipe.delete(cls.SYMBOLS_KEY, cls.STALE_KEY, *stale)
+        for symbol, chats in mirror.items():
+            pipe.sadd(cls.chats_key(symbol), *chats)
+        if mirror:
+            pipe.sadd(cls.SYMBOLS_KEY, *mirror)
+        pipe.incr(cls.VERSION_KEY)
+
+    @classmethod
+    def _apply_local(cls, chat_id: str, symbol: str, add: bool, version) -> None:
+        """Cập nhật bản sao local ngay nếu đây là thay đổi kế tiếp; nếu không thì buộc đọc lại."""
+        if version is None:
+            return
+        if cls._version is None or int(version) != cls._version + 1:
+            cls._checked_at = 0.0
+            return
+        mirror = dict(cls._mirror)
+        chats = set(mirror.get(symbol, ()))
+        if add:
+            chats.add(chat_id)
+        else:
+            chats.discard(chat_id)
+        if chats:
+            mirror[symbol] = frozenset(chats)
+        else:
+            mirror.pop(symbol, None)
+        cls._set_mirror(mirror, int(version))
+
+    # ---------- Dựng lại từ DB ----------
+
+    @classmethod
+    def rebuild(cls, db: Session) -> int:
+        """
+        Dựng lại index từ bảng user_subscriptions; trả về số mã có người đăng ký.
+
+        `subs:version` và `subs:stale` được WATCH trước khi đọc bảng: nếu một lượt thêm/xóa
+        ghi vào Redis (hoặc đánh dấu lỗi thời) trong lúc dựng (giữa lúc đọc DB và EXEC) thì
+        MULTI bị hủy và dựng lại từ đầu, để không xóa mất thay đổi đó.
+        """
+        mirror, version = None, None
+        try:
+            client = get_redis()
+            for _ in range(CryptoConfig.SUBSCRIPTION_INDEX_REBUILD_ATTEMPTS):
+                with client.pipeline(transaction=True) as pipe:
+                    try:
+                        pipe.watch(cls.VERSION_KEY, cls.STALE_KEY)
+                        mirror = cls._group(db.execute(cls.active_stmt()).all())
+                        old_symbols = pipe.smembers(cls.SYMBOLS_KEY)
+                        pipe.multi()
+                        cls._queue_rebuild(pipe, old_symbols, mirror)
+                        version = pipe.execute()[-1]
+                        break
+                    except WatchError:
+                        logger.info("🔁 Index đăng ký thay đổi trong lúc dựng lại, thử lại.")
+            else:
+                logger.warning("Không dựng lại được index đăng ký: thay đổi liên tục trong lúc dựng.")
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không ghi được index đăng ký vào Redis: {e}")
+        if mirror is None:
+            mirror = cls._group(db.execute(cls.active_stmt()).all())
+        cls._set_mirror(mirror, version)
+        return len(mirror)
+
+    @classmethod
+    async def arebuild(cls, db: AsyncSession) -> int:
+        """Phiên bản async của `rebuild`."""
+        mirror, version = None, None
+        try:
+            client = get_async_redis()
+            for _ in range(CryptoConfig.SUBSCRIPTION_INDEX_REBUILD_ATTEMPTS):
+                async with client.pipeline(transaction=True) as pipe:
+                    try:
+                        await pipe.watch(cls.VERSION_KEY, cls.STALE_KEY)
+                        mirror = cls._group((await db.execute(cls.active_stmt())).all())
+                        old_symbols = await pipe.smembers(cls.SYMBOLS_KEY)
+                        pipe.multi()
+                        cls._queue_rebuild(pipe, old_symbols, mirror)
+                        version = (await pipe.execute())[-1]
+                        break
+                    except WatchError:
+                        logger.info("🔁 Index đăng ký thay đổi trong lúc dựng lại, thử lại.")
+            else:
+                logger.warning("Không dựng lại được index đăng ký: thay đổi liên tục trong lúc dựng.")
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không ghi được index đăng ký vào Redis: {e}")
+        if mirror is None:
+            mirror = cls._group((await db.execute(cls.active_stmt())).all())
+        cls._set_mirror(mirror, version)
+        return len(mirror)
+
+    # ---------- Thêm / xóa (gọi sau khi DB đã commit) ----------
+
+    @classmethod
+    def add(cls, chat_id: str, symbol: str) -> None:
+        cls._update(cls.ADD_SCRIPT, str(chat_id), symbol, add=True)
+
+    @classmethod
+    def remove(cls, chat_id: str, symbol: str) -> None:
+        cls._update(cls.REMOVE_SCRIPT, str(chat_id), symbol, add=False)
+
+    @classmethod
+    def _update(cls, script: str, chat_id: str, symbol: str, add: bool) -> None:
+        try:
+            version = get_redis().eval(
+                script, 3, cls.chats_key(symbol), cls.SYMBOLS_KEY, cls.VERSION_KEY, chat_id, symbol
+            )
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không cập nhật được index đăng ký cho {symbol}, đánh dấu cần dựng lại: {e}")
+            cls._mark_stale()
+            return
+        cls._apply_local(chat_id, symbol, add, version)
+
+    @classmethod
+    async def aadd(cls, chat_id: str, symbol: str) -> None:
+        await cls._aupdate(cls.ADD_SCRIPT, str(chat_id), symbol, add=True)
+
+    @classmethod
+    async def aremove(cls, chat_id: str, symbol: str) -> None:
+        await cls._aupdate(cls.REMOVE_SCRIPT, str(chat_id), symbol, add=False)
+
+    @classmethod
+    async def _aupdate(cls, script: str, chat_id: str, symbol: str, add: bool) -> None:
+        try:
+            version = await get_async_redis().eval(
+                script, 3, cls.chats_key(symbol), cls.SYMBOLS_KEY, cls.VERSION_KEY, chat_id, symbol
+            )
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không cập nhật được index đăng ký cho {symbol}, đánh dấu cần dựng lại: {e}")
+            await cls._amark_stale()
+            return
+        cls._apply_local(chat_id, symbol, add, version)
+
+    @classmethod
+    def _mark_stale(cls) -> None:
+        """
+        Redis và bản local lệch với bảng sau một lượt ghi lỗi: bỏ bản local và đặt `subs:stale`
+        để lần đọc kế tiếp có `db` (ở bất kỳ process nào) dựng lại index từ bảng.
+        """
+        cls._set_mirror({}, None)
+        cls._stale_pending = True
+        try:
+            get_redis().set(cls.STALE_KEY, 1)
+            cls._stale_pending = False
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đánh dấu được index đăng ký lỗi thời: {e}")
+
+    @classmethod
+    async def _amark_stale(cls) -> None:
+        """Phiên bản async của `_mark_stale`."""
+        cls._set_mirror({}, None)
+        cls._stale_pending = True
+        try:
+            await get_async_redis().set(cls.STALE_KEY, 1)
+            cls._stale_pending = False
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đánh dấu được index đăng ký lỗi thời: {e}")
+
+    # ---------- Đọc ----------
+
+    @classmethod
+    def _is_fresh(cls) -> bool:
+        return cls._version is not None and \
+            time.monotonic() - cls._checked_at < CryptoConfig.SUBSCRIPTION_INDEX_LOCAL_TTL_SECONDS
+
+    @classmethod
+    def _load_from_redis(cls, client, version) -> None:
+        symbols = client.smembers(cls.SYMBOLS_KEY)
+        pipe = client.pipeline(transaction=False)
+        for symbol in symbols:
+            pipe.smembers(cls.chats_key(symbol))
+        cls._set_mirror({s: frozenset(c) for s, c in zip(symbols, pipe.execute()) if c}, int(version))
+
+    @classmethod
+    def refresh(cls, db: Optional[Session] = None) -> bool:
+        """
+        Đồng bộ bản sao local với Redis nếu đã cũ.
+
+        Returns:
+            bool: True nếu bản sao local dùng được.
+        """
+        if cls._is_fresh():
+            return True
+        try:
+            client = get_redis()
+            if cls._stale_pending:
+                client.set(cls.STALE_KEY, 1)
+                cls._stale_pending = False
+            version, stale = client.mget([cls.VERSION_KEY, cls.STALE_KEY])
+            if version is None or stale is not None:
+                if db is None:
+                    return cls._version is not None
+                cls.rebuild(db)
+            elif cls._version is None or int(version) != cls._version:
+                cls._load_from_redis(client, version)
+            else:
+                cls._checked_at = time.monotonic()
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không đọc được index đăng ký từ Redis, dùng bản local: {e}")
+        return cls._version is not None
+
+    @classmethod
+    def symbols(cls, db: Optional[Session] = None) -> List[str]:
+        """Các mã đang có người đăng ký; nếu index không dùng được thì đọc từ DB (khi có `db`)."""
+        if not cls.refresh(db) and db is not None:
+            return sorted({symbol for symbol, _ in db.execute(cls.active_stmt())})
+        return sorted(cls._mirror)
+
+    @classmethod
+    def subscribers(cls, symbols: Iterable[str], db: Optional[Session] = None) -> Dict[str, FrozenSet[str]]:
+        """chat_id đang đăng ký của từng mã (mã không có người đăng ký -> tập rỗng)."""
+        symbols = list(symbols)
+        if not cls.refresh(db) and db is not None:
+            rows = db.execute(cls.active_stmt().where(UserSubscription.symbol.in_(symbols))).all()
+            mirror = cls._group(rows)
+        else:
+            mirror = cls._mirror
+        return {symbol: mirror.get(symbol, frozenset()) for symbol in symbols}
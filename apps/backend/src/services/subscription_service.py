@@ -1,65 +1,127 @@
 """Service quản lý đăng ký thông báo của người dùng."""
 import logging
 from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from ..models import UserSubscription
+from .subscription_index import SubscriptionIndex
 
 logger = logging.getLogger(__name__)
 
 class SubscriptionService:
     @staticmethod
-    def subscribe(db: Session, chat_id: str, symbol: str) -> UserSubscription:
-        """Đăng ký nhận thông báo cho một mã coin."""
-        # Chuẩn hóa symbol
+    def normalize_symbol(symbol: str) -> str:
+        """Chuẩn hóa symbol: "btc" -> "BTC-USDT"."""
         if not symbol.endswith("-USDT") and "-" not in symbol:
             symbol = f"{symbol.upper()}-USDT"
-        
-        # Kiểm tra xem đã đăng ký chưa
-        existing = db.query(UserSubscription).filter(
+        return symbol
+
+    @staticmethod
+    def subscription_stmt(chat_id: str, symbol: str):
+        return select(UserSubscription).where(
             UserSubscription.chat_id == chat_id,
             UserSubscription.symbol == symbol
-        ).first()
-        
+        )
+
+    @staticmethod
+    def user_subscriptions_stmt(chat_id: str):
+        return select(UserSubscription).where(
+            UserSubscription.chat_id == chat_id,
+            UserSubscription.is_active == True
+        )
+
+    @staticmethod
+    def subscribed_symbols_stmt():
+        return select(UserSubscription.symbol).where(
+            UserSubscription.is_active == True
+        ).distinct()
+
+    @staticmethod
+    def subscribe(db: Session, chat_id: str, symbol: str) -> UserSubscription:
+        """Đăng ký nhận thông báo cho một mã coin."""
+        symbol = SubscriptionService.normalize_symbol(symbol)
+
+        # Kiểm tra xem đã đăng ký chưa
+        existing = db.execute(SubscriptionService.subscription_stmt(chat_id, symbol)).scalars().first()
+
         if existing:
             existing.is_active = True
             db.commit()
+            SubscriptionIndex.add(chat_id, symbol)
             return existing
-            
+
         new_sub = UserSubscription(chat_id=chat_id, symbol=symbol)
         db.add(new_sub)
         db.commit()
         db.refresh(new_sub)
+        SubscriptionIndex.add(chat_id, symbol)
+        return new_sub
+
+    @staticmethod
+    async def asubscribe(db: AsyncSession, chat_id: str, symbol: str) -> UserSubscription:
+        """Phiên bản async của `subscribe`."""
+        symbol = SubscriptionService.normalize_symbol(symbol)
+
+        existing = (await db.execute(SubscriptionService.subscription_stmt(chat_id, symbol))).scalars().first()
+
+        if existing:
+            existing.is_active = True
+            await db.commit()
+            await SubscriptionIndex.aadd(chat_id, symbol)
+            return existing
+
+        new_sub = UserSubscription(chat_id=chat_id, symbol=symbol)
+        db.add(new_sub)
+        await db.commit()
+        await db.refresh(new_sub)
+        await SubscriptionIndex.aadd(chat_id, symbol)
         return new_sub
 
     @staticmethod
     def unsubscribe(db: Session, chat_id: str, symbol: str) -> bool:
         """Hủy đăng ký nhận thông báo."""
-        if not symbol.endswith("-USDT") and "-" not in symbol:
-            symbol = f"{symbol.upper()}-USDT"
-            
-        sub = db.query(UserSubscription).filter(
-            UserSubscription.chat_id == chat_id,
-            UserSubscription.symbol == symbol
-        ).first()
-        
+        symbol = SubscriptionService.normalize_symbol(symbol)
+
+        sub = db.execute(SubscriptionService.subscription_stmt(chat_id, symbol)).scalars().first()
+
         if sub:
             db.delete(sub)
             db.commit()
+            SubscriptionIndex.remove(chat_id, symbol)
+            return True
+        return False
+
+    @staticmethod
+    async def aunsubscribe(db: AsyncSession, chat_id: str, symbol: str) -> bool:
+        """Phiên bản async của `unsubscribe`."""
+        symbol = SubscriptionService.normalize_symbol(symbol)
+
+        sub = (await db.execute(SubscriptionService.subscription_stmt(chat_id, symbol))).scalars().first()
+
+        if sub:
+            await db.delete(sub)
+            await db.commit()
+            await SubscriptionIndex.aremove(chat_id, symbol)
             return True
         return False
 
     @staticmethod
     def get_user_subscriptions(db: Session, chat_id: str) -> List[UserSubscription]:
         """Lấy danh sách các mã đã đăng ký của người dùng."""
-        return db.query(UserSubscription).filter(
-            UserSubscription.chat_id == chat_id,
-            UserSubscription.is_active == True
-        ).all()
+        return db.execute(SubscriptionService.user_subscriptions_stmt(chat_id)).scalars().all()
+
+    @staticmethod
+    async def aget_user_subscriptions(db: AsyncSession, chat_id: str) -> List[UserSubscription]:
+        """Phiên bản async của `get_user_subscriptions`."""
+        return (await db.execute(SubscriptionService.user_subscriptions_stmt(chat_id))).scalars().all()
 
     @staticmethod
     def get_all_subscribed_symbols(db: Session) -> List[str]:
         """Lấy danh sách tất cả các mã đang được ít nhất 1 người đăng ký."""
-        results = db.query(UserSubscription.symbol).filter(
-            UserSubscription.is_active == True
-        ).distinct().all()
-        return [r[0] for r in results]
+        return list(db.execute(SubscriptionService.subscribed_symbols_stmt()).scalars())
+
+    @staticmethod
+    async def aget_all_subscribed_symbols(db: AsyncSession) -> List[str]:
+        """Phiên bản async của `get_all_subscribed_symbols`."""
+        return list((await db.execute(SubscriptionService.subscribed_symbols_stmt())).scalars())
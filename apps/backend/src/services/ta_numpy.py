@@ -0,0 +1,122 @@
+"""
+Chỉ báo kỹ thuật thuần NumPy (không cần pandas/pandas-ta).
+
+Mọi hàm nhận mảng float64 và tính theo trục cuối (thời gian), nên dùng được cho
+một chuỗi giá (T,) hoặc nhiều mã cùng lúc (S, T). Chuỗi ngắn hơn được đệm NaN ở
+đầu; vị trí chưa đủ dữ liệu trả về NaN. Công thức bám theo pandas-ta (không TA-Lib).
+"""
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def as_series(values) -> np.ndarray:
+    """Chuyển về mảng float64 liên tục trong bộ nhớ."""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def align_right(series: list, length: int) -> np.ndarray:
+    """
+    Ghép các chuỗi (cũ -> mới) thành ma trận (S, length): căn phải theo nến mới nhất,
+    giữ tối đa `length` điểm cuối, phần thiếu ở đầu đệm NaN.
+    """
+    matrix = np.full((len(series), length), np.nan)
+    for i, values in enumerate(series):
+        values = values[-length:] if length else []
+        if len(values):
+            matrix[i, length - len(values):] = values
+    return matrix
+
+
+def valid_count(x: np.ndarray) -> np.ndarray:
+    """Số điểm dữ liệu không phải NaN của mỗi chuỗi."""
+    return np.count_nonzero(~np.isnan(x), axis=-1)
+
+
+def _mask_short(result: np.ndarray, x: np.ndarray, min_length: int) -> np.ndarray:
+    """Giống pandas-ta: chuỗi có ít hơn `min_length` điểm thì không tính (toàn NaN)."""
+    short = valid_count(x) < min_length
+    if np.any(short):
+        result[short] = np.nan
+    return result
+
+
+def sma(x: np.ndarray, length: int) -> np.ndarray:
+    """Trung bình trượt đơn giản."""
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= length:
+        out[..., length - 1:] = sliding_window_view(x, length, axis=-1).mean(axis=-1)
+    return out
+
+
+def rolling_std(x: np.ndarray, length: int, ddof: int = 1) -> np.ndarray:
+    """Độ lệch chuẩn trượt."""
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= length:
+        out[..., length - 1:] = sliding_window_view(x, length, axis=-1).std(axis=-1, ddof=ddof)
+    return out
+
+
+def _recursive_average(x: np.ndarray, alpha: float, seed: np.ndarray) -> np.ndarray:
+    """
+    y[t] = y[t-1] + alpha * (x[t] - y[t-1]); chuỗi bắt đầu tại điểm đầu tiên `seed` khác NaN.
+
+    Đệ quy theo thời gian nên phải lặp trên trục cuối, nhưng mỗi bước tính vector
+    trên toàn bộ các chuỗi.
+    """
+    if x.ndim == 1:
+        # Một chuỗi: lặp trên float Python nhanh hơn nhiều so với thao tác mảng 0 chiều
+        out, state = [], math.nan
+        for value, first in zip(x.tolist(), seed.tolist()):
+            if math.isnan(state):
+                state = first
+            elif not math.isnan(value):
+                state += alpha * (value - state)
+            out.append(state)
+        return np.array(out)
+
+    out = np.empty(x.shape)
+    state = np.full(x.shape[:-1], np.nan)
+    for t in range(x.shape[-1]):
+        step = state + alpha * (x[..., t] - state)
+        state = np.where(np.isnan(state), seed[..., t], np.where(np.isnan(x[..., t]), state, step))
+        out[..., t] = state
+    return out
+
+
+def rma(x: np.ndarray, length: int) -> np.ndarray:
+    """Trung bình Wilder (ewm alpha=1/length, adjust=False), bắt đầu từ giá trị hợp lệ đầu tiên."""
+    return _recursive_average(x, 1.0 / length, x)
+
+
+def ema(x: np.ndarray, length: int) -> np.ndarray:
+    """EMA (span=length) khởi tạo bằng SMA của `length` giá trị hợp lệ đầu tiên."""
+    return _recursive_average(x, 2.0 / (length + 1), sma(x, length))
+
+
+def rsi(close: np.ndarray, length: int = 14) -> np.ndarray:
+    change = np.diff(close, axis=-1, prepend=np.nan)
+    gain = np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0))
+    loss = np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0))
+    avg_gain, avg_loss = rma(gain, length), rma(loss, length)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = 100.0 * avg_gain / (avg_gain + avg_loss)
+    return _mask_short(out, close, length + 1)
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9):
+    """Trả về (macd, signal, histogram)."""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    hist = line - signal_line
+    min_length = slow + signal - 1
+    return (_mask_short(line, close, min_length), _mask_short(signal_line, close, min_length),
+            _mask_short(hist, close, min_length))
+
+
+def bbands(close: np.ndarray, length: int = 20, std: float = 2.0):
+    """Trả về (upper, middle, lower)."""
+    middle = sma(close, length)
+    deviation = std * rolling_std(close, length)
+    return middle + deviation, middle, middle - deviation
@@ -1,35 +1,141 @@
 """Dịch vụ tính toán các chỉ số kỹ thuật (Technical Analysis)."""
-import pandas as pd
-import pandas_ta as ta
-from typing import List, Dict, Any
+import math
+from typing import List, Dict, Any, Optional
 import logging
 
+from ..config import settings
+from . import ta_numpy
+
 logger = logging.getLogger(__name__)
 
+TA_BACKENDS = ("numpy", "pandas")
+MIN_DATA_POINTS = 20
+
+
 class TechnicalAnalysisService:
-    """Xử lý các tính toán kỹ thuật RSI, MACD, Bollinger Bands dùng pandas-ta."""
+    """
+    Xử lý các tính toán kỹ thuật RSI, MACD, Bollinger Bands.
+
+    Backend mặc định là NumPy (`ta_numpy`); pandas/pandas-ta chỉ được import khi
+    chọn `TA_BACKEND=pandas`, để process API/worker không phải nạp pandas.
+    """
 
     @staticmethod
-    def calculate_indicators(history_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def calculate_indicators(history_data: List[Dict[str, Any]], backend: Optional[str] = None) -> Dict[str, Any]:
         """
         Tính toán các chỉ số kỹ thuật từ dữ liệu lịch sử.
         
         Args:
             history_data: Danh sách các bản ghi từ database (symbol, price, timestamp).
+            backend: "numpy" hoặc "pandas" (mặc định theo `settings.TA_BACKEND`).
             
         Returns:
             Dict chứa các giá trị chỉ số mới nhất (RSI, MACD, BBands).
         """
-        if not history_data or len(history_data) < 20:
+        if not history_data or len(history_data) < MIN_DATA_POINTS:
             logger.info(f"Dữ liệu không đủ để tính TA: {len(history_data) if history_data else 0} bản ghi.")
+            return TechnicalAnalysisService._insufficient()
+
+        backend = backend or settings.TA_BACKEND
+        if backend not in TA_BACKENDS:
+            raise ValueError(f"TA backend không hợp lệ: {backend}")
+        logger.debug(f"Đang tính toán TA ({backend}) cho {len(history_data)} điểm dữ liệu.")
+
+        if backend == "pandas":
+            return TechnicalAnalysisService._calculate_with_pandas(history_data)
+        return TechnicalAnalysisService._calculate_with_numpy(history_data)
+
+    @staticmethod
+    def _closes(history_data: List[Dict[str, Any]]):
+        """Giá đóng cửa theo thứ tự thời gian, dạng mảng float64 liên tục."""
+        rows = sorted(history_data, key=lambda r: r["timestamp"])
+        return ta_numpy.as_series([r["close"] if r.get("close") is not None else r["price"] for r in rows])
+
+    @staticmethod
+    def _insufficient() -> Dict[str, Any]:
+        return {
+            "rsi": None,
+            "macd": None,
+            "bbands": None,
+            "status": "Dữ liệu không đủ (Cần ít nhất 20 điểm dữ liệu)"
+        }
+
+    @staticmethod
+    def _numpy_latest(close) -> Dict[str, Any]:
+        """Giá trị chỉ báo tại nến cuối cùng của mỗi chuỗi (mảng (T,) hoặc (S, T))."""
+        macd, macd_signal, macd_hist = ta_numpy.macd(close, fast=12, slow=26, signal=9)
+        bb_upper, bb_middle, bb_lower = ta_numpy.bbands(close, length=20, std=2)
+        series = {
+            "rsi": ta_numpy.rsi(close, length=14),
+            "macd": macd, "macd_signal": macd_signal, "macd_hist": macd_hist,
+            "bb_upper": bb_upper, "bb_middle": bb_middle, "bb_lower": bb_lower,
+        }
+        return {name: values[..., -1] for name, values in series.items()}
+
+    @staticmethod
+    def _result(latest: Dict[str, Any], index=()) -> Dict[str, Any]:
+        def value(name):
+            v = float(latest[name][index])
+            return None if math.isnan(v) else v
+
+        return {
+            "rsi": value("rsi"),
+            "macd": {
+                "value": value("macd"),
+                "signal": value("macd_signal"),
+                "hist": value("macd_hist"),
+            },
+            "bbands": {
+                "upper": value("bb_upper"),
+                "middle": value("bb_middle"),
+                "lower": value("bb_lower"),
+            },
+            "status": "success"
+        }
+
+    @staticmethod
+    def _calculate_with_numpy(history_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            close = TechnicalAnalysisService._closes(history_data)
+            return TechnicalAnalysisService._result(TechnicalAnalysisService._numpy_latest(close))
+        except Exception as e:
+            logger.error(f"Lỗi khi tính toán chỉ số TA: {e}")
             return {
                 "rsi": None,
                 "macd": None,
                 "bbands": None,
-                "status": "Dữ liệu không đủ (Cần ít nhất 20 điểm dữ liệu)"
+                "status": f"Lỗi tính toán: {str(e)}"
             }
 
-        logger.info(f"Đang tính toán TA cho {len(history_data)} điểm dữ liệu.")
+    @staticmethod
+    def calculate_indicators_batch(closes) -> List[Dict[str, Any]]:
+        """
+        Tính chỉ báo cho nhiều mã trong một lượt vector (luôn dùng backend NumPy).
+
+        Args:
+            closes: ma trận giá đóng cửa (S, T) đệm NaN ở đầu (xem `ta_numpy.align_right`).
+
+        Returns:
+            Danh sách S kết quả, cùng định dạng với `calculate_indicators`.
+        """
+        counts = ta_numpy.valid_count(closes)
+        latest = TechnicalAnalysisService._numpy_latest(closes)
+        return [
+            TechnicalAnalysisService._result(latest, i) if counts[i] >= MIN_DATA_POINTS
+            else TechnicalAnalysisService._insufficient()
+            for i in range(len(counts))
+        ]
+
+    @staticmethod
+    def _calculate_with_pandas(history_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Import trễ: pandas/pandas-ta là phụ thuộc tùy chọn (requirements-pandas.txt)
+        try:
+            import pandas as pd
+            import pandas_ta  # noqa: F401  (đăng ký accessor DataFrame.ta)
+        except ImportError as e:
+            raise RuntimeError(
+                "TA_BACKEND=pandas cần pandas và pandas-ta: pip install -r requirements-pandas.txt"
+            ) from e
 
         try:
             # 1. Chuyển đổi sang DataFrame
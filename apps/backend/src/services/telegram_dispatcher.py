@@ -0,0 +1,156 @@
+"""Gửi tin Telegram bất đồng bộ qua một connection pool, tôn trọng hạn mức của Bot API."""
+import asyncio
+import logging
+import time
+import weakref
+from typing import Dict, Iterable, NamedTuple, Optional, Union
+
+import httpx
+
+from ..config import settings
+from ..constants import CryptoConfig
+from .rate_limiter import TelegramRateLimiter
+
+logger = logging.getLogger(__name__)
+
+ChatId = Union[str, int]
+
+
+class Delivery(NamedTuple):
+    """Kết quả một lần gọi sendMessage."""
+    ok: bool
+    retryable: bool  # Lỗi tạm thời, nên gửi lại sau
+    error: Optional[str]
+    rate_limited: bool = False  # Bị 429 (đã tạm dừng process theo retry_after)
+
+
+class TelegramDispatcher:
+    """
+    Dispatcher gửi tin dùng chung một httpx.AsyncClient cho mỗi event loop.
+
+    Mỗi tin chờ token của chat và của toàn bot (TelegramRateLimiter) rồi mới gửi; số request
+    đồng thời bị chặn bởi semaphore. Khi Telegram trả 429, mọi lượt gửi trong process dừng
+    đúng `retry_after` giây rồi thử lại. Sender worker của outbox dùng `send_once` (outbox tự
+    hẹn lần gửi sau); `send`/`send_many` tự gửi lại cho các lời gọi trực tiếp.
+    """
+
+    BASE_URL = "https://api.telegram.org"
+    TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+    LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0)
+
+    # Cho phép test thay transport (httpx.MockTransport)
+    transport: Optional[httpx.AsyncBaseTransport] = None
+
+    _clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+    _semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+    # Thời điểm (monotonic) được gửi tiếp sau khi bị 429
+    _paused_until = 0.0
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """Lấy AsyncClient dùng chung cho event loop hiện tại."""
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=cls.BASE_URL, timeout=cls.TIMEOUT, limits=cls.LIMITS, transport=cls.transport,
+            )
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = cls._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = cls._semaphores[loop] = asyncio.Semaphore(CryptoConfig.TELEGRAM_SEND_CONCURRENCY)
+        return semaphore
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Đóng client của event loop hiện tại (gọi khi app shutdown)."""
+        client = cls._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    @classmethod
+    async def _wait_if_paused(cls) -> None:
+        while True:
+            wait = cls._paused_until - time.monotonic()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    @classmethod
+    async def send_once(cls, chat_id: ChatId, text: str) -> Delivery:
+        """
+        Gửi một tin (HTML) tới chat, không tự gửi lại (outbox tự hẹn lần gửi sau).
+
+        429, lỗi mạng và 5xx là lỗi tạm thời (`retryable`); 4xx khác (bot bị chặn, chat
+        không tồn tại...) gửi lại cũng vô ích. Khi bị 429, mọi lượt gửi trong process tạm
+        dừng `retry_after` giây.
+        """
+        token = settings.TELEGRAM_BOT_TOKEN
+        if not token:
+            logger.error("Telegram token chưa được cấu hình.")
+            return Delivery(False, True, "token not configured")
+
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        # Chờ token trước khi giữ slot: chat đang bị giới hạn không chặn các chat khác
+        await cls._wait_if_paused()
+        await TelegramRateLimiter.acquire(chat_id)
+        async with cls._get_semaphore():
+            await cls._wait_if_paused()
+            try:
+                response = await cls.get_client().post(f"/bot{token}/sendMessage", json=payload)
+            except httpx.HTTPError as e:
+                logger.warning(f"Lỗi mạng khi gửi Telegram tới {str(chat_id)[:4]}****: {e}")
+                return Delivery(False, True, f"{type(e).__name__}: {e}")
+
+        if response.status_code == 429:
+            retry_after = cls._retry_after(response)
+            logger.warning(f"⏳ Telegram giới hạn tần suất, tạm dừng {retry_after}s")
+            cls._paused_until = max(cls._paused_until, time.monotonic() + retry_after)
+            return Delivery(False, True, "429 Too Many Requests", rate_limited=True)
+        if response.is_error:
+            error = f"{response.status_code} {response.text}"
+            if response.status_code < 500:
+                logger.error(f"Telegram từ chối tin tới {str(chat_id)[:4]}****: {error}")
+            return Delivery(False, response.status_code >= 500, error)
+        return Delivery(True, False, None)
+
+    @classmethod
+    async def send(cls, chat_id: ChatId, text: str) -> bool:
+        """
+        Gửi một tin, gửi lại lỗi tạm thời tối đa `TELEGRAM_MAX_RETRIES` lần (429 chờ đúng
+        `retry_after`, lỗi mạng/5xx chờ theo cấp số nhân).
+
+        Returns:
+            bool: True nếu Telegram nhận tin.
+        """
+        for attempt in range(CryptoConfig.TELEGRAM_MAX_RETRIES + 1):
+            delivery = await cls.send_once(chat_id, text)
+            if delivery.ok or not delivery.retryable:
+                return delivery.ok
+            if not delivery.rate_limited:
+                await asyncio.sleep(2 ** attempt)
+
+        logger.error(f"❌ Hết lượt thử gửi Telegram tới {str(chat_id)[:4]}****")
+        return False
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float:
+        """Số giây Telegram yêu cầu chờ (parameters.retry_after, rồi header Retry-After)."""
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            return float(response.headers.get("Retry-After", 1))
+
+    @classmethod
+    async def send_many(cls, chat_ids: Iterable[ChatId], text: str) -> Dict[str, bool]:
+        """Gửi cùng một tin tới nhiều chat (bỏ trùng); trả về kết quả theo chat_id."""
+        targets = list(dict.fromkeys(str(c) for c in chat_ids))
+        results = await asyncio.gather(*(cls.send(c, text) for c in targets))
+        sent = sum(results)
+        logger.info(f"📨 Đã gửi {sent}/{len(targets)} tin Telegram")
+        return dict(zip(targets, results))
@@ -0,0 +1,192 @@
+"""Snapshot ticker SPOT của OKX dùng chung cho API, Celery và bot (cache trong process + Redis)."""
+import asyncio
+import copy
+import json
+import logging
+import time
+import uuid
+import weakref
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from ..constants import CryptoConfig
+from ..redis_client import get_async_redis
+from .okx_client import OKXClient
+
+logger = logging.getLogger(__name__)
+
+
+class TickerSnapshot:
+    """
+    Toàn bộ ticker SPOT tại một thời điểm, kèm thông tin độ cũ.
+
+    `stale` = True khi cache không làm mới được và phải trả bản dự phòng cũ hơn `max_age` của caller.
+    """
+
+    def __init__(self, tickers: List[Dict[str, Any]], fetched_at: float, source: str = "okx"):
+        self.tickers = {t["instId"]: t for t in tickers if "instId" in t}
+        self.fetched_at = fetched_at
+        self.source = source
+        self.stale = False
+
+    @property
+    def age(self) -> float:
+        """Số giây kể từ lúc snapshot được lấy từ OKX."""
+        return max(0.0, time.time() - self.fetched_at)
+
+    def is_fresh(self, max_age: float) -> bool:
+        return self.age <= max_age
+
+    def select(self, ids: List[str]) -> List[Dict[str, Any]]:
+        """Lấy ticker của các mã cần thiết (giữ thứ tự `ids`, bỏ qua mã không có)."""
+        return [self.tickers[i] for i in ids if i in self.tickers]
+
+    def as_stale(self) -> "TickerSnapshot":
+        """Bản sao (dùng chung dữ liệu ticker) được đánh dấu `stale`."""
+        snapshot = copy.copy(self)
+        snapshot.stale = True
+        return snapshot
+
+    def to_json(self) -> str:
+        return json.dumps({"fetched_at": self.fetched_at, "tickers": list(self.tickers.values())})
+
+    @classmethod
+    def from_json(cls, raw: str, source: str = "redis") -> "TickerSnapshot":
+        payload = json.loads(raw)
+        return cls(payload["tickers"], payload["fetched_at"], source=source)
+
+
+class TickerSnapshotCache:
+    """
+    Cache hai tầng cho danh sách ticker SPOT:
+
+    1. Snapshot trong process (đọc không tốn I/O).
+    2. Snapshot trong Redis, dùng chung giữa API, worker Celery và các process khác.
+
+    Refresh theo kiểu single-flight: trong process chỉ một coroutine được gọi OKX
+    (asyncio.Lock), giữa các process dùng khóa Redis `SET NX`; các caller còn lại chờ
+    snapshot mới xuất hiện trong Redis thay vì tự tải lại toàn bộ ~700 ticker.
+    Caller tự quyết định độ cũ chấp nhận được qua `max_age`.
+    """
+
+    REDIS_KEY = "okx:tickers:SPOT"
+    LOCK_KEY = "okx:tickers:SPOT:lock"
+    LOCK_TIMEOUT_SECONDS = 10.0
+    WAIT_POLL_SECONDS = 0.05
+
+    _local: Optional[TickerSnapshot] = None
+    _locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def _lock(cls) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if loop not in cls._locks:
+            cls._locks[loop] = asyncio.Lock()
+        return cls._locks[loop]
+
+    @classmethod
+    async def aget_snapshot(cls, max_age: Optional[float] = None) -> Optional[TickerSnapshot]:
+        """
+        Lấy snapshot có tuổi không quá `max_age` giây (mặc định TTL cấu hình).
+
+        Nếu OKX lỗi thì trả về snapshot gần nhất còn có, cũ hơn `max_age` và được đánh dấu
+        `stale` (caller xem `snapshot.fetched_at` / `snapshot.age`), hoặc None nếu chưa từng có.
+        """
+        max_age = CryptoConfig.TICKER_SNAPSHOT_TTL_SECONDS if max_age is None else max_age
+        if cls._local is not None and cls._local.is_fresh(max_age):
+            return cls._local
+
+        async with cls._lock():
+            # Có thể coroutine khác vừa refresh xong trong lúc chờ khóa
+            if cls._local is not None and cls._local.is_fresh(max_age):
+                return cls._local
+
+            cached = await cls._read_redis()
+            if cached is not None and cached.is_fresh(max_age):
+                cls._local = cached
+                return cached
+
+            snapshot = await cls._refresh_single_flight(max_age)
+            if snapshot is not None:
+                cls._local = snapshot
+                return snapshot
+
+            # Không làm mới được: dùng bản mới nhất còn có (local hoặc Redis) và đánh dấu là cũ
+            if cached is not None and (cls._local is None or cached.fetched_at > cls._local.fetched_at):
+                cls._local = cached
+            if cls._local is None:
+                return None
+            logger.warning(f"⚠️ Không làm mới được ticker, dùng snapshot cũ {cls._local.age:.0f}s.")
+            return cls._local.as_stale()
+
+    @classmethod
+    def get_snapshot(cls, max_age: Optional[float] = None) -> Optional[TickerSnapshot]:
+        """Phiên bản đồng bộ của `aget_snapshot` (dùng trong Celery)."""
+        return OKXClient.run_sync(cls.aget_snapshot(max_age))
+
+    @classmethod
+    async def _refresh_single_flight(cls, max_age: float) -> Optional[TickerSnapshot]:
+        token = uuid.uuid4().hex
+        try:
+            acquired = await get_async_redis().set(
+                cls.LOCK_KEY, token, nx=True, px=int(cls.LOCK_TIMEOUT_SECONDS * 1000)
+            )
+        except (RedisError, OSError) as e:
+            logger.warning(f"Redis không khả dụng, tải ticker trực tiếp từ OKX: {e}")
+            return await cls._fetch()
+
+        if not acquired:
+            # Process khác đang tải, chờ snapshot mới của nó
+            deadline = time.monotonic() + cls.LOCK_TIMEOUT_SECONDS
+            while time.monotonic() < deadline:
+                await asyncio.sleep(cls.WAIT_POLL_SECONDS)
+                snapshot = await cls._read_redis()
+                if snapshot is not None and snapshot.is_fresh(max_age):
+                    return snapshot
+            logger.warning("Hết thời gian chờ snapshot ticker từ process khác, tự tải từ OKX.")
+
+        try:
+            snapshot = await cls._fetch()
+            if snapshot is not None:
+                await cls._write_redis(snapshot)
+            return snapshot
+        finally:
+            if acquired:
+                await cls._release_lock(token)
+
+    @classmethod
+    async def _fetch(cls) -> Optional[TickerSnapshot]:
+        try:
+            tickers = await OKXClient.get_tickers("SPOT")
+        except Exception as e:
+            logger.error(f"Lỗi khi crawl dữ liệu từ OKX: {e}")
+            return None
+        return TickerSnapshot(tickers, fetched_at=time.time(), source="okx")
+
+    @classmethod
+    async def _read_redis(cls) -> Optional[TickerSnapshot]:
+        try:
+            raw = await get_async_redis().get(cls.REDIS_KEY)
+        except (RedisError, OSError):
+            return None
+        return TickerSnapshot.from_json(raw) if raw else None
+
+    @classmethod
+    async def _write_redis(cls, snapshot: TickerSnapshot) -> None:
+        try:
+            # Giữ lâu hơn TTL để caller chấp nhận dữ liệu cũ vẫn có snapshot dự phòng
+            await get_async_redis().set(
+                cls.REDIS_KEY, snapshot.to_json(), ex=int(CryptoConfig.TICKER_SNAPSHOT_RETENTION_SECONDS)
+            )
+        except (RedisError, OSError) as e:
+            logger.warning(f"Không ghi được snapshot ticker vào Redis: {e}")
+
+    @classmethod
+    async def _release_lock(cls, token: str) -> None:
+        try:
+            redis = get_async_redis()
+            if await redis.get(cls.LOCK_KEY) == token:
+                await redis.delete(cls.LOCK_KEY)
+        except (RedisError, OSError):
+            pass
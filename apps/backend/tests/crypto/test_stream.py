@@ -0,0 +1,140 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from src.crypto.fake_okx_ws import FakeOKXServer
+from src.crypto.stream import OKXStreamIngestor
+
+
+async def wait_until(condition, timeout=5.0):
+    """Chờ điều kiện đúng hoặc fail sau timeout."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "Hết thời gian chờ"
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_stream_persists_confirmed_candles_and_backfills_after_reconnect():
+    """Chỉ lưu nến đã confirm, resubscribe khi đổi mã và lấy bù nến khi reconnect."""
+    saved, fetch_calls = [], []
+    minute = datetime.utcnow().replace(second=0, microsecond=0)
+    last_saved = minute - timedelta(minutes=5)
+
+    async def fetcher(symbols, bar, limit, after=None):
+        fetch_calls.append((tuple(symbols), limit))
+        gap = {"timestamp": minute - timedelta(minutes=1), "open": 1, "high": 1, "low": 1,
+               "close": 1, "volume": 1, "confirm": True}
+        return {s: [gap] for s in symbols}
+
+    async with FakeOKXServer() as server:
+        ingestor = OKXStreamIngestor(
+            public_url=server.url,
+            business_url=server.url,
+            symbols_loader=lambda: ["BTC-USDT"],
+            candle_sink=saved.extend,
+            last_timestamps_loader=lambda symbols: {"BTC-USDT": last_saved},
+            candles_fetcher=fetcher,
+        )
+        runner = asyncio.create_task(ingestor.run())
+        try:
+            await wait_until(lambda: server.is_subscribed("candle1m", "BTC-USDT")
+                             and server.is_subscribed("tickers", "BTC-USDT"))
+            assert len(saved) == 1  # nến lấy bù ngay khi kết nối lần đầu
+            saved.clear()
+
+            ts_ms = int((minute + timedelta(minutes=1)).replace(tzinfo=timezone.utc).timestamp() * 1000)
+            await server.push_candle("BTC-USDT", ts_ms, 101.0, confirm=False)
+            await server.push_candle("BTC-USDT", ts_ms, 102.0, confirm=True)
+            await server.push_ticker("BTC-USDT", 102.5)
+            await wait_until(lambda: saved and "BTC-USDT" in ingestor.tickers)
+            assert [c["close"] for c in saved] == [102.0]
+
+            await ingestor.refresh_subscriptions({"BTC-USDT", "ETH-USDT"})
+            await wait_until(lambda: server.is_subscribed("candle1m", "ETH-USDT"))
+
+            await server.drop_connections()
+            await wait_until(lambda: ingestor.connect_count["candle1m"] == 2)
+            await wait_until(lambda: len(fetch_calls) == 2)
+            assert set(fetch_calls[-1][0]) == {"BTC-USDT"}
+            assert server.is_subscribed("candle1m", "ETH-USDT")
+        finally:
+            ingestor.stop()
+            await runner
+
+
+@pytest.mark.asyncio
+async def test_stream_reconnects_after_sink_error():
+    """Lỗi khi lưu nến (DB, cảnh báo giá...) không làm chết task kênh: kết nối lại và lưu tiếp."""
+    saved, failures = [], []
+    minute = datetime.utcnow().replace(second=0, microsecond=0)
+
+    def flaky_sink(candles):
+        if not failures:
+            failures.append(candles)
+            raise RuntimeError("database is down")
+        saved.extend(candles)
+
+    async def fetcher(symbols, bar, limit, after=None):
+        return {s: [] for s in symbols}
+
+    async with FakeOKXServer() as server:
+        ingestor = OKXStreamIngestor(
+            public_url=server.url,
+            business_url=server.url,
+            symbols_loader=lambda: ["BTC-USDT"],
+            candle_sink=flaky_sink,
+            last_timestamps_loader=lambda symbols: {},
+            candles_fetcher=fetcher,
+        )
+        runner = asyncio.create_task(ingestor.run())
+        try:
+            await wait_until(lambda: server.is_subscribed("candle1m", "BTC-USDT"))
+            ts_ms = int(minute.replace(tzinfo=timezone.utc).timestamp() * 1000)
+            await server.push_candle("BTC-USDT", ts_ms, 100.0, confirm=True)
+            await wait_until(lambda: ingestor.connect_count["candle1m"] == 2)
+
+            await wait_until(lambda: server.is_subscribed("candle1m", "BTC-USDT"))
+            await server.push_candle("BTC-USDT", ts_ms + 60_000, 101.0, confirm=True)
+            await wait_until(lambda: saved)
+            assert [c["close"] for c in saved] == [101.0]
+        finally:
+            ingestor.stop()
+            await runner
+
+
+@pytest.mark.asyncio
+async def test_backfill_pages_backwards_when_gap_exceeds_one_okx_page():
+    """Khoảng hở dài hơn 100 nến: lấy lùi từng trang bằng `after` cho đến nến cuối đã lưu."""
+    minute = datetime.utcnow().replace(second=0, microsecond=0)
+    last_saved = minute - timedelta(minutes=250)
+    history = [
+        {"timestamp": minute - timedelta(minutes=i), "open": 1, "high": 1, "low": 1,
+         "close": 1, "volume": 1, "confirm": True}
+        for i in range(1, 400)
+    ]
+    saved, fetch_calls = [], []
+
+    async def fetcher(symbols, bar, limit, after=None):
+        # Như OKX: tối đa 100 nến mới nhất trước `after`, trả về từ cũ đến mới
+        fetch_calls.append((limit, after))
+        older = [c for c in history if after is None or c["timestamp"] < after][:min(limit, 100)]
+        return {s: older[::-1] for s in symbols}
+
+    ingestor = OKXStreamIngestor(
+        symbols_loader=lambda: ["BTC-USDT"],
+        candle_sink=saved.extend,
+        last_timestamps_loader=lambda symbols: {"BTC-USDT": last_saved},
+        candles_fetcher=fetcher,
+    )
+    await ingestor._backfill_gaps(["BTC-USDT"])
+
+    assert all(limit <= 100 for limit, _ in fetch_calls)
+    assert [after for _, after in fetch_calls] == [
+        None, minute - timedelta(minutes=100), minute - timedelta(minutes=200)
+    ]
+    timestamps = [c["timestamp"] for c in saved]
+    assert timestamps == sorted(timestamps)
+    assert timestamps[0] == last_saved + timedelta(minutes=1)
+    assert len(timestamps) == 249
+    assert ingestor.last_confirmed["BTC-USDT"] == minute - timedelta(minutes=1)
@@ -0,0 +1,182 @@
+"""Fixture dùng chung cho test service: Redis giả trong bộ nhớ và SQLite in-memory theo bảng."""
+import copy
+import fnmatch
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from redis.exceptions import WatchError
+
+
+class FakeRedis:
+    """
+    Redis trong bộ nhớ, đủ các lệnh service dùng (chuỗi, hash, set, sorted set, pipeline).
+
+    Lua script không chạy được: test đăng ký hàm Python tương đương qua `scripts`
+    (`scripts[script](redis, keys, args)`).
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.scripts = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    # ---------- Chuỗi ----------
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    def exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def keys(self, pattern="*"):
+        return [k for k in self.data if fnmatch.fnmatchcase(k, pattern)]
+
+    # ---------- Hash ----------
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        values = dict(mapping or {})
+        if field is not None:
+            values[field] = value
+        self.data.setdefault(key, {}).update({f: str(v) for f, v in values.items()})
+        return len(values)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hmget(self, key, *fields):
+        return [self.data.get(key, {}).get(f) for f in fields]
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hincrby(self, key, field, amount=1):
+        value = int(self.data.get(key, {}).get(field, 0)) + amount
+        self.hset(key, field, value)
+        return value
+
+    # ---------- Set ----------
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    def srem(self, key, *members):
+        self.data.get(key, set()).difference_update(members)
+        if key in self.data and not self.data[key]:
+            del self.data[key]
+
+    # ---------- Sorted set ----------
+
+    def zadd(self, key, mapping, nx=False):
+        zset = self.data.setdefault(key, {})
+        for member, score in mapping.items():
+            if not (nx and member in zset):
+                zset[member] = score
+
+    def zrangebyscore(self, key, low, high):
+        return sorted(m for m, score in self.data.get(key, {}).items() if score <= float(high))
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.data.get(key, {}).pop(member, None)
+
+    # ---------- Script ----------
+
+    def eval(self, script, numkeys, *args):
+        return self.scripts[script](self, list(args[:numkeys]), list(args[numkeys:]))
+
+
+class FakePipeline:
+    """
+    Ghi lại các lệnh rồi chạy tuần tự khi `execute` (MULTI/EXEC trong một luồng).
+
+    Sau `watch` lệnh chạy ngay cho tới `multi`; `execute` ném WatchError nếu key đã WATCH bị đổi.
+    """
+
+    def __init__(self, redis):
+        self.redis, self.calls, self.watched = redis, [], None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def __getattr__(self, name):
+        if self.watched is not None and not self.queued:
+            return getattr(self.redis, name)
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def watch(self, *keys):
+        self.watched = {key: copy.deepcopy(self.redis.data.get(key)) for key in keys}
+        self.queued = False
+
+    def multi(self):
+        self.queued = True
+
+    def reset(self):
+        self.calls, self.watched = [], None
+
+    def execute(self):
+        calls, watched = self.calls, self.watched
+        self.reset()
+        if watched and any(self.redis.data.get(k) != v for k, v in watched.items()):
+            raise WatchError("Watched variable changed.")
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def sqlite_db():
+    """
+    Factory `sqlite_db(*models)` -> Session trên SQLite in-memory chỉ với các bảng cần dùng.
+    `session.selects` ghi lại các câu SELECT đã chạy (kiểm tra đường đọc không chạm DB).
+    """
+    sessions = []
+
+    def make(*models):
+        engine = create_engine("sqlite://")
+        for model in models:
+            model.__table__.create(engine)
+        session = sessionmaker(bind=engine)()
+        session.selects = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def record(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT"):
+                session.selects.append(statement)
+
+        sessions.append(session)
+        return session
+
+    yield make
+    for session in sessions:
+        session.close()
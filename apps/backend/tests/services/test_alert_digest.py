@@ -0,0 +1,67 @@
+import pytest
+
+from src.constants import CryptoConfig
+from src.models import NotificationOutbox
+from src.services.alert_digest import AlertDigest
+
+
+@pytest.fixture
+def digest_env(sqlite_db, fake_redis, monkeypatch):
+    """Outbox trên SQLite in-memory; BTC có 2 người đăng ký, ETH/SOL có 1, admin là chat "0"."""
+    subscribers = {"BTC-USDT": {"1", "2"}, "ETH-USDT": {"1"}, "SOL-USDT": {"2"}}
+    monkeypatch.setattr(
+        "src.services.alert_digest.SubscriptionIndex.subscribers",
+        lambda symbols, db=None: {s: frozenset(subscribers.get(s, ())) for s in symbols},
+    )
+    monkeypatch.setattr("src.services.alert_digest.settings.TELEGRAM_CHAT_ID", "0")
+    monkeypatch.setattr("src.services.alert_digest.get_redis", lambda: fake_redis)
+    return sqlite_db(NotificationOutbox)
+
+
+def alert(symbol, price, change_pct):
+    return {"symbol": symbol, "price": price, "change_pct": change_pct}
+
+
+def outbox(db):
+    return {r.chat_id: r.text for r in db.query(NotificationOutbox)}
+
+
+def test_cycle_alerts_become_one_digest_per_chat(digest_env):
+    """Nhiều mã vượt ngưỡng trong cùng chu kỳ: mỗi chat nhận đúng một tin chứa các mã của mình."""
+    alerts = [alert("BTC-USDT", 100.0, 1.5), alert("ETH-USDT", 10.0, -2.5), alert("SOL-USDT", 1.0, 1.1)]
+
+    assert AlertDigest.publish(digest_env, alerts) == 3
+    messages = outbox(digest_env)
+    assert set(messages) == {"0", "1", "2"}
+    assert "3 mã" in messages["0"]
+    assert "BTC" in messages["2"] and "SOL" in messages["2"] and "ETH" not in messages["2"]
+
+
+def test_digest_lists_biggest_move_first(digest_env):
+    """Trong một digest, mã biến động mạnh nhất (theo trị tuyệt đối) đứng đầu."""
+    AlertDigest.publish(digest_env, [alert("BTC-USDT", 100.0, 1.5), alert("ETH-USDT", 10.0, -2.5)])
+    message = outbox(digest_env)["1"]
+    assert message.index("ETH") < message.index("BTC")
+
+
+def test_window_holds_alerts_until_due(digest_env, monkeypatch):
+    """Có cửa sổ gom: cảnh báo được đệm trong Redis, chưa hết cửa sổ thì chưa ghi outbox."""
+    monkeypatch.setattr(CryptoConfig, "ALERT_DIGEST_WINDOW_SECONDS", 60)
+    assert AlertDigest.publish(digest_env, [alert("BTC-USDT", 100.0, 1.5)]) == 0
+    assert AlertDigest.flush_due(digest_env, now=0) == 0
+    assert outbox(digest_env) == {}
+
+    assert AlertDigest.flush_due(digest_env, now=float("inf")) == 3
+    assert AlertDigest.flush_due(digest_env, now=float("inf")) == 0
+
+
+def test_window_keeps_latest_alert_per_symbol(digest_env, monkeypatch):
+    """Cùng một mã báo nhiều lần trong cửa sổ: digest chỉ giữ bản mới nhất."""
+    monkeypatch.setattr(CryptoConfig, "ALERT_DIGEST_WINDOW_SECONDS", 60)
+    AlertDigest.publish(digest_env, [alert("BTC-USDT", 100.0, 1.5)])
+    AlertDigest.publish(digest_env, [alert("BTC-USDT", 103.0, 3.0), alert("ETH-USDT", 10.0, -2.5)])
+
+    AlertDigest.flush_due(digest_env, now=float("inf"))
+    messages = outbox(digest_env)
+    assert "$103.00" in messages["2"] and "$100.00" not in messages["2"]
+    assert messages["1"].count("BTC") == 1 and "ETH" in messages["1"]
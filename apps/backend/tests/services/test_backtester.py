@@ -0,0 +1,78 @@
+import csv
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.services import ta_numpy
+from src.services.backtester import Backtester, CsvCandleSource, replay_scores
+from src.services.param_sweep import DEFAULT_SPACE, ParamSweep, random_search
+from src.services.signal_outcomes import datetimes
+from src.services.signal_scoring import ScoringParams, score_table
+from src.services.ta_service import TechnicalAnalysisService
+
+START = datetime(2026, 3, 1)
+
+
+def make_series(seed, minutes=400, days=40):
+    rng = np.random.default_rng(seed)
+    ts_1m = [START + timedelta(minutes=i) for i in range(minutes)]
+    ts_1d = [START - timedelta(days=days - 1 - i) for i in range(days)]
+    close_1m = 100 * np.cumprod(1 + rng.normal(0, 0.004, minutes))
+    close_1d = 100 * np.cumprod(1 + rng.normal(0, 0.03, days))
+    return ts_1m, close_1m, ts_1d, close_1d
+
+
+def test_replay_matches_live_scoring():
+    """Điểm backtest tại mỗi nến bằng điểm pipeline live tính trên cùng cửa sổ dữ liệu."""
+    ts_1m, close_1m, ts_1d, close_1d = make_series(3)
+    index, scores = replay_scores(datetimes(ts_1m), close_1m, datetimes(ts_1d), close_1d)
+
+    for k in range(0, len(index), 37):
+        t = index[k]
+        price = close_1m[t]
+        current_day = sum(d <= ts_1m[t] for d in ts_1d) - 1
+        daily = list(close_1d[max(0, current_day - 29):current_day]) + [price]
+        ta_1m = TechnicalAnalysisService.calculate_indicators_batch(ta_numpy.align_right([close_1m[t - 99:t + 1]], 100))
+        ta_1d = TechnicalAnalysisService.calculate_indicators_batch(ta_numpy.align_right([daily], 30))
+        assert score_table(["X"], ta_1m, ta_1d, [price])["X"]["score"] == scores[k]
+
+
+def write_csv_archive(root, symbols):
+    for tf in ("1m", "1D"):
+        (root / tf).mkdir()
+    for seed, symbol in enumerate(symbols):
+        ts_1m, close_1m, ts_1d, close_1d = make_series(seed, minutes=1500)
+        for tf, ts, close in (("1m", ts_1m, close_1m), ("1D", ts_1d, close_1d)):
+            with open(root / tf / f"{symbol}.csv", "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["timestamp", "close"])
+                writer.writerows((t.isoformat(), c) for t, c in zip(ts, close))
+    return CsvCandleSource(str(root))
+
+
+def test_parallel_run_matches_serial(tmp_path):
+    """Chạy song song trên process pool cho cùng kết quả như chạy tuần tự."""
+    source = write_csv_archive(tmp_path, ["BTC-USDT", "ETH-USDT"])
+    args = (["BTC-USDT", "ETH-USDT"], START, START + timedelta(days=2))
+    serial = Backtester.run(*args, source=source, workers=1, horizon_minutes=15)
+    parallel = Backtester.run(*args, source=source, workers=2, horizon_minutes=15)
+
+    assert serial == parallel
+    assert serial["total"]["signals"] == sum(m["signals"] for m in serial["symbols"].values()) > 0
+
+
+def test_param_sweep_shares_features_across_workers(tmp_path):
+    """Quét tham số qua shared memory khớp chạy tuần tự và khớp backtest với cùng bộ tham số."""
+    source = write_csv_archive(tmp_path, ["BTC-USDT", "ETH-USDT"])
+    args = (["BTC-USDT", "ETH-USDT"], START, START + timedelta(days=2))
+    candidates = random_search(DEFAULT_SPACE, 12, seed=1) + [ScoringParams()]
+
+    serial = ParamSweep.run(*args, candidates, source=source, workers=1, horizon_minutes=15)
+    parallel = ParamSweep.run(*args, candidates, source=source, workers=3, horizon_minutes=15)
+
+    assert serial == parallel
+    assert [row["rank"] for row in serial] == list(range(1, 14))
+    production = next(row for row in serial if row["params"] == ScoringParams().to_dict())
+    backtest = Backtester.run(*args, source=source, workers=1, horizon_minutes=15)["total"]
+    assert {k: production[k] for k in backtest} == pytest.approx(backtest)
@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.models import CryptoHistory, CryptoDaily, SignalOutcome, SignalStats, TradingSignal
+from src.services.crypto_repository import CryptoRepository
+
+
+@pytest.fixture
+def crypto_db(sqlite_db):
+    """SQLite in-memory chỉ với các bảng crypto, đếm số lần commit."""
+    session = sqlite_db(CryptoHistory, CryptoDaily, TradingSignal, SignalOutcome, SignalStats)
+    session.commit_count = 0
+
+    @event.listens_for(session, "after_commit")
+    def count_commit(s):
+        s.commit_count += 1
+
+    return session
+
+
+def make_candles(symbols, count, start=datetime(2026, 1, 1)):
+    return [
+        {"symbol": s, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5 + i, "volume": 10.0,
+         "timestamp": start + timedelta(minutes=i)}
+        for s in symbols for i in range(count)
+    ]
+
+
+def test_bulk_save_candles_writes_many_symbols_with_one_commit(crypto_db):
+    """Lô nến của nhiều mã được ghi trong một lần commit."""
+    written = CryptoRepository.bulk_save_candles(crypto_db, make_candles(["BTC-USDT", "ETH-USDT"], 50))
+
+    assert written == 100
+    assert crypto_db.commit_count == 1
+    assert crypto_db.query(CryptoHistory).count() == 100
+    assert CryptoRepository.get_last_price(crypto_db, "ETH-USDT") == 50.5
+
+
+def test_upsert_updates_in_progress_candle_until_confirmed(crypto_db):
+    """Ghi lại cùng (symbol, timestamp) không tạo bản trùng; nến đã confirm không bị ghi đè."""
+    ts = datetime(2026, 1, 1, 0, 1)
+    candle = {"symbol": "BTC-USDT", "open": 1.0, "high": 1.0, "low": 1.0, "volume": 1.0, "timestamp": ts}
+
+    CryptoRepository.bulk_save_candles(crypto_db, [{**candle, "close": 100.0, "confirm": False}])
+    CryptoRepository.bulk_save_candles(crypto_db, [{**candle, "close": 101.0, "confirm": True}])
+    CryptoRepository.bulk_save_candles(crypto_db, [{**candle, "close": 999.0, "confirm": False}])
+
+    rows = crypto_db.query(CryptoHistory).all()
+    assert len(rows) == 1
+    assert rows[0].close == 101.0 and rows[0].is_confirmed
+
+
+@pytest.mark.asyncio
+async def test_async_read_paths_match_sync(tmp_path):
+    """Các hàm đọc async (AsyncSession) trả về cùng kết quả với phiên bản sync."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.database import to_async_url
+    from src.models import UserSubscription
+    from src.services.subscription_service import SubscriptionService
+
+    url = f"sqlite:///{tmp_path / 'crypto.db'}"
+    engine = create_engine(url)
+    for model in (CryptoHistory, CryptoDaily, TradingSignal, SignalStats, UserSubscription):
+        model.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    start = datetime.utcnow() - timedelta(hours=1)
+    CryptoRepository.bulk_save_candles(db, make_candles(["BTC-USDT"], 30, start=start))
+    SubscriptionService.subscribe(db, "42", "btc")
+
+    async_engine = create_async_engine(to_async_url(url))
+    async with async_sessionmaker(async_engine)() as adb:
+        assert await CryptoRepository.aget_last_price(adb, "BTC-USDT") == CryptoRepository.get_last_price(db, "BTC-USDT")
+        assert await CryptoRepository.aget_recent_history(adb, "BTC-USDT", limit=10) == \
+            CryptoRepository.get_recent_history(db, "BTC-USDT", limit=10)
+        assert await CryptoRepository.aget_price_stats(adb, "BTC-USDT") == CryptoRepository.get_price_stats(db, "BTC-USDT")
+        assert await CryptoRepository.aget_accuracy_report(adb) == CryptoRepository.get_accuracy_report(db)
+        assert await SubscriptionService.aget_all_subscribed_symbols(adb) == ["BTC-USDT"]
+        assert [s.symbol for s in await SubscriptionService.aget_user_subscriptions(adb, "42")] == ["BTC-USDT"]
+    await async_engine.dispose()
+    db.close()
+
+
+def test_investment_suggestions_batch_loads_all_symbols_at_once(crypto_db):
+    """Gợi ý cho nhiều mã dùng một truy vấn cho mỗi khung thời gian và ghi tín hiệu trong một commit."""
+    from sqlalchemy import event as sa_event
+
+    candles = make_candles(["BTC-USDT", "ETH-USDT"], 120)
+    candles += make_candles(["NEW-USDT"], 5)
+    CryptoRepository.bulk_save_candles(crypto_db, candles)
+    crypto_db.commit_count = 0
+
+    statements = []
+    sa_event.listen(crypto_db.get_bind(), "before_cursor_execute",
+                    lambda conn, cursor, sql, *args: statements.append(sql))
+    # Giá tăng đều -> RSI 1m quá mua (-2); BTC vượt dải BB trên (-2), ETH thủng dải BB dưới (+2)
+    table = CryptoRepository.get_investment_suggestions(
+        crypto_db, {"BTC-USDT": 500.0, "ETH-USDT": 10.0, "NEW-USDT": 3.0}, record=True
+    )
+
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 2
+    assert table["NEW-USDT"]["signal_type"] is None and "ĐANG CẬP NHẬT" in table["NEW-USDT"]["suggestion"]
+    assert table["BTC-USDT"]["signal_type"] == "SELL" and table["BTC-USDT"]["score"] == -4
+    assert table["ETH-USDT"]["signal_type"] is None and table["ETH-USDT"]["score"] == 0
+    assert crypto_db.commit_count == 1
+    assert crypto_db.query(TradingSignal).count() == 1
+
+
+def test_validate_signals_uses_candle_close_at_each_horizon(crypto_db):
+    """Mỗi mốc đối soát bằng giá đóng cửa nến tại timestamp + horizon; chạy lại không đổi kết quả."""
+    from sqlalchemy.dialects import postgresql
+
+    base = datetime(2026, 1, 1)
+    candles = [{"symbol": "BTC-USDT", "open": 1.0, "high": 1.0, "low": 1.0, "close": 100.0 + i,
+                "volume": 1.0, "timestamp": base + timedelta(minutes=i)} for i in range(300)]
+    candles += [{"symbol": "ETH-USDT", "open": 1.0, "high": 1.0, "low": 1.0, "close": 20.0,
+                 "volume": 1.0, "timestamp": base + timedelta(minutes=i)} for i in range(10)]
+    CryptoRepository.bulk_save_candles(crypto_db, candles)
+    signal = lambda symbol, kind, entry, minute: TradingSignal(
+        symbol=symbol, signal_type=kind, score=2, entry_price=entry, status="PENDING",
+        timestamp=base + timedelta(minutes=minute))
+    crypto_db.add_all([
+        signal("BTC-USDT", "BUY", 100.5, 0),
+        signal("BTC-USDT", "SELL", 150.0, 30),
+        signal("ETH-USDT", "BUY", 10.0, 0),
+        signal("BTC-USDT", "BUY", 250.0, 200),
+    ])
+    crypto_db.commit()
+
+    now = base + timedelta(hours=6)
+    assert CryptoRepository.validate_signals(crypto_db, batch_size=3, now=now) == 3
+    assert CryptoRepository.validate_signals(crypto_db, batch_size=3, now=now) == 0
+    outcomes = {(o.signal_id, o.horizon_minutes): (o.result, o.exit_price)
+                for o in crypto_db.query(SignalOutcome).all()}
+    assert [outcomes[(2, h)] for h in (5, 15, 60, 240)] == [
+        ("WIN", 135.0), ("WIN", 145.0), ("LOSS", 190.0), ("LOSS", 370.0)]
+    assert outcomes[(3, 5)] == ("WIN", 20.0) and outcomes[(3, 15)] == ("NO_DATA", None)
+    assert (4, 240) not in outcomes and len(outcomes) == 15
+
+    rows = crypto_db.query(TradingSignal).order_by(TradingSignal.id).all()
+    assert [(r.status, r.result, r.exit_price) for r in rows] == [
+        ("COMPLETED", "WIN", 160.0), ("COMPLETED", "LOSS", 190.0),
+        ("COMPLETED", "NO_DATA", None), ("PENDING", None, None),
+    ]
+    assert rows[0].closed_at == base + timedelta(hours=4)
+
+    # Hết thời gian chờ mà mốc 4h vẫn không có nến -> NO_DATA, tín hiệu đóng theo mốc 1h
+    assert CryptoRepository.validate_signals(crypto_db, now=base + timedelta(hours=8)) == 1
+    crypto_db.refresh(rows[3])
+    assert (rows[3].status, rows[3].result, rows[3].exit_price) == ("COMPLETED", "WIN", 360.0)
+
+    # Thống kê được cộng dồn khi đóng tín hiệu (NO_DATA không tính)
+    stats = {(r.symbol, r.signal_type): (r.wins, r.losses, r.draws, round(r.return_sum, 4))
+             for r in crypto_db.query(SignalStats).all()}
+    assert stats == {("BTC-USDT", "BUY"): (2, 0, 0, round(59.5 / 100.5 + 110 / 250, 4)),
+                     ("BTC-USDT", "SELL"): (0, 1, 0, round(-40 / 150, 4))}
+    report = CryptoRepository.get_accuracy_report(crypto_db)
+    assert "Tổng số kèo: 3 (2 Thắng)" in report and "BTC: 66.7% (3 kèo" in report
+
+    sql = str(CryptoRepository.close_signals_stmt(
+        "postgresql", [{"id": 1, "exit_price": 1.0, "result": "WIN", "closed_at": base}]
+    ).compile(dialect=postgresql.dialect()))
+    assert "FROM (VALUES" in sql
+
+
+def test_signal_outcomes_line_up_with_okx_candles_on_non_utc_host(crypto_db):
+    """Host ở UTC+7: nến OKX và tín hiệu cùng theo giờ UTC nên mốc 5 phút khớp đúng nến."""
+    import os
+    import time
+    from src.services.crypto_scraper import CryptoScraperService
+
+    old_tz = os.environ.get("TZ")
+    os.environ["TZ"] = "Asia/Ho_Chi_Minh"
+    time.tzset()
+    try:
+        start_ms = int(time.time() // 60 * 60 * 1000)
+        raw = [[str(start_ms + i * 60_000), "1", "1", "1", str(100.0 + i), "1", "0", "0", "1"] for i in range(30)]
+        candles = CryptoScraperService.parse_candles(raw[::-1])  # OKX trả nến mới nhất trước
+        CryptoRepository.bulk_save_candles(crypto_db, [{"symbol": "BTC-USDT", **c} for c in candles])
+        CryptoRepository.record_signals(crypto_db, [
+            {"symbol": "BTC-USDT", "signal_type": "BUY", "score": 3, "price": 100.0},
+        ])
+
+        CryptoRepository.validate_signals(crypto_db, now=datetime.utcnow() + timedelta(hours=6))
+        outcome = crypto_db.query(SignalOutcome).filter(SignalOutcome.horizon_minutes == 5).one()
+        signal_minute = (crypto_db.query(TradingSignal).one().timestamp - datetime(1970, 1, 1)).total_seconds() // 60
+        assert (outcome.result, outcome.exit_price) == ("WIN", 100.0 + signal_minute - start_ms // 60_000 + 5)
+    finally:
+        if old_tz is None:
+            os.environ.pop("TZ")
+        else:
+            os.environ["TZ"] = old_tz
+        time.tzset()
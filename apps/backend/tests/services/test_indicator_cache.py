@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models import CryptoHistory, CryptoDaily, TradingSignal
+from src.services.crypto_repository import CryptoRepository
+from src.services.indicator_cache import IndicatorCache
+
+PRICES = {"BTC-USDT": 4.0, "ETH-USDT": 4.0}
+
+
+@pytest.fixture
+def cache_db(sqlite_db, fake_redis, monkeypatch):
+    """Nến 1m/1D của BTC và ETH đã commit, cache trống."""
+    monkeypatch.setattr("src.services.indicator_cache.get_redis", lambda: fake_redis)
+    monkeypatch.setattr("src.services.indicator_engine.get_redis", lambda: fake_redis)
+    IndicatorCache.clear_local()
+    db = sqlite_db(CryptoHistory, CryptoDaily, TradingSignal)
+    for symbol in PRICES:
+        CryptoRepository.bulk_save_candles(db, make_candles(symbol, 60))
+        CryptoRepository.bulk_save_candles(db, make_candles(symbol, 30), timeframe="1D")
+    db.selects.clear()
+    yield db
+    IndicatorCache.clear_local()
+
+
+def make_candles(symbol, count, start=datetime(2026, 1, 1)):
+    return [{"symbol": symbol, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5 + i % 7, "volume": 10.0,
+             "timestamp": start + timedelta(minutes=i)} for i in range(count)]
+
+
+def test_misses_are_loaded_with_one_query_per_timeframe(cache_db):
+    """Lần đầu: mọi mã miss, đọc DB bằng một truy vấn cho mỗi khung thời gian."""
+    CryptoRepository.get_investment_suggestions(cache_db, PRICES, record=False)
+    assert len(cache_db.selects) == 2 and IndicatorCache.get_stats()["misses"] == 4
+
+
+def test_repeated_reads_hit_local_then_redis(cache_db):
+    """Đọc lại không chạm DB: trúng LRU trong process, rồi trúng Redis khi LRU trống (process khác)."""
+    first = CryptoRepository.get_investment_suggestions(cache_db, PRICES, record=False)
+    cache_db.selects.clear()
+
+    assert CryptoRepository.get_investment_suggestions(cache_db, PRICES, record=False) == first
+    IndicatorCache._local.clear()
+    assert CryptoRepository.get_investment_suggestions(cache_db, PRICES, record=False) == first
+    stats = IndicatorCache.get_stats()
+    assert cache_db.selects == [] and (stats["local_hits"], stats["redis_hits"]) == (4, 4)
+
+
+def test_rolled_back_candle_keeps_cache(cache_db):
+    """Nến chưa commit (rollback) không làm cache lỗi thời."""
+    CryptoRepository.get_investment_suggestions(cache_db, PRICES, record=False)
+    CryptoRepository.bulk_save_candles(cache_db, make_candles("BTC-USDT", 61)[-1:], commit=False)
+    cache_db.rollback()
+    cache_db.selects.clear()
+
+    CryptoRepository.get_investment_suggestions(cache_db, PRICES, record=False)
+    assert cache_db.selects == []
+
+
+def test_committed_candle_recomputes_only_that_symbol(cache_db):
+    """Nến mới commit: chỉ mã đó bị tính lại (một truy vấn), mã khác vẫn trúng cache."""
+    CryptoRepository.get_investment_suggestions(cache_db, PRICES, record=False)
+    CryptoRepository.bulk_save_candles(cache_db, make_candles("BTC-USDT", 61)[-1:])
+    cache_db.selects.clear()
+
+    CryptoRepository.get_investment_suggestions(cache_db, PRICES, record=False)
+    assert len(cache_db.selects) == 1 and IndicatorCache.get_stats()["misses"] == 5
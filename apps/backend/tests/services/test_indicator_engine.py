@@ -0,0 +1,112 @@
+import json
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models import CryptoHistory
+from src.services.crypto_repository import CryptoRepository
+from src.services.indicator_engine import IncrementalIndicators, IndicatorEngine
+from src.services.ta_service import TechnicalAnalysisService
+
+
+def make_history(count, seed=7):
+    rng = random.Random(seed)
+    price, start = 30000.0, datetime(2026, 1, 1)
+    history = []
+    for i in range(count):
+        price *= 1 + rng.gauss(0, 0.003)
+        history.append({"close": price, "timestamp": start + timedelta(minutes=i)})
+    return history
+
+
+@pytest.fixture
+def engine_db(sqlite_db, fake_redis, monkeypatch):
+    """Bảng nến 1m trên SQLite, trạng thái engine lưu trong Redis giả."""
+    monkeypatch.setattr("src.services.indicator_engine.get_redis", lambda: fake_redis)
+    return sqlite_db(CryptoHistory)
+
+
+def save_candles(db, history):
+    CryptoRepository.bulk_save_candles(db, [
+        {"symbol": "BTC-USDT", "open": c["close"], "high": c["close"], "low": c["close"], "close": c["close"],
+         "volume": 1.0, "timestamp": c["timestamp"]} for c in history
+    ])
+
+
+def assert_close(actual, expected):
+    actual, expected = flatten(actual), flatten(expected)
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value, rel=1e-9), key
+
+
+def flatten(result):
+    values = {"rsi": result["rsi"]}
+    for group in ("macd", "bbands"):
+        for name, value in (result[group] or {}).items():
+            values[f"{group}.{name}"] = value
+    return values
+
+
+def test_matches_numpy_backend_on_every_window():
+    """Kết quả engine tăng dần khớp backend NumPy (đã đối chiếu pandas-ta) với mọi độ dài cửa sổ."""
+    history = make_history(120)
+    for end in range(15, len(history) + 1):
+        expected = TechnicalAnalysisService.calculate_indicators(history[:end], backend="numpy")
+        _, actual, _ = IndicatorEngine.advance(None, history[:end])
+        assert actual["status"] == expected["status"]
+        if expected["status"] != "success":
+            continue
+        expected, actual = flatten(expected), flatten(actual)
+        assert expected.keys() == actual.keys()
+        for key, value in expected.items():
+            if value is None:
+                assert actual[key] is None, (end, key)
+            else:
+                assert math.isclose(actual[key], value, rel_tol=1e-9, abs_tol=1e-9), (end, key)
+
+
+def test_incremental_updates_survive_persistence():
+    """Trạng thái lưu/khôi phục qua JSON rồi cập nhật từng nến cho kết quả như dựng lại từ đầu."""
+    history = make_history(150)
+    state = None
+    for end in range(1, len(history) + 1):
+        state, result, _ = IndicatorEngine.advance(state, history[max(0, end - 100):end])
+        # Nến mới nhất chỉ được tính thử, chưa ghi vào trạng thái
+        assert state.last_timestamp == (history[end - 2]["timestamp"] if end > 1 else None)
+        state = IncrementalIndicators.from_dict(json.loads(json.dumps(state.to_dict())))
+
+    _, fresh, _ = IndicatorEngine.advance(None, history)
+    assert result == fresh
+
+
+def test_cache_miss_continues_saved_state_from_new_candles(engine_db):
+    """Có trạng thái đã lưu: chỉ đọc nến từ mốc trạng thái (một truy vấn) và kết quả như tính lại từ đầu."""
+    history = make_history(61)
+    save_candles(engine_db, history[:60])
+    CryptoRepository.compute_indicators(engine_db, ["BTC-USDT"])
+
+    save_candles(engine_db, history[60:])
+    engine_db.selects.clear()
+    [result] = CryptoRepository.compute_indicators(engine_db, ["BTC-USDT"])
+
+    assert len(engine_db.selects) == 1 and "timestamp >=" in engine_db.selects[0]
+    assert_close(result, IndicatorEngine.advance(None, history)[1])
+    [state] = IndicatorEngine.load_states(["BTC-USDT"], "1m").values()
+    assert state.last_timestamp == history[59]["timestamp"]
+
+
+def test_state_without_anchor_candle_is_rebuilt_from_window(engine_db):
+    """Nến mốc của trạng thái không còn trong DB: dựng lại từ cửa sổ `limit` nến."""
+    history = make_history(60)
+    save_candles(engine_db, history)
+    CryptoRepository.compute_indicators(engine_db, ["BTC-USDT"])
+    engine_db.query(CryptoHistory).filter(CryptoHistory.timestamp == history[58]["timestamp"]).delete()
+    engine_db.commit()
+
+    engine_db.selects.clear()
+    [result] = CryptoRepository.compute_indicators(engine_db, ["BTC-USDT"])
+    assert len(engine_db.selects) == 2
+    assert_close(result, IndicatorEngine.advance(None, history[:58] + history[59:])[1])
@@ -0,0 +1,82 @@
+import pytest
+from redis.exceptions import RedisError
+from src.services import instrument_catalog
+from src.services.instrument_catalog import InstrumentCatalog, InstrumentIndex
+
+INSTRUMENTS = [
+    {"instId": "BTC-USDT", "baseCcy": "BTC", "quoteCcy": "USDT", "state": "live"},
+    {"instId": "BTC-EUR", "baseCcy": "BTC", "quoteCcy": "EUR", "state": "live"},
+    {"instId": "WBTC-USDT", "baseCcy": "WBTC", "quoteCcy": "USDT", "state": "live"},
+    {"instId": "ETH-BTC", "baseCcy": "ETH", "quoteCcy": "BTC", "state": "live"},
+    {"instId": "SOL-USDT", "baseCcy": "SOL", "quoteCcy": "USDT", "state": "live"},
+]
+
+
+def test_contains_uses_exact_instrument_ids():
+    """Validate mã bằng hash set."""
+    index = InstrumentIndex(INSTRUMENTS)
+    assert index.contains("SOL-USDT")
+    assert not index.contains("SOL")
+    assert len(index) == 5
+
+
+def test_search_ranks_exact_then_prefix_then_substring():
+    """Khớp baseCcy chính xác đứng trước, ưu tiên cặp USDT, substring xếp cuối."""
+    index = InstrumentIndex(INSTRUMENTS)
+    results = [i["instId"] for i in index.search("btc")]
+    assert results == ["BTC-USDT", "BTC-EUR", "WBTC-USDT", "ETH-BTC"]
+    assert [i["instId"] for i in index.search("sol-us")] == ["SOL-USDT"]
+    assert index.search("xyz") == []
+
+
+def test_search_skips_substring_scan_when_prefix_fills_limit(monkeypatch):
+    """Đủ `limit` kết quả khớp tiền tố: không cần tra n-gram, kết quả giống như khi tra đầy đủ."""
+    index = InstrumentIndex(INSTRUMENTS)
+    expected = [i["instId"] for i in index.search("btc", limit=2)]
+
+    def fail(query):
+        raise AssertionError("không được tra n-gram")
+
+    monkeypatch.setattr(index, "_substring_candidates", fail)
+    assert [i["instId"] for i in index.search("btc", limit=2)] == expected == ["BTC-USDT", "BTC-EUR"]
+
+
+class DownRedis:
+    async def get(self, key):
+        raise RedisError("connection refused")
+
+
+@pytest.mark.asyncio
+async def test_catalog_backs_off_after_redis_and_okx_both_fail(monkeypatch):
+    """Redis và OKX cùng lỗi: không gọi lại OKX trên mỗi request cho đến hết thời gian chờ."""
+    calls = []
+
+    async def failing_instruments(inst_type):
+        calls.append(inst_type)
+        raise OSError("OKX unreachable")
+
+    monkeypatch.setattr(instrument_catalog, "get_async_redis", lambda: DownRedis())
+    monkeypatch.setattr(instrument_catalog.OKXClient, "get_instruments", failing_instruments)
+    monkeypatch.setattr(InstrumentCatalog, "_index", None)
+    monkeypatch.setattr(InstrumentCatalog, "_failed_at", None)
+    monkeypatch.setattr(InstrumentCatalog, "_refreshing", None)
+
+    assert not await InstrumentCatalog.ais_valid("BTC-USDT")
+    assert not await InstrumentCatalog.ais_valid("BTC-USDT")
+    assert len(calls) == 1
+
+    # Nạp nền thất bại cũng chờ, không tạo task mới cho mỗi request
+    monkeypatch.setattr(InstrumentCatalog, "_index", InstrumentIndex(INSTRUMENTS))
+    monkeypatch.setattr(InstrumentCatalog, "_loaded_at", 0.0)
+    monkeypatch.setattr(InstrumentCatalog, "_failed_at", None)
+    assert await InstrumentCatalog.ais_valid("BTC-USDT")
+    await InstrumentCatalog._refreshing
+    assert await InstrumentCatalog.ais_valid("BTC-USDT")
+    assert InstrumentCatalog._refreshing is None
+    assert len(calls) == 2
+
+    # Hết thời gian chờ thì thử lại
+    monkeypatch.setattr(InstrumentCatalog, "_failed_at", InstrumentCatalog._failed_at - 3600)
+    await InstrumentCatalog.ais_valid("BTC-USDT")
+    await InstrumentCatalog._refreshing
+    assert len(calls) == 3
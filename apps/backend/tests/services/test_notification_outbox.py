@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from src.models import NotificationOutbox
+from src.services.notification_outbox import NotificationOutboxService
+from src.services.telegram_dispatcher import Delivery
+
+
+@pytest.mark.asyncio
+async def test_sender_claims_delivers_and_backs_off(tmp_path, monkeypatch):
+    """Claim không lấy trùng trong thời gian lease; gửi được ghi độ trễ, lỗi tạm thời hẹn lại, lỗi vĩnh viễn bỏ."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.database import to_async_url
+
+    url = f"sqlite:///{tmp_path / 'outbox.db'}"
+    engine = create_engine(url)
+    NotificationOutbox.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    messages = [("ok", "BTC +2%"), ("ok", "ETH -3%"), ("flaky", "BTC +2%"), ("blocked", "BTC +2%"), ("ok", "BTC +2%")]
+    assert NotificationOutboxService.enqueue(db, messages, kind="ALERT") == 4
+
+    deliveries = {
+        "ok": Delivery(True, False, None),
+        "flaky": Delivery(False, True, "502 Bad Gateway"),
+        "blocked": Delivery(False, False, "403 Forbidden"),
+    }
+
+    async def fake_send_once(chat_id, text):
+        return deliveries[chat_id]
+
+    monkeypatch.setattr("src.services.notification_outbox.TelegramDispatcher.send_once", fake_send_once)
+    async_engine = create_async_engine(to_async_url(url))
+    async with async_sessionmaker(async_engine, expire_on_commit=False)() as adb:
+        assert len(await NotificationOutboxService.aclaim(adb, batch_size=2)) == 2
+        # Hai dòng đã claim đang trong lease, sender khác chỉ lấy được phần còn lại
+        assert await NotificationOutboxService.adeliver_batch(adb, batch_size=10) == 2
+        rows = {r.chat_id: r for r in db.query(NotificationOutbox).filter(NotificationOutbox.attempts == 1)}
+        assert rows["blocked"].status == "FAILED" and rows["blocked"].last_error == "403 Forbidden"
+        assert rows["flaky"].status == "PENDING" and rows["flaky"].next_attempt_at > datetime.utcnow()
+
+        # Hết lease / hết backoff: tin của sender "chết" và tin lỗi tạm thời được claim lại
+        later = datetime.utcnow() + timedelta(minutes=5)
+        assert sorted(r.chat_id for r in await NotificationOutboxService.aclaim(adb, 10, now=later)) == ["flaky", "ok", "ok"]
+        await adb.execute(update(NotificationOutbox).values(next_attempt_at=datetime.utcnow()))
+        await adb.commit()
+        assert await NotificationOutboxService.adeliver_batch(adb, batch_size=10) == 3
+    await async_engine.dispose()
+
+    sent = db.query(NotificationOutbox).filter(NotificationOutbox.status == "SENT").all()
+    assert sorted(r.text for r in sent) == ["BTC +2%", "ETH -3%"]
+    assert all(r.chat_id == "ok" and r.latency_ms >= 0 and r.sent_at for r in sent)
+    db.close()
@@ -0,0 +1,59 @@
+import httpx
+import pytest
+from src.services.okx_client import OKXClient
+from src.services.crypto_scraper import CryptoScraperService
+
+
+@pytest.fixture
+def okx_transport():
+    """Giả lập OKX API bằng httpx.MockTransport và đếm số request."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path.endswith("/market/tickers"):
+            data = [{"instId": "BTC-USDT", "last": "100"}, {"instId": "DOGE-USDT", "last": "0.1"}]
+        elif request.url.path.endswith("/market/history-candles"):
+            data = [
+                ["1700000060000", "2", "3", "1", "2.5", "10", "0", "0", "0"],
+                ["1700000000000", "1", "2", "0.5", "1.5", "5", "0", "0", "1"],
+            ]
+        else:
+            return httpx.Response(200, json={"code": "51001", "msg": "Instrument ID does not exist", "data": []})
+        return httpx.Response(200, json={"code": "0", "msg": "", "data": data})
+
+    OKXClient.transport = httpx.MockTransport(handler)
+    OKXClient._clients.clear()
+    yield calls
+    OKXClient.transport = None
+    OKXClient._clients.clear()
+
+
+def test_sync_wrapper_reuses_shared_client(okx_transport):
+    """Các lời gọi đồng bộ dùng chung một client trên event loop nền."""
+    prices = CryptoScraperService.get_prices(["BTC-USDT"])
+    candles = CryptoScraperService.get_historical_candles("BTC-USDT", limit=2)
+
+    assert [p["instId"] for p in prices] == ["BTC-USDT"]
+    assert [c["close"] for c in candles] == [1.5, 2.5]
+    assert len(OKXClient._clients) == 1
+    assert len(okx_transport) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_api_error_returns_empty(okx_transport):
+    """Lỗi nghiệp vụ từ OKX được log và trả về danh sách rỗng."""
+    assert await CryptoScraperService.aget_all_instruments() == []
+
+
+def test_candles_batch_fetches_all_symbols(okx_transport, monkeypatch):
+    """Batch gửi một request cho mỗi mã và trả về nến theo mã."""
+    async def no_limit(path):
+        return None
+
+    monkeypatch.setattr("src.services.okx_client.OKXRateLimiter.acquire", no_limit)
+    batch = CryptoScraperService.get_historical_candles_batch(["BTC-USDT", "ETH-USDT", "SOL-USDT"], limit=2)
+
+    assert set(batch) == {"BTC-USDT", "ETH-USDT", "SOL-USDT"}
+    assert all(len(c) == 2 for c in batch.values())
+    assert len(okx_transport) == 3
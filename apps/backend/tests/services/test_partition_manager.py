@@ -0,0 +1,83 @@
+from datetime import date, datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.services.partition_manager import PartitionManager
+
+
+class RecordingSession:
+    """Session giả: ghi lại SQL đã chạy; `existing` là các bảng to_regclass tìm thấy, `children` là partition con."""
+
+    def __init__(self, existing=(), children=()):
+        self.existing, self.children = set(existing), list(children)
+        self.statements, self.commits = [], 0
+
+    def execute(self, stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        self.statements.append(sql)
+        if sql == "SELECT to_regclass(:name)":
+            return FakeResult([(params["name"] if params["name"] in self.existing else None,)])
+        if "pg_inherits" in sql:
+            return FakeResult([(name,) for name in self.children])
+        return FakeResult([])
+
+    def commit(self):
+        self.commits += 1
+
+    def ddl(self):
+        return [sql for sql in self.statements if not sql.startswith("SELECT")]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalar(self):
+        return self.rows[0][0]
+
+    def all(self):
+        return self.rows
+
+
+def test_partition_name_and_non_postgres_fallback():
+    """Tên partition theo ngày; trên DB không phải PostgreSQL bảng luôn được coi là chưa partition."""
+    assert PartitionManager.partition_name("crypto_history", date(2024, 1, 5)) == "crypto_history_p20240105"
+
+    db = sessionmaker(bind=create_engine("sqlite://"))()
+    try:
+        assert PartitionManager.is_partitioned(db, "crypto_history") is False
+    finally:
+        db.close()
+
+
+def test_ensure_partitions_creates_missing_days_with_utc_day_ranges():
+    """Chỉ tạo partition còn thiếu; mỗi partition chứa [ngày, ngày + 1), kể cả qua ranh giới tháng."""
+    db = RecordingSession(existing={"crypto_history_p20260130"})
+
+    assert PartitionManager.ensure_partitions(db, "crypto_history", date(2026, 1, 30), date(2026, 2, 1)) == 2
+    assert db.ddl() == [
+        "CREATE TABLE crypto_history_p20260131 PARTITION OF crypto_history "
+        "FOR VALUES FROM ('2026-01-31') TO ('2026-02-01')",
+        "CREATE TABLE crypto_history_p20260201 PARTITION OF crypto_history "
+        "FOR VALUES FROM ('2026-02-01') TO ('2026-02-02')",
+    ]
+    assert db.commits == 1
+
+
+def test_drop_partitions_before_drops_only_fully_expired_days():
+    """Partition bị xóa khi cả ngày cũ hơn cutoff (ngày kết thúc đúng tại cutoff vẫn bị xóa)."""
+    db = RecordingSession(children=["crypto_history_p20260103", "crypto_history_p20260101",
+                                    "crypto_history_p20260102", "crypto_history_default"])
+
+    assert PartitionManager.drop_partitions_before(db, "crypto_history", datetime(2026, 1, 3)) == 2
+    assert db.ddl() == [
+        "ALTER TABLE crypto_history DETACH PARTITION crypto_history_p20260101",
+        "DROP TABLE crypto_history_p20260101",
+        "ALTER TABLE crypto_history DETACH PARTITION crypto_history_p20260102",
+        "DROP TABLE crypto_history_p20260102",
+    ]
+
+    db = RecordingSession(children=["crypto_history_p20260102"])
+    assert PartitionManager.drop_partitions_before(db, "crypto_history", datetime(2026, 1, 2, 23, 59)) == 0
+    assert db.ddl() == [] and db.commits == 1
@@ -0,0 +1,111 @@
+import pytest
+
+from src.models import NotificationOutbox, PriceAlert
+from src.services.price_alerts import ABOVE, BELOW, PriceAlertIndex, PriceAlertService, ThresholdBook
+
+
+@pytest.fixture
+def alert_db(sqlite_db, fake_redis, monkeypatch):
+    """price_alerts + outbox trên SQLite in-memory, index trống, đồng bộ ở mỗi lần đánh giá."""
+    monkeypatch.setattr("src.services.price_alerts.get_redis", lambda: fake_redis)
+    monkeypatch.setattr("src.services.price_alerts.CryptoConfig.PRICE_ALERT_SYNC_SECONDS", 0)
+    PriceAlertIndex.reset()
+    yield sqlite_db(PriceAlert, NotificationOutbox)
+    PriceAlertIndex.reset()
+
+
+def add_alerts(db, *alerts):
+    db.add_all([PriceAlert(chat_id=chat_id, symbol=symbol, direction=direction, target_price=target)
+                for chat_id, symbol, direction, target in alerts])
+    db.commit()
+
+
+def outbox(db):
+    return {r.chat_id: r.text for r in db.query(NotificationOutbox)}
+
+
+def test_threshold_book_pops_crossed_levels_above():
+    """ABOVE: mọi ngưỡng <= giá bị lấy ra (kể cả chạm đúng mức), ngưỡng cao hơn giữ lại."""
+    book = ThresholdBook(ABOVE)
+    for alert_id, target in [(1, 100.0), (2, 120.0), (3, 110.0), (4, 100.0)]:
+        book.add(alert_id, target)
+    assert sorted(book.pop_triggered(110.0)) == [1, 3, 4]
+    assert book.pop_triggered(110.0) == [] and book.ids == [2]
+
+
+def test_threshold_book_pops_crossed_levels_below_and_removes():
+    """BELOW: mọi ngưỡng >= giá bị lấy ra; ngưỡng đã xóa không bao giờ bị lấy ra."""
+    book = ThresholdBook(BELOW)
+    for alert_id, target in [(5, 90.0), (6, 80.0), (7, 95.0)]:
+        book.add(alert_id, target)
+    assert book.remove(7, 95.0) and not book.remove(7, 95.0)
+    assert book.pop_triggered(90.0) == [5] and book.ids == [6]
+
+
+def test_percentage_alert_becomes_price_level():
+    """Cảnh báo theo % được quy đổi thành mức giá lúc tạo; chiều suy ra từ dấu / vị trí so với giá hiện tại."""
+    assert PriceAlertService.target_for(200.0, change_pct=-5) == (BELOW, 190.0)
+    assert PriceAlertService.target_for(200.0, change_pct=10) == (ABOVE, pytest.approx(220.0))
+    assert PriceAlertService.target_for(200.0, price=150.0) == (BELOW, 150.0)
+
+
+def test_alert_that_would_fire_immediately_is_rejected():
+    """Mức giá bằng giá hiện tại hoặc % bằng 0 sẽ bắn ngay ở lần đánh giá kế tiếp: từ chối khi tạo."""
+    with pytest.raises(ValueError):
+        PriceAlertService.target_for(200.0, price=200.0)
+    with pytest.raises(ValueError):
+        PriceAlertService.target_for(200.0, change_pct=0)
+
+
+def test_crossed_alerts_are_grouped_into_one_message_per_chat(alert_db):
+    """Các cảnh báo bị chạm của cùng một chat gom thành một tin; cảnh báo chưa chạm không bắn."""
+    add_alerts(alert_db, ("1", "BTC-USDT", ABOVE, 70000.0), ("1", "ETH-USDT", BELOW, 3000.0),
+               ("2", "BTC-USDT", BELOW, 60000.0))
+
+    assert PriceAlertService.evaluate(alert_db, {"BTC-USDT": 71000.0, "ETH-USDT": 2990.0}) == 2
+    messages = outbox(alert_db)
+    assert list(messages) == ["1"] and "BTC" in messages["1"] and "ETH" in messages["1"]
+    fired = alert_db.query(PriceAlert).filter(PriceAlert.is_active == False).all()
+    assert {(a.symbol, a.triggered_price) for a in fired} == {("BTC-USDT", 71000.0), ("ETH-USDT", 2990.0)}
+
+
+def test_alert_fires_only_once(alert_db):
+    """Giá vượt ngưỡng lần nữa: cảnh báo đã bắn không bắn lại, mã rời khỏi danh sách theo dõi."""
+    add_alerts(alert_db, ("1", "BTC-USDT", ABOVE, 70000.0))
+    assert PriceAlertService.evaluate(alert_db, {"BTC-USDT": 71000.0}) == 1
+    assert PriceAlertService.evaluate(alert_db, {"BTC-USDT": 72000.0}) == 0
+    assert alert_db.query(NotificationOutbox).count() == 1
+    assert PriceAlertIndex.symbols(alert_db) == []
+
+
+def test_new_alert_is_synced_when_version_changes(alert_db, fake_redis):
+    """Cảnh báo tạo sau lần nạp đầu được đồng bộ tăng dần khi API tăng version."""
+    add_alerts(alert_db, ("1", "BTC-USDT", ABOVE, 70000.0))
+    assert PriceAlertIndex.symbols(alert_db) == ["BTC-USDT"]
+
+    add_alerts(alert_db, ("2", "ETH-USDT", ABOVE, 3100.0))
+    fake_redis.incr(PriceAlertIndex.VERSION_KEY)
+    assert PriceAlertIndex.symbols(alert_db) == ["BTC-USDT", "ETH-USDT"]
+    assert PriceAlertService.evaluate(alert_db, {"ETH-USDT": 3100.0}) == 1
+
+
+def test_rolled_back_evaluation_returns_alerts_to_index(alert_db):
+    """Transaction của crawl bị rollback: cảnh báo vẫn bật trong DB nên phải còn trong index."""
+    add_alerts(alert_db, ("1", "BTC-USDT", ABOVE, 70000.0))
+
+    assert PriceAlertService.evaluate(alert_db, {"BTC-USDT": 71000.0}, commit=False) == 1
+    alert_db.rollback()
+    assert PriceAlertIndex.symbols(alert_db) == ["BTC-USDT"]
+
+    assert PriceAlertService.evaluate(alert_db, {"BTC-USDT": 71500.0}) == 1
+    assert alert_db.query(NotificationOutbox).count() == 1
+    assert PriceAlertIndex.symbols(alert_db) == []
+
+
+def test_session_closed_without_commit_returns_alerts_to_index(alert_db):
+    """Crawl lỗi chỉ đóng session (không commit): cảnh báo được trả lại index."""
+    add_alerts(alert_db, ("1", "BTC-USDT", BELOW, 60000.0))
+
+    assert PriceAlertService.evaluate(alert_db, {"BTC-USDT": 59000.0}, commit=False) == 1
+    alert_db.close()
+    assert PriceAlertIndex.symbols(alert_db) == ["BTC-USDT"]
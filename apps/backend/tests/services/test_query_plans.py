@@ -0,0 +1,73 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+
+from src.models import CryptoHistory, CryptoDaily, TradingSignal
+from src.services.crypto_repository import CryptoRepository
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+pytestmark = pytest.mark.skipif(not POSTGRES_URL, reason="Cần TEST_POSTGRES_URL để kiểm tra query plan")
+
+
+@pytest.fixture
+def pg_conn():
+    """Kết nối PostgreSQL trong schema tạm với bảng nến + tín hiệu đã seed dữ liệu và VACUUM ANALYZE."""
+    engine = create_engine(POSTGRES_URL, isolation_level="AUTOCOMMIT")
+    conn = engine.connect()
+    conn.execute(text("DROP SCHEMA IF EXISTS plan_test CASCADE"))
+    conn.execute(text("CREATE SCHEMA plan_test"))
+    conn.execute(text("SET search_path TO plan_test"))
+    for model in (CryptoHistory, CryptoDaily):
+        model.__table__.create(conn)
+        conn.execute(text(f"""
+            INSERT INTO {model.__tablename__} (symbol, open, high, low, close, volume, timestamp, is_confirmed)
+            SELECT 'SYM' || (i % 50) || '-USDT', 1, 2, 0.5, i, 10,
+                   TIMESTAMP '2026-01-01' + (i / 50) * INTERVAL '1 minute', true
+            FROM generate_series(1, 50000) AS i
+        """))
+        # VACUUM cập nhật visibility map, điều kiện để có index-only scan
+        conn.execute(text(f"VACUUM ANALYZE {model.__tablename__}"))
+    TradingSignal.__table__.create(conn)
+    # Như production: gần như mọi tín hiệu đã đóng, chỉ một phần nhỏ còn PENDING
+    conn.execute(text("""
+        INSERT INTO trading_signals (symbol, signal_type, score, entry_price, status, timestamp)
+        SELECT 'SYM' || (i % 50) || '-USDT', 'BUY', 2, i,
+               CASE WHEN i % 500 = 0 THEN 'PENDING' ELSE 'COMPLETED' END,
+               TIMESTAMP '2026-01-01' + (i / 50) * INTERVAL '1 minute'
+        FROM generate_series(1, 50000) AS i
+    """))
+    conn.execute(text("VACUUM ANALYZE trading_signals"))
+    yield conn
+    conn.execute(text("DROP SCHEMA plan_test CASCADE"))
+    conn.close()
+    engine.dispose()
+
+
+def explain(conn, stmt) -> str:
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    return "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {sql}")))
+
+
+@pytest.mark.parametrize("model", [CryptoHistory, CryptoDaily])
+def test_latest_candle_queries_use_index_only_scan(pg_conn, model):
+    """Giá mới nhất và lịch sử gần nhất đọc trực tiếp từ index phủ (symbol, timestamp DESC)."""
+    index = f"ix_{model.__tablename__}_symbol_timestamp_desc"
+    for stmt in (
+        CryptoRepository.last_price_stmt(model, "SYM7-USDT"),
+        CryptoRepository.recent_history_stmt(model, "SYM7-USDT", 100),
+    ):
+        plan = explain(pg_conn, stmt)
+        assert f"Index Only Scan using {index}" in plan, plan
+        assert "Sort" not in plan, plan
+
+
+def test_pending_signal_batches_use_status_timestamp_index(pg_conn):
+    """Lô tín hiệu PENDING cần đối soát đọc qua index (status, timestamp), không quét cả bảng."""
+    stmt = CryptoRepository.pending_signals_batch_stmt(datetime(2026, 1, 1, 12), after_id=0, batch_size=100)
+    plan = explain(pg_conn, stmt)
+    assert "ix_trading_signals_status_timestamp" in plan, plan
+    assert "Seq Scan on trading_signals" not in plan, plan
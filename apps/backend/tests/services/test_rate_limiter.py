@@ -0,0 +1,24 @@
+import pytest
+from src.services.rate_limiter import TokenBucket, RedisTokenBucket
+
+
+def test_token_bucket_returns_wait_when_empty():
+    """Bucket hết token thì trả về thời gian chờ theo tốc độ nạp."""
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.1
+
+
+@pytest.mark.asyncio
+async def test_redis_bucket_falls_back_to_local_when_redis_down(monkeypatch):
+    """Redis lỗi thì dùng bucket cục bộ thay vì làm hỏng lượt crawl."""
+    async def broken(self, tokens):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(RedisTokenBucket, "_try_acquire_redis", broken)
+    bucket = RedisTokenBucket("ratelimit:test", rate=100, capacity=1)
+    await bucket.acquire()
+    assert bucket._redis_down_until > 0
+    assert bucket._local.try_acquire() > 0
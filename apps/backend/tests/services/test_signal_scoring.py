@@ -0,0 +1,42 @@
+import numpy as np
+
+from src.services import ta_numpy
+from src.services.signal_scoring import ScoringParams, score_components, score_indicators, score_table
+from src.services.ta_service import TechnicalAnalysisService
+from datetime import datetime, timedelta
+
+
+def to_history(closes):
+    start = datetime(2026, 1, 1)
+    return [{"close": c, "timestamp": start + timedelta(minutes=i)} for i, c in enumerate(closes)]
+
+
+def test_score_table_matches_per_symbol_scoring():
+    """Chấm điểm cả danh sách (chỉ báo tính theo lô) cho cùng kết quả như chấm từng mã riêng lẻ."""
+    rng = np.random.default_rng(5)
+    symbols = [f"C{i}-USDT" for i in range(40)]
+    series_1m = [100 * np.cumprod(1 + rng.normal(0, 0.01, rng.integers(5, 100))) for _ in symbols]
+    series_1d = [100 * np.cumprod(1 + rng.normal(0, 0.03, rng.integers(5, 30))) for _ in symbols]
+    prices = [s[-1] * (1 + rng.normal(0, 0.02)) for s in series_1m]
+
+    ta_1m_batch = TechnicalAnalysisService.calculate_indicators_batch(ta_numpy.align_right(series_1m, 100))
+    ta_1d_batch = TechnicalAnalysisService.calculate_indicators_batch(ta_numpy.align_right(series_1d, 30))
+    table = score_table(symbols, ta_1m_batch, ta_1d_batch, prices)
+
+    for symbol, s1m, s1d, price in zip(symbols, series_1m, series_1d, prices):
+        ta_1m = TechnicalAnalysisService.calculate_indicators(to_history(s1m), backend="numpy")
+        ta_1d = TechnicalAnalysisService.calculate_indicators(to_history(s1d), backend="numpy")
+        suggestion, signal_type, score = score_indicators(ta_1m, ta_1d, price)
+        row = table[symbol]
+        assert (row["suggestion"], row["signal_type"], row["score"]) == (suggestion, signal_type, score)
+
+
+def test_bollinger_params_rescale_bands_and_points():
+    """bb_std co giãn dải quanh đường giữa (dải gốc tính với std 2); bb_points đổi số điểm khi chạm dải."""
+    upper, lower = [110.0, 110.0], [90.0, 90.0]
+    prices = [92.0, 108.0]  # Trong dải std 2 (90..110), ngoài dải std 1.5 (92.5..107.5)
+
+    _, default_points, _ = score_components([50, 50], upper, lower, [50, 50], prices)
+    _, narrow_points, _ = score_components([50, 50], upper, lower, [50, 50], prices,
+                                           ScoringParams(bb_std=1.5, bb_points=1))
+    assert list(default_points) == [0, 0] and list(narrow_points) == [1, -1]
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from src.models import CryptoHistory, CryptoDaily, TradingSignal
+from src.services.crypto_repository import CryptoRepository
+from src.services.indicator_cache import IndicatorCache
+from src.services.signal_snapshot import SignalSnapshot
+
+
+def test_snapshot_is_read_only_unless_recording(sqlite_db):
+    """Tính snapshot cho API không ghi tín hiệu; chỉ pipeline định kỳ (record=True) mới ghi."""
+    db = sqlite_db(CryptoHistory, CryptoDaily, TradingSignal)
+    IndicatorCache.clear_local()
+
+    start = datetime.utcnow() - timedelta(minutes=120)
+    CryptoRepository.bulk_save_candles(db, [
+        {"symbol": "BTC-USDT", "open": 1.0, "high": 2.0 + i, "low": 0.5, "close": 1.5 + i, "volume": 1.0,
+         "timestamp": start + timedelta(minutes=i)}
+        for i in range(120)
+    ])
+    tickers = [{"instId": "BTC-USDT", "last": "500"}, {"instId": "NEW-USDT", "last": "1"}]
+
+    snapshot = SignalSnapshot.compute(db, tickers)
+    assert db.query(TradingSignal).count() == 0
+    btc, new = snapshot["coins"]
+    assert (btc["instId"], btc["signal_type"], btc["db_high_24h"], btc["db_low_24h"]) == ("BTC-USDT", "SELL", 121.0, 0.5)
+    assert (new["score"], new["db_high_24h"]) == (0, 0)
+
+    SignalSnapshot.compute(db, tickers, record=True)
+    assert db.query(TradingSignal).count() == 1
+
+
+def test_stream_schedules_one_signal_task_per_minute(fake_redis, monkeypatch):
+    """Nến của từng mã đến riêng lẻ: chỉ lần ghi đầu tiên của mỗi phút được hẹn task tính tín hiệu."""
+    monkeypatch.setattr("src.services.signal_snapshot.get_redis", lambda: fake_redis)
+    minute = datetime(2026, 1, 1, 12, 0)
+
+    assert SignalSnapshot.schedule_once(minute)
+    assert not SignalSnapshot.schedule_once(minute)
+    assert SignalSnapshot.schedule_once(minute + timedelta(minutes=1))
+
+
+def test_released_claim_can_be_taken_again(fake_redis, monkeypatch):
+    """Lượt tính lỗi trả quyền tính: lượt sau giành lại được cùng nến."""
+    monkeypatch.setattr("src.services.signal_snapshot.get_redis", lambda: fake_redis)
+    candle_ts = datetime(2026, 1, 1, 12, 0)
+
+    assert SignalSnapshot.claim(candle_ts) and not SignalSnapshot.claim(candle_ts)
+    SignalSnapshot.release(candle_ts)
+    assert SignalSnapshot.claim(candle_ts)
@@ -0,0 +1,141 @@
+import pytest
+from redis.exceptions import RedisError
+
+from src.models import UserSubscription
+from src.services.subscription_index import SubscriptionIndex
+from src.services.subscription_service import SubscriptionService
+
+
+def emulate_update(add):
+    """ADD_SCRIPT / REMOVE_SCRIPT viết lại bằng Python cho Redis giả."""
+    def run(redis, keys, args):
+        chats_key, symbols_key, version_key = keys
+        chat_id, symbol = args
+        if version_key not in redis.data:
+            return None
+        if add:
+            redis.sadd(chats_key, chat_id)
+            redis.sadd(symbols_key, symbol)
+        else:
+            redis.srem(chats_key, chat_id)
+            if not redis.data.get(chats_key):
+                redis.srem(symbols_key, symbol)
+        return redis.incr(version_key)
+    return run
+
+
+def forget_local():
+    """Giả lập một process khác: bản sao local trống."""
+    SubscriptionIndex._set_mirror({}, None)
+    SubscriptionIndex._checked_at = 0.0
+
+
+@pytest.fixture
+def index_env(sqlite_db, fake_redis, monkeypatch):
+    """Bảng user_subscriptions trên SQLite + Redis giả chạy được 2 script của index."""
+    fake_redis.scripts = {SubscriptionIndex.ADD_SCRIPT: emulate_update(True),
+                          SubscriptionIndex.REMOVE_SCRIPT: emulate_update(False)}
+    monkeypatch.setattr("src.services.subscription_index.get_redis", lambda: fake_redis)
+    forget_local()
+    yield sqlite_db(UserSubscription), fake_redis
+    forget_local()
+    SubscriptionIndex._stale_pending = False
+
+
+def test_changes_before_rebuild_are_not_written_to_redis(index_env):
+    """Chưa dựng index thì thêm/xóa không ghi Redis (tránh index thiếu mà trông như đầy đủ)."""
+    db, redis = index_env
+    SubscriptionService.subscribe(db, "1", "btc")
+    assert redis.data == {}
+
+
+def test_first_read_with_db_rebuilds_from_table(index_env):
+    """Redis chưa có index: lần đọc đầu có db dựng lại từ bảng, thay đổi sau đó ghi thẳng vào index."""
+    db, _ = index_env
+    SubscriptionService.subscribe(db, "1", "btc")
+    assert SubscriptionIndex.symbols(db) == ["BTC-USDT"]
+
+    SubscriptionService.subscribe(db, "2", "eth")
+    SubscriptionService.unsubscribe(db, "1", "btc")
+    assert SubscriptionIndex.symbols(db) == ["ETH-USDT"]
+
+
+def test_other_process_routes_from_redis_without_db(index_env):
+    """Process khác nạp index từ Redis: lập danh sách mã và tra người đăng ký không truy vấn DB."""
+    db, _ = index_env
+    SubscriptionIndex.rebuild(db)
+    SubscriptionService.subscribe(db, "1", "btc")
+    SubscriptionService.subscribe(db, "2", "btc")
+
+    forget_local()
+    db.selects.clear()
+    assert SubscriptionIndex.symbols(db) == ["BTC-USDT"]
+    assert SubscriptionIndex.subscribers(["BTC-USDT", "SOL-USDT"], db) == {
+        "BTC-USDT": frozenset({"1", "2"}), "SOL-USDT": frozenset()
+    }
+    assert db.selects == []
+
+
+def test_change_from_another_process_is_seen_after_local_ttl(index_env):
+    """Thay đổi ghi vào Redis bởi process khác làm version tăng: bản local nạp lại khi hết TTL."""
+    db, redis = index_env
+    SubscriptionService.subscribe(db, "1", "eth")
+    SubscriptionIndex.rebuild(db)
+
+    redis.eval(SubscriptionIndex.REMOVE_SCRIPT, 3, SubscriptionIndex.chats_key("ETH-USDT"),
+               SubscriptionIndex.SYMBOLS_KEY, SubscriptionIndex.VERSION_KEY, "1", "ETH-USDT")
+    assert SubscriptionIndex.symbols(db) == ["ETH-USDT"]  # Còn trong TTL local
+    SubscriptionIndex._checked_at = 0.0
+    assert SubscriptionIndex.symbols(db) == []
+
+
+def test_subscribe_during_rebuild_is_not_lost(index_env, monkeypatch):
+    """Đăng ký ghi vào Redis giữa lúc rebuild đọc bảng và EXEC: WATCH phát hiện, dựng lại giữ đăng ký đó."""
+    db, redis = index_env
+    SubscriptionService.subscribe(db, "1", "btc")
+    SubscriptionIndex.rebuild(db)
+    group, raced = SubscriptionIndex._group, []
+
+    def group_then_subscribe(rows):
+        mirror = group(rows)
+        if not raced:
+            raced.append(True)
+            SubscriptionService.subscribe(db, "2", "sol")
+        return mirror
+
+    monkeypatch.setattr(SubscriptionIndex, "_group", staticmethod(group_then_subscribe))
+    SubscriptionIndex.rebuild(db)
+
+    forget_local()
+    assert SubscriptionIndex.symbols() == ["BTC-USDT", "SOL-USDT"]
+    assert SubscriptionIndex.subscribers(["SOL-USDT"]) == {"SOL-USDT": frozenset({"2"})}
+
+
+def fail(*args, **kwargs):
+    raise RedisError("timeout")
+
+
+def test_failed_update_makes_next_reader_rebuild(index_env, monkeypatch):
+    """Ghi index lỗi sau khi DB đã commit: index bị đánh dấu lỗi thời, process đọc kế tiếp dựng lại từ bảng."""
+    db, redis = index_env
+    SubscriptionIndex.rebuild(db)
+    monkeypatch.setattr(redis, "eval", fail)
+    SubscriptionService.subscribe(db, "1", "btc")
+    assert redis.exists(SubscriptionIndex.STALE_KEY)
+
+    forget_local()
+    assert SubscriptionIndex.symbols(db) == ["BTC-USDT"]
+    assert not redis.exists(SubscriptionIndex.STALE_KEY)
+
+
+def test_stale_mark_is_retried_when_redis_was_down(index_env, monkeypatch):
+    """Redis lỗi cả lúc đánh dấu: process giữ cờ và đặt lại dấu ở lần đọc kế tiếp rồi dựng lại."""
+    db, redis = index_env
+    SubscriptionIndex.rebuild(db)
+    monkeypatch.setattr(redis, "eval", fail)
+    monkeypatch.setattr(redis, "set", fail)
+    SubscriptionService.subscribe(db, "1", "btc")
+    assert not redis.exists(SubscriptionIndex.STALE_KEY)
+
+    monkeypatch.delattr(redis, "set")
+    assert SubscriptionIndex.symbols(db) == ["BTC-USDT"]
@@ -0,0 +1,30 @@
+import numpy as np
+
+from src.services import ta_numpy
+
+
+def test_matrix_rows_match_single_series():
+    """Tính trên ma trận (S, T) đệm NaN ở đầu cho cùng kết quả như tính từng chuỗi riêng."""
+    rng = np.random.default_rng(0)
+    lengths = [100, 60, 34, 25]
+    series = [100 * np.cumprod(1 + rng.normal(0, 0.01, n)) for n in lengths]
+    matrix = np.full((len(series), max(lengths)), np.nan)
+    for i, s in enumerate(series):
+        matrix[i, -len(s):] = s
+
+    batched = {
+        "rsi": ta_numpy.rsi(matrix),
+        "macd": ta_numpy.macd(matrix)[0],
+        "upper": ta_numpy.bbands(matrix)[0],
+    }
+    for i, s in enumerate(series):
+        single = {
+            "rsi": ta_numpy.rsi(s),
+            "macd": ta_numpy.macd(s)[0],
+            "upper": ta_numpy.bbands(s)[0],
+        }
+        for name, values in single.items():
+            np.testing.assert_allclose(batched[name][i, -len(s):], values, rtol=1e-12, equal_nan=True)
+
+    # Chuỗi 25 điểm chưa đủ cho MACD (cần 26 + 9 - 1)
+    assert np.isnan(batched["macd"][3]).all()
@@ -1,3 +1,7 @@
+import math
+import random
+import sys
+
 import pytest
 from src.services.ta_service import TechnicalAnalysisService
 from datetime import datetime, timedelta
@@ -26,3 +30,75 @@ def test_calculate_indicators_success():
     assert 0 <= result["rsi"] <= 100
     assert result["bbands"]["upper"] > result["bbands"]["lower"]
     assert "macd" in result
+
+def random_walk():
+    rng = random.Random(3)
+    base_time = datetime(2026, 1, 1)
+    price, data = 100.0, []
+    for i in range(100):
+        price *= 1 + rng.gauss(0, 0.01)
+        data.append({"close": price, "timestamp": base_time + timedelta(minutes=i)})
+    return data
+
+
+# Kết quả pandas-ta 0.4.71b0 (pandas 3.0.1) trên `random_walk()[:end]`, ghi lại để so sánh mà không cần pandas
+PANDAS_TA_REFERENCE = {
+    20: {
+        "rsi": 54.25663205351956,
+        "macd": {"value": None, "signal": None, "hist": None},
+        "bbands": {"upper": 106.19300892957122, "middle": 102.25052961312535, "lower": 98.30805029667948},
+    },
+    33: {
+        "rsi": 26.427705018974933,
+        "macd": {"value": None, "signal": None, "hist": None},
+        "bbands": {"upper": 105.3470753555597, "middle": 98.12322959774575, "lower": 90.8993838399318},
+    },
+    34: {
+        "rsi": 32.23533112726241,
+        "macd": {"value": -2.896357569166568, "signal": -2.3598318610415814, "hist": -0.5365257081249868},
+        "bbands": {"upper": 104.60438187171964, "middle": 97.49820648973268, "lower": 90.39203110774572},
+    },
+    60: {
+        "rsi": 32.99815290661506,
+        "macd": {"value": -2.684363548877215, "signal": -2.6650455458861324, "hist": -0.01931800299108266},
+        "bbands": {"upper": 93.89016523535355, "middle": 87.68317748345748, "lower": 81.47618973156142},
+    },
+    100: {
+        "rsi": 52.00949652779995,
+        "macd": {"value": -0.037293126607963245, "signal": -0.4181105960244394, "hist": 0.38081746941647615},
+        "bbands": {"upper": 85.93337351429537, "middle": 82.72441023765333, "lower": 79.51544696101129},
+    },
+}
+
+
+def assert_matches_reference(result, expected):
+    assert result["status"] == "success"
+    assert math.isclose(result["rsi"], expected["rsi"], rel_tol=1e-9)
+    for group in ("macd", "bbands"):
+        for key, value in expected[group].items():
+            if value is None:
+                assert result[group][key] is None
+            else:
+                assert math.isclose(result[group][key], value, rel_tol=1e-9, abs_tol=1e-12)
+
+
+def test_numpy_backend_matches_pandas_ta():
+    """Backend NumPy cho cùng kết quả với pandas-ta (giá trị tham chiếu đã ghi lại)."""
+    data = random_walk()
+    for end, expected in PANDAS_TA_REFERENCE.items():
+        assert_matches_reference(TechnicalAnalysisService.calculate_indicators(data[:end], backend="numpy"), expected)
+
+
+def test_reference_values_match_installed_pandas_ta():
+    """Giá trị tham chiếu vẫn khớp pandas-ta đang cài (chỉ chạy khi có pandas-ta)."""
+    pytest.importorskip("pandas_ta")
+    data = random_walk()
+    for end, expected in PANDAS_TA_REFERENCE.items():
+        assert_matches_reference(TechnicalAnalysisService.calculate_indicators(data[:end], backend="pandas"), expected)
+
+
+def test_pandas_backend_without_pandas_ta_raises_clear_error(monkeypatch):
+    """Chọn backend pandas khi chưa cài pandas-ta: báo lỗi chỉ rõ cách cài."""
+    monkeypatch.setitem(sys.modules, "pandas_ta", None)
+    with pytest.raises(RuntimeError, match="requirements-pandas.txt"):
+        TechnicalAnalysisService.calculate_indicators(random_walk(), backend="pandas")
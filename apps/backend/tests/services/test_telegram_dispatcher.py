@@ -0,0 +1,70 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from src.services.rate_limiter import RedisTokenBucket, TelegramRateLimiter
+from src.services.telegram_dispatcher import TelegramDispatcher
+
+
+@pytest.fixture
+def telegram_transport(monkeypatch):
+    """Giả lập Bot API: lần gửi đầu tiên bị 429 (retry_after), chat "403" đã chặn bot."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        chat_id = str(json.loads(request.content)["chat_id"])
+        calls.append((chat_id, time.monotonic()))
+        if len(calls) == 1:
+            return httpx.Response(429, json={"ok": False, "error_code": 429, "parameters": {"retry_after": 0.2}})
+        if chat_id == "403":
+            return httpx.Response(403, json={"ok": False, "error_code": 403, "description": "bot was blocked"})
+        return httpx.Response(200, json={"ok": True, "result": {}})
+
+    async def redis_down(self, tokens):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(RedisTokenBucket, "_try_acquire_redis", redis_down)
+    monkeypatch.setattr("src.services.telegram_dispatcher.settings.TELEGRAM_BOT_TOKEN", "token")
+    monkeypatch.setattr(TelegramRateLimiter, "_global", None)
+    monkeypatch.setattr(TelegramRateLimiter, "_chats", type(TelegramRateLimiter._chats)())
+    monkeypatch.setattr(TelegramDispatcher, "_paused_until", 0.0)
+    TelegramDispatcher.transport = httpx.MockTransport(handler)
+    TelegramDispatcher._clients.clear()
+    yield calls
+    TelegramDispatcher.transport = None
+    TelegramDispatcher._clients.clear()
+
+
+@pytest.mark.asyncio
+async def test_send_many_honors_retry_after_and_chat_limit(telegram_transport):
+    """429 dừng mọi lượt gửi đúng retry_after; mỗi chat không nhận quá 1 tin/giây; 403 không gửi lại."""
+    started = time.monotonic()
+    results = await TelegramDispatcher.send_many(["1", "2", 2, "403"], "<b>BTC</b>")
+
+    assert results == {"1": True, "2": True, "403": False}
+    assert len(telegram_transport) == 4
+    # Các lượt sau 429 đều chờ hết retry_after
+    assert all(t - started >= 0.2 for _, t in telegram_transport[1:])
+    # Chat bị 429 phải chờ thêm token của chính nó (1 tin/giây) trước khi gửi lại
+    retries = [t for chat, t in telegram_transport if chat == telegram_transport[0][0]]
+    assert retries[1] - retries[0] >= 0.9
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_chat_does_not_hold_send_slot(telegram_transport, monkeypatch):
+    """Chat đang chờ token (1 tin/giây) không giữ slot gửi: chat khác vẫn gửi ngay."""
+    monkeypatch.setattr("src.services.telegram_dispatcher.CryptoConfig.TELEGRAM_SEND_CONCURRENCY", 1)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        telegram_transport.append((str(json.loads(request.content)["chat_id"]), time.monotonic()))
+        return httpx.Response(200, json={"ok": True, "result": {}})
+
+    TelegramDispatcher.transport = httpx.MockTransport(handler)
+    await TelegramDispatcher.send_once("1", "a")
+
+    started = time.monotonic()
+    await asyncio.gather(TelegramDispatcher.send_once("1", "b"), TelegramDispatcher.send_once("2", "c"))
+    sent = dict(telegram_transport[1:])
+    assert sent["2"] - started < 0.5 and sent["1"] - started >= 0.9
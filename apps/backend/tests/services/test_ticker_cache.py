@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from src.services.crypto_scraper import CryptoScraperService
+from src.services.okx_client import OKXClient
+from src.services.ticker_cache import TickerSnapshot, TickerSnapshotCache
+
+
+@pytest.fixture
+def tickers_upstream(monkeypatch):
+    """OKX giả lập trả về ticker, Redis coi như không khả dụng."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        data = [{"instId": "BTC-USDT", "last": "100"}, {"instId": "ETH-USDT", "last": "10"}]
+        return httpx.Response(200, json={"code": "0", "data": data})
+
+    async def no_redis():
+        return None
+
+    async def no_limit(path):
+        return None
+
+    monkeypatch.setattr(TickerSnapshotCache, "_read_redis", no_redis)
+    monkeypatch.setattr("src.services.okx_client.OKXRateLimiter.acquire", no_limit)
+    OKXClient.transport = httpx.MockTransport(handler)
+    OKXClient._clients.clear()
+    TickerSnapshotCache._local = None
+    yield calls
+    OKXClient.transport = None
+    OKXClient._clients.clear()
+    TickerSnapshotCache._local = None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_upstream_fetch(tickers_upstream):
+    """Nhiều caller đồng thời chỉ tạo một request tới OKX."""
+    snapshots = await asyncio.gather(*(TickerSnapshotCache.aget_snapshot() for _ in range(20)))
+
+    assert len(tickers_upstream) == 1
+    assert all(s is snapshots[0] for s in snapshots)
+    assert [t["instId"] for t in snapshots[0].select(["ETH-USDT", "DOGE-USDT"])] == ["ETH-USDT"]
+
+
+@pytest.mark.asyncio
+async def test_max_age_controls_refresh(tickers_upstream):
+    """Snapshot cũ hơn max_age của caller sẽ được tải lại."""
+    TickerSnapshotCache._local = TickerSnapshot([{"instId": "BTC-USDT", "last": "1"}], fetched_at=time.time() - 30)
+
+    stale_ok = await TickerSnapshotCache.aget_snapshot(max_age=60)
+    assert stale_ok.age >= 30 and len(tickers_upstream) == 0
+
+    fresh = await TickerSnapshotCache.aget_snapshot(max_age=5)
+    assert fresh.age < 5 and len(tickers_upstream) == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_fallback_is_flagged_when_okx_fails(tickers_upstream):
+    """OKX lỗi: trả snapshot cũ kèm cờ `stale` và thời điểm lấy, caller tự quyết định có dùng hay không."""
+    fetched_at = time.time() - 120
+    TickerSnapshotCache._local = TickerSnapshot([{"instId": "BTC-USDT", "last": "1"}], fetched_at=fetched_at)
+    OKXClient.transport = httpx.MockTransport(lambda request: httpx.Response(503))
+    OKXClient._clients.clear()
+
+    snapshot = await TickerSnapshotCache.aget_snapshot(max_age=5)
+    assert snapshot.stale and snapshot.fetched_at == fetched_at
+    assert not TickerSnapshotCache._local.stale
+
+    prices = await CryptoScraperService.aget_prices(["BTC-USDT"], max_age=5)
+    assert prices == [{"instId": "BTC-USDT", "last": "1", "fetched_at": fetched_at, "stale": True}]
+    assert not (await CryptoScraperService.aget_prices(["BTC-USDT"], max_age=300))[0]["stale"]
@@ -37,6 +37,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/sub [mã] - Đăng ký nhận thông báo biến động\n"
         "/unsub [mã] - Hủy đăng ký nhận thông báo\n"
         "/list - Xem danh sách đã đăng ký\n\n"
+        "<b>Cảnh báo giá:</b>\n"
+        "/alert [mã] [giá|+5%] - Báo khi giá chạm mức hoặc thay đổi %\n"
+        "/alerts - Xem các cảnh báo giá đang đặt\n"
+        "/delalert [id] - Xóa cảnh báo giá\n\n"
         "<i>Gõ 'ping' để kiểm tra kết nối.</i>"
     )
     await update.message.reply_text(msg, parse_mode="HTML")
@@ -139,6 +143,94 @@ async def list_subscriptions(update: Update, context: ContextTypes.DEFAULT_TYPE)
     except Exception as e:
         await update.message.reply_text(f"❌ Lỗi lấy danh sách: {str(e)}")
 
+async def set_price_alert(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Xử lý lệnh /alert"""
+    if len(context.args) < 2:
+        await update.message.reply_text("Vui lòng nhập mã và mức giá hoặc %. Ví dụ: /alert BTC 70000 hoặc /alert ETH -5%")
+        return
+
+    symbol = context.args[0].upper()
+    value = context.args[1].replace(",", "")
+    chat_id = str(update.effective_chat.id)
+    backend_url = os.getenv("BACKEND_URL", "http://localhost:8001")
+
+    try:
+        if value.endswith("%"):
+            params = {"chat_id": chat_id, "symbol": symbol, "change_pct": float(value[:-1])}
+        else:
+            params = {"chat_id": chat_id, "symbol": symbol, "price": float(value.lstrip("$"))}
+    except ValueError:
+        await update.message.reply_text(f"❌ '{context.args[1]}' không phải mức giá hoặc % hợp lệ.")
+        return
+
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(f"{backend_url}/api/crypto/alerts", params=params, timeout=10)
+            if response.status_code in (400, 503):
+                await update.message.reply_text(f"❌ {response.json().get('detail')}")
+                return
+            response.raise_for_status()
+            data = response.json()
+            verb = "lên tới" if data["direction"] == "ABOVE" else "xuống tới"
+            await update.message.reply_text(
+                f"🎯 Đã đặt cảnh báo #{data['id']}: báo khi <b>{data['symbol']}</b> {verb} "
+                f"<b>${data['target_price']:,.2f}</b> (hiện tại ${data['current_price']:,.2f}).",
+                parse_mode="HTML"
+            )
+    except Exception as e:
+        await update.message.reply_text(f"❌ Lỗi đặt cảnh báo: {str(e)}")
+
+async def list_price_alerts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Xử lý lệnh /alerts"""
+    chat_id = str(update.effective_chat.id)
+    backend_url = os.getenv("BACKEND_URL", "http://localhost:8001")
+
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{backend_url}/api/crypto/alerts", params={"chat_id": chat_id}, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+
+            if not data:
+                await update.message.reply_text("🎯 Bạn chưa đặt cảnh báo giá nào.")
+                return
+
+            message = "<b>🎯 Cảnh báo giá đang đặt:</b>\n\n"
+            for alert in data:
+                arrow = "⬆️" if alert["direction"] == "ABOVE" else "⬇️"
+                message += f"#{alert['id']} <code>{alert['symbol']}</code> {arrow} ${alert['target_price']:,.2f}"
+                if alert.get("change_pct") is not None:
+                    message += f" ({alert['change_pct']:+.2f}%)"
+                message += "\n"
+
+            message += "\n💡 Dùng lệnh <code>/delalert [id]</code> để xóa."
+            await update.message.reply_text(message, parse_mode="HTML")
+    except Exception as e:
+        await update.message.reply_text(f"❌ Lỗi lấy danh sách cảnh báo: {str(e)}")
+
+async def delete_price_alert(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Xử lý lệnh /delalert"""
+    if not context.args or not context.args[0].lstrip("#").isdigit():
+        await update.message.reply_text("Vui lòng nhập id cảnh báo. Ví dụ: /delalert 12")
+        return
+
+    alert_id = context.args[0].lstrip("#")
+    chat_id = str(update.effective_chat.id)
+    backend_url = os.getenv("BACKEND_URL", "http://localhost:8001")
+
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.delete(
+                f"{backend_url}/api/crypto/alerts/{alert_id}", params={"chat_id": chat_id}, timeout=10
+            )
+            if response.status_code == 404:
+                await update.message.reply_text(f"❌ Không tìm thấy cảnh báo #{alert_id}.")
+                return
+            response.raise_for_status()
+            await update.message.reply_text(f"✅ Đã xóa cảnh báo #{alert_id}.")
+    except Exception as e:
+        await update.message.reply_text(f"❌ Lỗi xóa cảnh báo: {str(e)}")
+
 async def get_crypto_prices(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Xử lý lệnh /crypto"""
     await update.message.reply_text("⏳ Đang lấy giá thực tế từ sàn OKX...")
@@ -246,6 +338,9 @@ if __name__ == '__main__':
     sub_handler = CommandHandler('sub', subscribe_coin)
     unsub_handler = CommandHandler('unsub', unsubscribe_coin)
     list_handler = CommandHandler('list', list_subscriptions)
+    alert_handler = CommandHandler('alert', set_price_alert)
+    alerts_handler = CommandHandler('alerts', list_price_alerts)
+    delalert_handler = CommandHandler('delalert', delete_price_alert)
     msg_handler = MessageHandler(filters.TEXT & (~filters.COMMAND), handle_message)
     
     application.add_handler(start_handler)
@@ -255,6 +350,9 @@ if __name__ == '__main__':
     application.add_handler(sub_handler)
     application.add_handler(unsub_handler)
     application.add_handler(list_handler)
+    application.add_handler(alert_handler)
+    application.add_handler(alerts_handler)
+    application.add_handler(delalert_handler)
     application.add_handler(msg_handler)
     
     application.run_polling()